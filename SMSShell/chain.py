@@ -20,6 +20,9 @@
 """This module contains data validators
 """
 
+# System imports
+import operator
+
 # Project imports
 from .exceptions import ShellInitException
 
@@ -36,6 +39,8 @@ class Chain(object):
         """Init a new empty chain
         """
         self.__field_links = dict()
+        # the compiled steps of the chain, see compile()
+        self.__plan = None
 
     def addFieldLink(self, field, link):
         """Append a link object for specific field
@@ -55,6 +60,7 @@ class Chain(object):
         if field not in self.__field_links:
             self.__field_links[field] = []
         self.__field_links[field].append(link)
+        self.__plan = None
 
     def addLinksFromDict(self, field_links_map):
         """Initialize filters for this message
@@ -66,6 +72,32 @@ class Chain(object):
         for field, links in field_links_map.items():
             for l in links:
                 self.addFieldLink(field, l)
+        self.compile()
+
+    def compile(self):
+        """Build the steps run by callChainOnObject()
+
+        Each step is a tuple of the field's name, the getter of the field,
+        the tuple of its links and a boolean which is True if the result of
+        the links is assigned to the field. It is called by addLinksFromDict(),
+        and by callChainOnObject() if links have been added since
+        """
+        self.__plan = tuple((field, operator.attrgetter(field),
+                             tuple(self._compileLinks(links)), self.ASSIGN_RETURN)
+                            for field, links in self.__field_links.items())
+
+    def _compileLinks(self, links):
+        """Return the links to run for a field
+
+        Chains may override it to replace some links by equivalent
+        but faster ones
+
+        Args:
+            links: the list of the links of the field
+        Returns:
+            the list of links to run
+        """
+        return links
 
     def callChainOnObject(self, obj):
         """Validate message using the defined validators
@@ -77,12 +109,102 @@ class Chain(object):
         Raise:
             Some Exception if chain fail
         """
-        for field, links in self.__field_links.items():
-            if not hasattr(obj, field):
-                raise self.__class__.EXCEPTION(("Field '{}' does not exist in " +
-                                                "message").format(field))
-            for l in links:
-                r = l(getattr(obj, field))
-                if self.__class__.ASSIGN_RETURN:
-                    setattr(obj, field, r)
+        plan = self.__plan
+        if plan is None:
+            self.compile()
+            plan = self.__plan
+        for field, getter, links, assign in plan:
+            try:
+                value = getter(obj)
+            except AttributeError:
+                raise self.EXCEPTION(("Field '{}' does not exist in " +
+                                      "message").format(field)) from None
+            if assign:
+                for link in links:
+                    value = link(value)
+                setattr(obj, field, value)
+            else:
+                for link in links:
+                    link(value)
         return True
+
+    def callChainOnBatch(self, objs):
+        """Run the chain on many objects at once
+
+        Each link of a field is run on the values of all objects which
+        have not failed yet, by its callOnBatch() method if it has one,
+        see callLinkOnBatch(). As with callChainOnObject(), the results
+        of the links are assigned to the fields if ASSIGN_RETURN is set
+
+        Args:
+            objs: the list of objects with fields to validate
+        Return:
+            the list of results, one per object, True if chain successful
+            for the object, otherwise the EXCEPTION instance which made it fail
+        Raise:
+            Any exception raised by a link which is not an EXCEPTION
+        """
+        plan = self.__plan
+        if plan is None:
+            self.compile()
+            plan = self.__plan
+        exception = self.EXCEPTION
+        results = [True] * len(objs)
+        for field, getter, links, assign in plan:
+            indexes = []
+            values = []
+            for i, obj in enumerate(objs):
+                if results[i] is not True:
+                    continue
+                try:
+                    values.append(getter(obj))
+                except AttributeError:
+                    results[i] = exception(("Field '{}' does not exist in " +
+                                            "message").format(field))
+                    continue
+                indexes.append(i)
+            for link in links:
+                if not indexes:
+                    break
+                outputs = self.callLinkOnBatch(link, values)
+                failed = [k for k, output in enumerate(outputs) if isinstance(output, exception)]
+                if failed:
+                    for k in failed:
+                        results[indexes[k]] = outputs[k]
+                    failed = set(failed)
+                    indexes = [i for k, i in enumerate(indexes) if k not in failed]
+                    outputs = [output for k, output in enumerate(outputs) if k not in failed]
+                    if not assign:
+                        values = [value for k, value in enumerate(values) if k not in failed]
+                if assign:
+                    values = outputs
+            if assign:
+                for i, value in zip(indexes, values):
+                    setattr(objs[i], field, value)
+        return results
+
+    def callLinkOnBatch(self, link, values):
+        """Run a link on a list of values
+
+        A link may provide a callOnBatch(values) method which returns
+        the list of its results, one per value, in which failures are
+        EXCEPTION instances instead of being raised. Otherwise the link
+        is called for each value
+
+        Args:
+            link: the link to run
+            values: the list of values
+        Returns:
+            the list of results of the link, or of the EXCEPTION
+            instances raised by the link
+        """
+        call_on_batch = getattr(link, 'callOnBatch', None)
+        if call_on_batch is not None:
+            return call_on_batch(values)
+        outputs = []
+        for value in values:
+            try:
+                outputs.append(link(value))
+            except self.EXCEPTION as ex:
+                outputs.append(ex)
+        return outputs
@@ -22,6 +22,7 @@
 
 # system imports
 import argparse
+import copy
 import logging
 
 # Project imports
@@ -103,6 +104,9 @@ class AbstractCommand(object):
             dict: the config dict specific for this command
         """
         self.__session = None
+        # the arguments parser is built once and shared by all calls
+        # it is kept in a tuple because the parser itself may be None
+        self.__args_parser = None
 
         assert isinstance(logger, logging.Logger)
         self.log = logger
@@ -131,8 +135,8 @@ class AbstractCommand(object):
         Returns:
             models.Session the session of the current run of this command
 
-            Each time this command is run, the session is replaced by
-                the session of the current user
+            Each run of this command use a dedicated copy of the command
+                bound to the session of the current user
         """
         assert self.__session is not None
         return self.__session
@@ -159,6 +163,10 @@ class AbstractCommand(object):
         The usage of an arg parser is optionnal. It allow the user's command
         to be more complicated in the manner it takes arguments
 
+        It is called only once per command instance, the returned parser
+        is reused by all calls of the command, possibly at the same time
+        from many threads, so it must not be modified after this function
+
         Returns:
             must return an instance of AbstractCommand.ArgParser,
             use createArgsParser() to create a new and customize it before
@@ -258,12 +266,30 @@ class AbstractCommand(object):
                                             ' return a list of valid SessionStates objects')
         return states
 
+    def _bindSession(self, session):
+        """Private entry point for Shell
+
+        Args:
+            session: the session of the current call
+        Returns:
+            a shallow copy of this command dedicated to the current call,
+            so the shared command instance never carry any session
+        """
+        com = copy.copy(self)
+        com.session = session
+        return com
+
     def _argsParser(self):
         """Private entry point for Shell
 
+        The parser is built on the first call and then reused, a reloaded
+        command is a new instance so it builds its own parser
+
         Returns:
             The argparser formatted and validated for Shell usage
         """
+        if self.__args_parser is not None:
+            return self.__args_parser[0]
         try:
             parser = self.argsParser()
         except BaseException as ex:
@@ -276,4 +302,25 @@ class AbstractCommand(object):
             if parser.add_help:
                 raise CommandBadImplemented(str(self.__class__) + ' your argparser'
                                             " must not contains predefined help option")
+        # concurrent first calls may build more than one parser, they are
+        # all equivalent and only one of them is kept
+        self.__args_parser = (parser,)
         return parser
+
+
+class AbstractAsyncCommand(AbstractCommand):
+    """This is an abstract asyncio command
+
+    Inherit this class for commands which wait on I/O, their main function
+    is a coroutine awaited by the daemon event loop
+    """
+
+    async def main(self, argv):
+        """The main running coroutine of this command
+
+        Args:
+            argv: List<String> the list of arguments
+        Returns:
+            Optional output that will be send back to original user
+        """
+        raise CommandBadImplemented(str(self.__class__) + " must implement the main function")
@@ -19,8 +19,8 @@
 
 """Flush command
 
-This command remove all cached commands, force the shell to reload all command
-on next call
+This command reloads the cached commands whose source file has changed,
+the other commands are kept as is
 """
 
 from . import AbstractCommand
@@ -34,8 +34,10 @@ class Flush(AbstractCommand):
         return 'flush'
 
     def description(self, argv):
-        return 'Flush command cache directory'
+        return 'Reload changed commands'
 
     def main(self, argv):
-        self.shell.flushCommandCache()
-        return 'ok'
+        reloaded = self.shell.flushCommandCache()
+        if not reloaded:
+            return 'ok'
+        return 'reloaded ' + ', '.join(reloaded)
@@ -46,6 +46,9 @@ class MyConfigParser(configparser.ConfigParser):
     # list of logging level available by configuration file
     LOGLEVEL_MAP = ['ERROR', 'WARN', 'INFO', 'DEBUG']
     MODE_MAP = ['DAEMON', 'STANDALONE']
+    EVENT_LOOP_MAP = ['none', 'asyncio']
+    QUEUE_FULL_MAP = ['block', 'reject']
+    INPUT_MAP = ['env', 'file']
     MAIN_SECTION = 'main'
 
     def __init__(self):
@@ -151,6 +154,83 @@ class MyConfigParser(configparser.ConfigParser):
         """
         return self.__getValueInArray(self.MAIN_SECTION, 'mode', self.MODE_MAP, 'DAEMON')
 
+    def getEventLoop(self):
+        """Return the event loop used by the current mode
+
+        @return str : the event loop name if it belong to the availables values
+                        'none' otherwise
+        """
+        return self.__getValueInArray(self.getMode().lower(), 'event_loop',
+                                      self.EVENT_LOOP_MAP, 'none')
+
+    def getWorkers(self, item='workers', default=1):
+        """Return the number of workers used to treat messages in current mode
+
+        Args:
+            item: the name of the item from which to pick up the value
+                        Default to 'workers'
+            default: the fallback value to return if the item is not found
+                    or if the item value is not valid
+        Returns:
+            the number of workers as a strictly positive integer
+        """
+        return self.getModeConfigInt(item, default, minimum=1)
+
+    def getQueueSize(self, item='queue_size', default=100):
+        """Return the maximum number of messages waiting in each queue
+
+        Args:
+            item: the name of the item from which to pick up the value
+                        Default to 'queue_size'
+            default: the fallback value to return if the item is not found
+                    or if the item value is not valid
+        Returns:
+            the queue size as a positive integer, 0 means unlimited
+        """
+        return self.getModeConfigInt(item, default, minimum=0)
+
+    def getQueueFullPolicy(self):
+        """Return the behaviour of the receiver when the messages queue is full
+
+        @return str : 'block' to stop reading new messages until the queue
+                        has free space, 'reject' to answer an error to client
+        """
+        return self.__getValueInArray(self.getMode().lower(), 'queue_full',
+                                      self.QUEUE_FULL_MAP, 'block')
+
+    def getInput(self):
+        """Return the source of the messages treated by the standalone mode
+
+        @return str : 'env' to decode the message from gammu-smsd environment
+                        variables, 'file' to decode gammu-smsd backup files
+        """
+        return self.__getValueInArray(self.getMode().lower(), 'input',
+                                      self.INPUT_MAP, 'env')
+
+    def getModeConfigInt(self, key, fallback, minimum=None):
+        """Return an integer configuration option of the current mode
+
+        Args:
+            key: the name of the configuration option
+            fallback: the value to return if the option is not found
+                        or if its value is not valid
+            minimum: the optional minimum allowed value
+        Returns:
+            the option value as integer
+        """
+        raw_value = self.getModeConfig(key, fallback=fallback)
+        try:
+            value = int(raw_value)
+        except ValueError:
+            g_logger.error("Incorrect integer value '%s' for option %s, fallback to %d",
+                           raw_value, key, fallback)
+            return fallback
+        if minimum is not None and value < minimum:
+            g_logger.error("Option %s must be greater or equal to %d, fallback to %d",
+                           key, minimum, fallback)
+            return fallback
+        return value
+
     def getModeConfig(self, key, fallback=None):
         """Return a configuration option of the current mode
 
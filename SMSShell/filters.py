@@ -76,3 +76,15 @@ class LowerCase(AbstractFilter):
 
     def __call__(self, data):
         return data[self.start:self.length].lower() + data[(self.start+self.length):]
+
+    def callOnBatch(self, values):
+        """Filter many values at once
+
+        Args:
+            values: the list of values
+        Returns:
+            the list of filtered values
+        """
+        start = self.start
+        end = self.start + self.length
+        return [data[start:self.length].lower() + data[end:] for data in values]
@@ -97,3 +97,60 @@ class AbstractMetricsHelper(AbstractModule):
         """
         """
         raise NotImplementedError("You must implement the '_gauge' method in metrics helper class")
+
+
+class MetricsRecorder(object):
+    """Record the increments of counters to replay them into a metrics helper
+
+    It is used in place of the metrics helper by the worker processes, which
+    do not export their metrics, so their counters are replayed by the parent.
+    Declarations of counters and gauges are dropped
+    """
+
+    def __init__(self):
+        """Constructor: Build a new empty recorder
+        """
+        self.__records = []
+
+    def counter(self, name, value=1, description=None, labels=None):
+        """Record the increase of a counter
+
+        Args:
+            name: the name (the path) of the counter
+            value: the value
+            description: ignored
+            labels: the dict of labels values, a list declares the counter
+        Returns:
+            mixed (self)
+        """
+        if not isinstance(labels, list):
+            self.__records.append((name, value, labels))
+        return self
+
+    def gauge(self, name, *args, **kwargs):
+        """Drop the gauge
+
+        Returns:
+            mixed (self)
+        """
+        return self
+
+    def popRecords(self):
+        """Return and forget the recorded increments
+
+        Returns:
+            the list of (name, value, labels) tuples
+        """
+        records, self.__records = self.__records, []
+        return records
+
+    @staticmethod
+    def replay(records, metrics):
+        """Increase the recorded counters in a metrics helper
+
+        Args:
+            records: the list returned by popRecords()
+            metrics: the metrics helper
+        """
+        for name, value, labels in records:
+            metrics.counter(name, value, labels=labels)
@@ -50,6 +50,8 @@ class MetricsHelper(AbstractMetricsHelper):
         self.__address = self.getConfig('listen_address', fallback='')
         # initialized counters
         self.__counters = dict()
+        # initialized gauges
+        self.__gauges = dict()
 
     def start(self):
         """Prepare the receiver/init connections
@@ -122,3 +124,58 @@ class MetricsHelper(AbstractMetricsHelper):
             except ValueError as ex:
                 g_logger.error("invalid metrics counter : %s", str(ex))
         return self
+
+    def _gauge(self, name, value=None, set=None, callback=None, description=None, labels=None):
+        """Declare and manipulate a gauge
+
+        The gauge is initialized on first usage
+
+        Args:
+            name: the name (the path) of the gauge
+            value: increase/decrease the gauge by this value
+            set: set the value of the gauge
+            callback: optional callback function to use to compute metric
+            description: a description of the gauge,
+              required on first usage
+            labels: the list of labels names on declaration, or the dict
+              of labels values
+        Returns:
+            mixed (self)
+        """
+        if name not in self.__gauges:
+            # ensure description
+            if not description:
+                g_logger.error(("First usage of gauge metric '%s' require a description,"
+                                " metric is discarded"), name)
+                return self
+            # check labels format
+            if isinstance(labels, dict):
+                _labels = labels.keys()
+            elif isinstance(labels, list):
+                _labels = labels
+            elif labels is None:
+                _labels = []
+            else:
+                g_logger.error(("First usage of gauge metric '%s' require labels to be a list,"
+                                " metric is discarded"), name)
+                return self
+            # create gauge
+            self.__gauges[name] = prometheus_client.Gauge(name, description, _labels)
+            if isinstance(labels, list):
+                # only declare gauge, do not initialize it
+                return self
+        gauge = self.__gauges[name]
+        assert gauge
+
+        try:
+            if labels:
+                gauge = gauge.labels(**labels)
+            if callback is not None:
+                gauge.set_function(callback)
+            elif set is not None:
+                gauge.set(set)
+            elif value:
+                gauge.inc(value)
+        except (ValueError, TypeError) as ex:
+            g_logger.error("invalid metrics gauge : %s", str(ex))
+        return self
@@ -24,11 +24,13 @@
 from .message import Message
 from .session import (Session, SessionStates,
                       BadStateTransitionException, SessionException)
+from .sessionmap import SessionMap
 
 __all__ = [
     'Message',
     'Session',
     'SessionStates',
     'BadStateTransitionException',
-    'SessionException'
+    'SessionException',
+    'SessionMap'
 ]
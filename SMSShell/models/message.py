@@ -32,8 +32,14 @@ g_logger = logging.getLogger('smsshell.message')
 
 class Message(object):
     """This class represent a message with sender id and content
+
+    Attributes:
+        number : the sender id as a string
+        content : the message content as a string
     """
 
+    __slots__ = ('number', 'content', '__attributes')
+
     def __init__(self, number, content, attributes=None):
         """Constructor: Build a new message object
 
@@ -41,75 +47,47 @@ class Message(object):
             number : message number
             content : the message content as a string
         """
-        self.__number = None
-        self.__content = None
         self.__attributes = dict()
         # database model
         if attributes is not None:
             assert isinstance(attributes, dict)
-            self.attributes = attributes
+            self.__attributes.update(attributes)
         self.number = number
         self.content = content
 
-    @property
-    def number(self):
-        """Return this message number
-
-        Returns:
-            the sender id as a string
-        """
-        assert self.__number is not None
-        return self.__number
-
-    @number.setter
-    def number(self, send):
-        """Set the sender id
-
-        Args:
-            send: the sender id as a string
-        """
-        self.__number = send
-
-    @property
-    def content(self):
-        """Return the message content
-
-        Returns:
-            the message content as a string
-        """
-        assert self.__content is not None
-        return self.__content
-
-    @content.setter
-    def content(self, cont):
-        """Set the message content
-
-        Args:
-            cont: the raw message content
-        """
-        self.__content = cont
-
     def __getattr__(self, name):
         """Magic function to retrieve message attributes
 
+        It is only called for names which are not a slot of the message
+
         Args:
             name: the name of the attribute
         """
-        return self.attribute(name)
+        # private names are never attributes, this also avoid an infinite
+        # recursion when the attributes slot is not set, during unpickling
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self.__attributes[name]
+        except KeyError:
+            raise AttributeError(name) from None
 
     def attribute(self, key, fallback=AttributeError):
-        """Return the optional message extra attributes
+        """Return one of the optional message extra attributes
 
+        Args:
+            key: the name of the attribute
+            fallback: the value to return if the attribute does not exist,
+                        if it is an exception class, it is raised instead
         Returns:
-            a dict of message attributes
+            the value of the attribute
         """
-        assert self.__attributes is not None
-        assert isinstance(self.__attributes, dict)
-        if key not in self.__attributes:
-            if issubclass(fallback.__class__, Exception.__class__):
-                raise fallback(key)
+        try:
+            return self.__attributes[key]
+        except KeyError:
+            if isinstance(fallback, type):
+                raise fallback(key) from None
             return fallback
-        return self.__attributes[key]
 
     @property
     def attributes(self):
@@ -118,8 +96,6 @@ class Message(object):
         Returns:
             a dict of message attributes
         """
-        assert self.__attributes is not None
-        assert isinstance(self.__attributes, dict)
         return self.__attributes
 
     @attributes.setter
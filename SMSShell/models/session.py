@@ -25,6 +25,7 @@
 import datetime
 from enum import IntEnum, unique
 import logging
+import time
 
 # Project imports
 from ..exceptions import ShellException
@@ -58,8 +59,15 @@ class SessionStates(IntEnum):
 
 class Session(object):
     """An user session with all user's meta data
+
+    Attributes:
+        subject: the session subject
     """
 
+    __slots__ = ('subject', '__ttl', '__prefix', '__state', '__created_at',
+                 '__created_clock', '__access_clock', '__expires_at', '__storage',
+                 '__wrapper')
+
     # map of authorized session states transitions
     STATE_TRANSITION_MAP = {
         'STATE_GUEST': [
@@ -87,38 +95,21 @@ class Session(object):
                         and a new empty one is created
         """
         # internal attributes
-        self.__subject = None
-        self.__ttl = None
+        # times are taken from the monotonic clock, except the creation
+        # timestamp which is only used for display
+        self.subject = subject
         self.__prefix = ''
-        self.__state = None
-        self.__created_at = datetime.datetime.today()
-        self.__storage = dict()
+        self.__state = SessionStates.STATE_GUEST
+        self.__created_at = time.time()
+        self.__created_clock = time.monotonic()
+        self.__access_clock = self.__created_clock
+        # the storage dict is only built by the first set()
+        self.__storage = None
+        # the secure wrapper given to commands, see getSecureSession()
+        self.__wrapper = None
 
         # init attributes with values
-        self.subject = subject
         self.ttl = time_to_live
-        self.forceState(SessionStates.STATE_GUEST)
-        self.access()
-
-
-    @property
-    def subject(self):
-        """Return the subject name
-
-        Returns:
-            the subject as a string
-        """
-        assert self.__subject is not None
-        return self.__subject
-
-    @subject.setter
-    def subject(self, sub):
-        """Set the subject id
-
-        Args:
-            sub: the new subject as a string
-        """
-        self.__subject = sub
 
     @property
     def state(self):
@@ -127,7 +118,6 @@ class Session(object):
         Returns:
             the current state value
         """
-        assert self.__state is not None
         return self.__state
 
     @state.setter
@@ -165,7 +155,7 @@ class Session(object):
         Returns:
             return the datetime at which this session has been created
         """
-        return self.__created_at
+        return datetime.datetime.fromtimestamp(self.__created_at)
 
     @property
     def ttl(self):
@@ -174,27 +164,36 @@ class Session(object):
         Returns:
             the current session time to live
         """
-        assert self.__ttl is not None
-        return int(self.__ttl.seconds)
+        return self.__ttl
 
     @ttl.setter
     def ttl(self, seconds):
         """Set the time to live in seconds
 
         Args:
-            seconds: the number of minutes the session will be alive
+            seconds: the number of seconds the session will be alive
         """
-        self.__ttl = datetime.timedelta(seconds=int(seconds))
+        self.__ttl = int(seconds)
+        self.__expires_at = self.__access_clock + self.__ttl
 
     @property
     def access_at(self):
         """Return the last access time
 
         Returns:
-            the last time this session has been used
+            the last datetime this session has been used
+        """
+        return datetime.datetime.fromtimestamp(
+            self.__created_at + self.__access_clock - self.__created_clock)
+
+    @property
+    def expires_at(self):
+        """Return the expiry time
+
+        Returns:
+            the time of the monotonic clock at which this session expires
         """
-        assert self.__access_at is not None
-        return self.__access_at
+        return self.__expires_at
 
     def access(self):
         """Refresh the access time of this session
@@ -202,7 +201,8 @@ class Session(object):
         Returns:
             self
         """
-        self.__access_at = datetime.datetime.today()
+        self.__access_clock = time.monotonic()
+        self.__expires_at = self.__access_clock + self.__ttl
         return self
 
     def isValid(self):
@@ -211,7 +211,7 @@ class Session(object):
         Returns:
             true if the session is still valid, false otherwise
         """
-        if (datetime.datetime.today() - self.access_at).seconds >= self.ttl:
+        if time.monotonic() >= self.__expires_at:
             g_logger.debug('session for %s is expired', self.subject)
             return False
         return True
@@ -235,10 +235,9 @@ class Session(object):
         Returns:
             mixed: the requested value or fallback if it do not exits
         """
-        fullkey = self.__prefix + key
-        if fullkey in self.__storage:
-            return self.__storage[fullkey]
-        return fallback
+        if self.__storage is None:
+            return fallback
+        return self.__storage.get(self.__prefix + key, fallback)
 
     def set(self, key, value):
         """Set the given value in session storage
@@ -249,42 +248,61 @@ class Session(object):
         Returns:
             self
         """
-        fullkey = self.__prefix + key
-        self.__storage[fullkey] = value
+        if self.__storage is None:
+            self.__storage = dict()
+        self.__storage[self.__prefix + key] = value
         return self
 
-    def getSecureSession(self):
-        """Return a secure wrapper of the session
+    def asDict(self):
+        """Export this session as a dict of simple types
 
         Returns:
-            a new session wrapper for this session
+            the dict which describe this session, storage values must be
+            serializable by the persistent store
         """
+        return dict(subject=self.subject,
+                    state=self.state.name,
+                    ttl=self.ttl,
+                    created_at=self.__created_at,
+                    access_at=self.__created_at + self.__access_clock - self.__created_clock,
+                    storage=dict(self.__storage or ()))
 
-        class SessionWrapper(object):
-            """Simple session wrapper to restrict usage of some
-            attribute into commands
-            """
-            def __init__(self, session):
-                """Build a new wrapper around this session
+    @classmethod
+    def fromDict(cls, data):
+        """Build a session from a dict produced by asDict()
 
-                Args:
-                    session: the real wrapper session object
-                """
-                self.__session = session
-                self.subject = session.subject
-                self.state = session.state
+        Args:
+            data: the dict which describe the session
+        Returns:
+            the Session instance
+        Raises:
+            SessionException if the dict is not valid
+        """
+        try:
+            sess = cls(data['subject'], data['ttl'])
+            sess.forceState(SessionStates[data['state']])
+            # translate wall clock timestamps to the monotonic clock
+            offset = time.monotonic() - time.time()
+            sess.__created_at = float(data['created_at'])
+            sess.__created_clock = float(data['created_at']) + offset
+            sess.__access_clock = float(data['access_at']) + offset
+            sess.__expires_at = sess.__access_clock + sess.ttl
+            sess.__storage = dict(data['storage']) or None
+        except (KeyError, TypeError, ValueError) as ex:
+            raise SessionException('invalid session data : {}'.format(str(ex)))
+        return sess
 
-            def get(self, *args, **kw):
-                """See Session.get
-                """
-                return self.__session.get(*args, **kw)
+    def getSecureSession(self):
+        """Return a secure wrapper of the session
 
-            def set(self, *args, **kw):
-                """See Session.set
-                """
-                return self.__session.set(*args, **kw)
+        The wrapper is built once and reused for the session lifetime
 
-        return SessionWrapper(self)
+        Returns:
+            the session wrapper for this session
+        """
+        if self.__wrapper is None:
+            self.__wrapper = SessionWrapper(self)
+        return self.__wrapper
 
     # DEBUG methods
     def __str__(self):
@@ -303,3 +321,43 @@ class Session(object):
         @return [str] a formatted string that describe this object
         """
         return "[S(" + str(self.subject) + ")]"
+
+
+class SessionWrapper(object):
+    """Simple session wrapper to restrict usage of some
+    attribute into commands
+
+    The subject and the state are read only
+    """
+
+    __slots__ = ('__session',)
+
+    def __init__(self, session):
+        """Build a new wrapper around this session
+
+        Args:
+            session: the real wrapper session object
+        """
+        self.__session = session
+
+    @property
+    def subject(self):
+        """Return the subject of the wrapped session
+        """
+        return self.__session.subject
+
+    @property
+    def state(self):
+        """Return the current state of the wrapped session
+        """
+        return self.__session.state
+
+    def get(self, *args, **kw):
+        """See Session.get
+        """
+        return self.__session.get(*args, **kw)
+
+    def set(self, *args, **kw):
+        """See Session.set
+        """
+        return self.__session.set(*args, **kw)
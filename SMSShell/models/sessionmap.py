@@ -0,0 +1,221 @@
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+"""Models/SessionMap This class keep the live sessions of the shell
+
+Sessions are kept ordered by their last access, the least recently used
+first. As all sessions of a shell share the same time to live, the expired
+sessions are at the beginning of the map, so each new session evicts
+the expired ones from there instead of scanning the whole map.
+When a maximum number of sessions is set, the least recently used sessions
+are evicted to make room for new ones.
+
+The map is split into shards by the hash of the subjects, each shard has
+its own lock, order and expiry, so threads which run commands of different
+subjects rarely wait for each other.
+"""
+
+# System imports
+import collections
+import logging
+import threading
+
+# Global project declarations
+g_logger = logging.getLogger('smsshell.models.sessionmap')
+
+
+class SessionMap(object):
+    """A thread safe map of sessions per subject with expiry and LRU eviction
+    """
+
+    # maximum number of expired sessions evicted by each new session
+    # a new session adds one entry, so the shard always shrinks faster
+    # than it grows while there are expired sessions
+    SWEEP_BATCH = 64
+
+    def __init__(self, max_count=0, shards=1):
+        """Constructor: Build a new empty map
+
+        Args:
+            max_count: the maximum number of sessions, 0 means unlimited
+                        it is shared equally between shards, each shard
+                        keeps at most ceil(max_count / shards) sessions,
+                        so as subjects are not evenly spread, eviction
+                        may start before max_count sessions are kept
+            shards: the number of shards
+        """
+        assert shards >= 1
+        self.max_count = int(max_count)
+        # the maximum number of sessions of each shard
+        self.__shard_max_count = -(-self.max_count // shards)
+        self.__shards = [dict(sessions=collections.OrderedDict(),
+                              lock=threading.Lock(),
+                              # number of evicted sessions per reason
+                              evicted=dict(expired=0, overflow=0))
+                         for _ in range(shards)]
+
+    def __len__(self):
+        """Return the number of sessions in the map, including expired ones
+
+        Returns:
+            the number of sessions as integer
+        """
+        return sum(len(shard['sessions']) for shard in self.__shards)
+
+    def evictedCount(self, reason):
+        """Return the number of evicted sessions since the creation of the map
+
+        Args:
+            reason: the reason of the eviction, 'expired' or 'overflow'
+        Returns:
+            the number of evicted sessions as integer
+        """
+        return sum(shard['evicted'][reason] for shard in self.__shards)
+
+    def get(self, subject):
+        """Return the valid session of the given subject
+
+        Args:
+            subject: the session subject
+        Returns:
+            the Session instance or None if the subject has no valid session
+        """
+        shard = self.__shardOf(subject)
+        with shard['lock']:
+            return SessionMap.__get(shard, subject)
+
+    def getOrCreate(self, subject, factory):
+        """Return the valid session of the given subject or a new one
+
+        Args:
+            subject: the session subject
+            factory: the callable which builds a new session for the subject
+        Returns:
+            a tuple of the Session instance and a boolean which is True
+            if the session has been created
+        """
+        shard = self.__shardOf(subject)
+        with shard['lock']:
+            sess = SessionMap.__get(shard, subject)
+            if sess is not None:
+                return sess, False
+            sess = factory(subject)
+            self.__put(shard, sess)
+        return sess, True
+
+    def put(self, session):
+        """Put a session in the map, replacing the one of the same subject
+
+        Args:
+            session: the Session instance
+        """
+        shard = self.__shardOf(session.subject)
+        with shard['lock']:
+            self.__put(shard, session)
+
+    def sweep(self):
+        """Evict all expired sessions
+
+        Unlike the eviction done by new sessions, the whole map is scanned,
+        so sessions restored with an older access time are evicted too.
+        Shards are swept one after the other
+
+        Returns:
+            the number of evicted sessions
+        """
+        count = 0
+        for shard in self.__shards:
+            with shard['lock']:
+                sessions = shard['sessions']
+                expired = [subject for subject, sess in sessions.items()
+                           if not sess.isValid()]
+                for subject in expired:
+                    del sessions[subject]
+                shard['evicted']['expired'] += len(expired)
+            count += len(expired)
+        return count
+
+    def __shardOf(self, subject):
+        """Return the shard of the given subject
+
+        Args:
+            subject: the session subject
+        Returns:
+            the shard dict
+        """
+        return self.__shards[hash(subject) % len(self.__shards)]
+
+    @staticmethod
+    def __get(shard, subject):
+        """Return the valid session of the given subject
+
+        Must be called with the lock of the shard held
+        """
+        sessions = shard['sessions']
+        sess = sessions.get(subject)
+        if sess is None:
+            return None
+        if not sess.isValid():
+            del sessions[subject]
+            shard['evicted']['expired'] += 1
+            return None
+        sessions.move_to_end(subject)
+        return sess
+
+    def __put(self, shard, session):
+        """Put a session at the end of its shard and evict old ones
+
+        Must be called with the lock of the shard held
+        """
+        sessions = shard['sessions']
+        sessions[session.subject] = session
+        sessions.move_to_end(session.subject)
+        SessionMap.__sweep(shard, self.SWEEP_BATCH)
+        if self.__shard_max_count:
+            overflow = len(sessions) - self.__shard_max_count
+            for _ in range(overflow):
+                sessions.popitem(last=False)
+            if overflow > 0:
+                g_logger.debug('evicted %d least recently used sessions', overflow)
+                shard['evicted']['overflow'] += overflow
+
+    @staticmethod
+    def __sweep(shard, limit):
+        """Evict the expired sessions from the beginning of a shard
+
+        Must be called with the lock of the shard held
+
+        Args:
+            shard: the shard dict
+            limit: the maximum number of sessions to evict
+        Returns:
+            the number of evicted sessions
+        """
+        sessions = shard['sessions']
+        count = 0
+        for sess in sessions.values():
+            if count >= limit or sess.isValid():
+                break
+            count += 1
+        for _ in range(count):
+            sessions.popitem(last=False)
+        if count:
+            g_logger.debug('evicted %d expired sessions', count)
+            shard['evicted']['expired'] += count
+        return count
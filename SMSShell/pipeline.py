@@ -0,0 +1,150 @@
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+"""This module contains the staged pipeline used to treat messages
+
+A pipeline is an ordered list of stages. Each stage is a worker pool with
+bounded lanes: a job goes to the next stage once the current one succeed.
+When a stage is full, the previous one blocks, which propagates the
+backpressure up to the pipeline's feeder.
+"""
+
+# System imports
+import logging
+
+# Project imports
+from .workers import WorkerPool
+
+# Global project declarations
+g_logger = logging.getLogger('smsshell.pipeline')
+
+
+class Pipeline(object):
+    """A pipeline of stages run by worker pools
+
+    Jobs are keyed, all jobs with the same key are run in their feeding
+    order by every stage
+    """
+
+    def __init__(self, name, done_callback=None, metrics=None):
+        """Constructor: Build a new empty pipeline
+
+        Args:
+            name: the name of the pipeline
+            done_callback: an optional callable called with each job when
+                            it leaves the pipeline
+            metrics: the optional metrics handler
+        """
+        self.name = name
+        self.__done_callback = done_callback
+        self.__metrics = metrics
+        self.__stages = []
+
+    def addStage(self, name, func, workers=1, queue_size=0):
+        """Append a stage at the end of the pipeline
+
+        Args:
+            name: the name of the stage
+            func: the callable run on each job, the job continue to
+                    the next stage only if it returns True
+            workers: the number of workers of this stage
+            queue_size: the maximum number of pending jobs per worker
+                        0 means unlimited
+        Returns:
+            self
+        """
+        pool = WorkerPool('{}-{}'.format(self.name, name), workers, queue_size)
+        self.__stages.append((name, func, pool))
+        if self.__metrics:
+            self.__metrics.gauge('{}.queue.size'.format(self.name),
+                                 callback=pool.qsize,
+                                 labels=dict(stage=name),
+                                 description='Number of jobs waiting in queue per stage')
+        g_logger.debug("added stage '%s' with %d workers to pipeline %s",
+                       name, workers, self.name)
+        return self
+
+    def start(self):
+        """Start all stages workers
+
+        Returns:
+            True if start has success
+        """
+        for _, _, pool in self.__stages:
+            pool.start()
+        return True
+
+    def stop(self):
+        """Stop all stages once all pending jobs are done
+
+        Stages are stopped from the first to the last one so
+        each stage can flush its jobs into the next one
+
+        Returns:
+            True if stop has success
+        """
+        for _, _, pool in self.__stages:
+            pool.stop()
+        return True
+
+    def qsize(self):
+        """Return the number of jobs waiting in all stages
+
+        Returns:
+            the approximate number of pending jobs
+        """
+        return sum(pool.qsize() for _, _, pool in self.__stages)
+
+    def feed(self, key, job, block=True):
+        """Put a new job in the first stage
+
+        Args:
+            key: the hashable key of the job
+            job: the job object given to each stage
+            block: if False, do not wait when the first stage is full
+        Returns:
+            True if the job has been queued, False if the first stage is full
+        """
+        assert self.__stages
+        _, _, pool = self.__stages[0]
+        if block:
+            pool.submit(key, self.__runStage, 0, key, job)
+            return True
+        return pool.trySubmit(key, self.__runStage, 0, key, job)
+
+    def __runStage(self, index, key, job):
+        """Run a stage on the job and forward it to the next stage
+
+        Args:
+            index: the index of the stage to run
+            key: the hashable key of the job
+            job: the job object
+        """
+        name, func, _ = self.__stages[index]
+        try:
+            forward = func(job)
+        except Exception as ex:
+            g_logger.exception("unhandled error in stage '%s' : %s", name, str(ex))
+            forward = False
+
+        if forward and index + 1 < len(self.__stages):
+            # block while the next stage is full
+            self.__stages[index + 1][2].submit(key, self.__runStage, index + 1, key, job)
+        elif self.__done_callback:
+            self.__done_callback(job)
@@ -0,0 +1,416 @@
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+"""This module contains the pre-forked processes pool used to treat messages
+
+The parent process submits payloads to worker processes through pipes.
+Payloads are dispatched using a hash of their key, so all payloads that share
+the same key are run by the same worker process in their submission order,
+and any state owned by a worker (like shell sessions) lives in only one process.
+
+Worker processes are not forked by the parent, which runs many threads and
+opens files and sockets after the start of the pool, but by a zygote process
+forked when the pool starts. The zygote is single threaded and keeps the state
+of the parent at this time, so worker processes, including the ones which
+replace dead workers, never inherit the locks or the file descriptors opened
+later by the parent. Dead workers are restarted by the supervisor thread of
+the parent.
+"""
+
+# System imports
+import collections
+import logging
+import multiprocessing
+import multiprocessing.connection
+import multiprocessing.reduction
+import os
+import signal
+import threading
+
+# Global project declarations
+g_logger = logging.getLogger('smsshell.processes')
+
+
+class ProcessPool(object):
+    """A pool of pre-forked worker processes with ordered slots per key
+    """
+
+    def __init__(self, name, target, size=1, queue_size=0,
+                 initializer=None, finalizer=None, done_callback=None, metrics=None):
+        """Constructor: Build a new processes pool
+
+        Args:
+            name: the name of the pool, used in processes names
+            target: the callable run by worker processes on each payload,
+                        its return value is sent back to the parent
+            size: the number of worker processes
+            queue_size: the maximum number of pending jobs per worker process
+                        0 means unlimited
+            initializer: an optional callable run by each worker process after
+                            fork, the worker exits if it does not return True
+            finalizer: an optional callable run by each worker process on exit
+            done_callback: an optional callable called in parent process with
+                            each job and its result, the result is None if the
+                            worker failed to treat the payload
+            metrics: the optional metrics handler
+        """
+        assert int(size) > 0
+        self.name = name
+        self.__target = target
+        self.__size = int(size)
+        self.__queue_size = int(queue_size)
+        self.__initializer = initializer
+        self.__finalizer = finalizer
+        self.__done_callback = done_callback
+        self.__metrics = metrics
+        self.__context = multiprocessing.get_context('fork')
+        # protect pending jobs of all slots
+        self.__cond = threading.Condition()
+        self.__slots = [dict(pid=None,
+                             conn=None,
+                             pending=collections.OrderedDict(),
+                             send_lock=threading.Lock()) for _ in range(self.__size)]
+        self.__last_id = 0
+        self.__stopping = False
+        self.__supervisor = None
+        # the zygote process and the connection used to ask it to fork
+        # the worker processes, protected by the lock
+        self.__zygote = None
+        self.__zygote_conn = None
+        self.__zygote_lock = threading.Lock()
+        if self.__metrics:
+            self.__metrics.counter('{}.restart.total'.format(self.name),
+                                   labels=[],
+                                   description='Number of restarted worker processes')
+            self.__metrics.gauge('{}.queue.size'.format(self.name),
+                                 callback=self.qsize,
+                                 description='Number of jobs waiting for worker processes')
+
+    @property
+    def size(self):
+        """Return the number of worker processes of this pool
+
+        Returns:
+            the number of worker processes as integer
+        """
+        return self.__size
+
+    def start(self):
+        """Fork the zygote and all worker processes and start the supervisor thread
+
+        Returns:
+            True if start has success
+        """
+        self.__zygote_conn, child_conn = self.__context.Pipe()
+        self.__zygote = self.__context.Process(target=self.__runZygote,
+                                               args=(child_conn,),
+                                               name='{}-zygote'.format(self.name))
+        self.__zygote.daemon = True
+        self.__zygote.start()
+        child_conn.close()
+        for index in range(self.__size):
+            if not self.__spawn(index):
+                self.__stopZygote()
+                return False
+        self.__supervisor = threading.Thread(target=self.__supervise,
+                                             name='{}-supervisor'.format(self.name))
+        self.__supervisor.daemon = True
+        self.__supervisor.start()
+        g_logger.debug('started %d worker processes in pool %s', self.__size, self.name)
+        return True
+
+    def stop(self):
+        """Stop all worker processes once their pending jobs are done
+
+        Returns:
+            True if stop has success
+        """
+        self.__stopping = True
+        for slot in self.__slots:
+            with slot['send_lock']:
+                try:
+                    slot['conn'].send(None)
+                except (OSError, ValueError):
+                    pass
+        if self.__supervisor is not None and self.__supervisor is not threading.current_thread():
+            self.__supervisor.join()
+        self.__supervisor = None
+        self.__stopZygote()
+        g_logger.debug('stopped worker processes in pool %s', self.name)
+        return True
+
+    def slotForKey(self, key):
+        """Return the worker process index used for the given key
+
+        Args:
+            key: the hashable key of the job
+        Returns:
+            the index of the worker process as integer
+        """
+        return hash(key) % self.__size
+
+    def pids(self):
+        """Return the pid of each worker process
+
+        Returns:
+            the list of pids ordered by slot index
+        """
+        return [slot['pid'] for slot in self.__slots]
+
+    def submit(self, key, payload, job=None, block=True):
+        """Send a payload to the worker process associated with the given key
+
+        Args:
+            key: the hashable key used to select the worker process
+            payload: the picklable object given to the target
+            job: the object given back to the done callback with the result
+            block: if False, do not wait when the worker process queue is full
+        Returns:
+            True if the payload has been sent, False if the queue is full
+        """
+        slot = self.__slots[self.slotForKey(key)]
+        # the send lock keep the order of payloads sent to the same slot
+        with slot['send_lock']:
+            with self.__cond:
+                while self.__queue_size and len(slot['pending']) >= self.__queue_size:
+                    if not block:
+                        return False
+                    self.__cond.wait()
+                self.__last_id += 1
+                job_id = self.__last_id
+                slot['pending'][job_id] = job
+            try:
+                slot['conn'].send((job_id, payload))
+            except (OSError, ValueError) as ex:
+                g_logger.error('unable to send job to worker process of pool %s : %s',
+                               self.name, str(ex))
+                with self.__cond:
+                    lost = job_id in slot['pending']
+                    slot['pending'].pop(job_id, None)
+                    self.__cond.notify_all()
+                if lost:
+                    self.__done(job, None)
+        return True
+
+    def qsize(self):
+        """Return the number of jobs sent to worker processes and not yet done
+
+        Returns:
+            the number of pending jobs
+        """
+        with self.__cond:
+            return sum(len(slot['pending']) for slot in self.__slots)
+
+    def __spawn(self, index):
+        """Ask the zygote to fork the worker process of the given slot
+
+        The worker's end of the pipe is given to the zygote, which is
+        the only other process that holds it until the fork
+
+        Args:
+            index: the index of the slot
+        Returns:
+            True if the worker process has been forked
+        """
+        slot = self.__slots[index]
+        parent_conn, child_conn = self.__context.Pipe()
+        try:
+            with self.__zygote_lock:
+                self.__zygote_conn.send(index)
+                multiprocessing.reduction.send_handle(self.__zygote_conn,
+                                                      child_conn.fileno(),
+                                                      self.__zygote.pid)
+                pid = self.__zygote_conn.recv()
+        except (EOFError, OSError, ValueError) as ex:
+            g_logger.error('unable to fork worker process %d of pool %s : %s',
+                           index, self.name, str(ex))
+            parent_conn.close()
+            return False
+        finally:
+            child_conn.close()
+        slot['conn'] = parent_conn
+        slot['pid'] = pid
+        g_logger.debug('forked worker process %d of pool %s with pid %d',
+                       index, self.name, pid)
+        return True
+
+    def __stopZygote(self):
+        """Stop the zygote process
+        """
+        if self.__zygote is None:
+            return
+        with self.__zygote_lock:
+            try:
+                self.__zygote_conn.send(None)
+            except (OSError, ValueError):
+                pass
+            self.__zygote.join()
+            self.__zygote_conn.close()
+            self.__zygote = None
+
+    def __runZygote(self, conn):
+        """Main loop of the zygote process
+
+        Fork a worker process for each received worker's end of pipe
+
+        Args:
+            conn: the connection from which to receive the requests
+        """
+        # the parent process handles the interruption from terminal
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        # let the system reap the exited worker processes
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        while True:
+            try:
+                index = conn.recv()
+            except EOFError:
+                return
+            if index is None:
+                return
+            fd = multiprocessing.reduction.recv_handle(conn)
+            pid = os.fork()
+            if pid == 0:
+                conn.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                code = 1
+                try:
+                    self.__runWorker(multiprocessing.connection.Connection(fd))
+                    code = 0
+                except Exception as ex:
+                    g_logger.exception('unhandled error in worker process %d of pool %s : %s',
+                                       index, self.name, str(ex))
+                finally:
+                    logging.shutdown()
+                    os._exit(code)
+            os.close(fd)
+            conn.send(pid)
+
+    def __runWorker(self, conn):
+        """Main loop of each worker process
+
+        Args:
+            conn: the connection from which to receive payloads
+        """
+        if self.__initializer and not self.__initializer():
+            g_logger.fatal('unable to initialize worker process of pool %s', self.name)
+            return
+        try:
+            while True:
+                try:
+                    message = conn.recv()
+                except EOFError:
+                    break
+                if message is None:
+                    break
+                job_id, payload = message
+                try:
+                    result = self.__target(payload)
+                except Exception as ex:
+                    g_logger.exception('unhandled error in worker process of pool %s : %s',
+                                       self.name,
+                                       str(ex))
+                    result = None
+                conn.send((job_id, result))
+        finally:
+            if self.__finalizer:
+                self.__finalizer()
+
+    def __supervise(self):
+        """Main loop of the supervisor thread
+
+        Dispatch results of worker processes and restart dead ones
+        """
+        alive = set(range(self.__size))
+        while alive:
+            conns = dict((self.__slots[index]['conn'], index) for index in alive)
+            ready = multiprocessing.connection.wait(list(conns), timeout=1)
+            for conn in ready:
+                index = conns[conn]
+                # the pipe is closed when the worker process exits
+                if not self.__receive(index) and not self.__onWorkerExit(index):
+                    alive.discard(index)
+
+    def __receive(self, index):
+        """Receive one result from the worker process of the given slot
+
+        Args:
+            index: the index of the slot
+        Returns:
+            True if a result has been received
+        """
+        slot = self.__slots[index]
+        try:
+            job_id, result = slot['conn'].recv()
+        except (EOFError, OSError):
+            return False
+        with self.__cond:
+            job = slot['pending'].pop(job_id, None)
+            self.__cond.notify_all()
+        self.__done(job, result)
+        return True
+
+    def __onWorkerExit(self, index):
+        """Handle the exit of a worker process
+
+        Args:
+            index: the index of the slot
+        Returns:
+            True if the worker process has been restarted
+        """
+        slot = self.__slots[index]
+        with self.__cond:
+            lost = list(slot['pending'].values())
+            slot['pending'].clear()
+            self.__cond.notify_all()
+        restart = not self.__stopping
+        if restart:
+            g_logger.error(('worker process %d of pool %s with pid %d exited,'
+                            ' %d jobs lost, restarting'),
+                           index, self.name, slot['pid'], len(lost))
+            if self.__metrics:
+                self.__metrics.counter('{}.restart.total'.format(self.name), labels=dict())
+            with slot['send_lock']:
+                slot['conn'].close()
+                restart = self.__spawn(index)
+                # stop() may have been called during the restart
+                if restart and self.__stopping:
+                    slot['conn'].send(None)
+        else:
+            slot['conn'].close()
+
+        for job in lost:
+            self.__done(job, None)
+        return restart
+
+    def __done(self, job, result):
+        """Give back a job and its result to the done callback
+
+        Args:
+            job: the job object given to submit()
+            result: the value returned by the target or None
+        """
+        if not self.__done_callback:
+            return
+        try:
+            self.__done_callback(job, result)
+        except Exception as ex:
+            g_logger.exception('unhandled error in done callback of pool %s : %s',
+                               self.name,
+                               str(ex))
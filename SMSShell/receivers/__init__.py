@@ -21,11 +21,18 @@
 """
 
 # System import
+import logging
+import threading
 import time
+# asyncio is only imported by asyncio related functions
+# because it is slow to import and useless in standalone mode
 
 # Project imports
 from ..abstract import AbstractModule
 
+# Global project declarations
+g_logger = logging.getLogger('smsshell.receivers')
+
 
 class AbstractReceiver(AbstractModule):
     """An abstract receiver
@@ -57,6 +64,123 @@ class AbstractReceiver(AbstractModule):
         raise NotImplementedError("You must implement the 'read' method in receiver class")
 
 
+class AbstractAsyncReceiver(AbstractModule):
+    """An abstract asyncio receiver
+
+    Any valid asyncio receiver implementation must inherit this one
+    All methods are coroutines run by the daemon event loop
+
+    Attributes:
+        queue_size: the maximum number of received requests waiting to be
+                    read, the receiver stops reading its clients when it is
+                    reached. 0 means unlimited
+    """
+
+    queue_size = 0
+
+    def setQueueSize(self, size):
+        """Set the maximum number of received requests waiting to be read
+
+        It must be called before start()
+
+        Args:
+            size: the maximum number of requests, 0 means unlimited
+        """
+        self.queue_size = size
+
+    async def start(self):
+        """Prepare the receiver/init connections
+
+        Returns:
+            True if init has success, otherwise False
+        """
+        raise NotImplementedError("You must implement the 'start' method in receiver class")
+
+    async def stop(self):
+        """Close properly the receiver, flush, close connections
+
+        Returns:
+            True if stop has success, otherwise False
+        """
+        raise NotImplementedError("You must implement the 'stop' method in receiver class")
+
+    async def read(self):
+        """Wait for the next client request
+
+        Returns:
+            an AbstractClientRequest instance
+        """
+        raise NotImplementedError("You must implement the 'read' method in receiver class")
+
+
+class AsyncReceiverAdapter(AbstractAsyncReceiver):
+    """Run a synchronous receiver behind the asyncio receiver interface
+
+    The blocking read() iterable of the receiver is consumed by a dedicated
+    thread which forwards each client request to the event loop
+    """
+
+    def __init__(self, receiver, executor=None):
+        """Constructor :
+
+        Args:
+            receiver : the AbstractReceiver instance to wrap
+            executor : the executor used to run start and stop
+        """
+        assert isinstance(receiver, AbstractReceiver)
+        self.__receiver = receiver
+        self.__executor = executor
+        self.__loop = None
+        self.__requests = None
+        super().__init__(config=receiver.config, metrics=receiver.metrics)
+
+    async def start(self):
+        """Start the wrapped receiver and its reader thread
+
+        Returns:
+            True if init has success, otherwise False
+        """
+        import asyncio
+        self.__loop = asyncio.get_event_loop()
+        self.__requests = asyncio.Queue(maxsize=self.queue_size)
+        if not await self.__loop.run_in_executor(self.__executor, self.__receiver.start):
+            return False
+        reader = threading.Thread(target=self.__readInThread, name='receiver-reader')
+        reader.daemon = True
+        reader.start()
+        return True
+
+    async def stop(self):
+        """Stop the wrapped receiver
+
+        Returns:
+            True if stop has success, otherwise False
+        """
+        return await self.__loop.run_in_executor(self.__executor, self.__receiver.stop)
+
+    async def read(self):
+        """Wait for the next client request of the wrapped receiver
+
+        Returns:
+            an AbstractClientRequest instance
+        """
+        return await self.__requests.get()
+
+    def __readInThread(self):
+        """Forward all client requests from the wrapped receiver to the loop
+
+        The thread stops reading the wrapped receiver while the queue is full
+        """
+        import asyncio
+        try:
+            for request in self.__receiver.read():
+                asyncio.run_coroutine_threadsafe(self.__requests.put(request),
+                                                 self.__loop).result()
+        except (OSError, ValueError) as ex:
+            # the receiver has been closed under our feet
+            g_logger.debug('receiver reader thread stopped : %s', str(ex))
+
+
 class AbstractClientRequest(object):
     """This class is a wrapper to client request handling
 
@@ -91,6 +215,14 @@ class AbstractClientRequest(object):
         """
         self.__treatment_chain.append((state_name, time.time()))
 
+    def extendTreatmentChain(self, steps):
+        """Append treatment steps recorded by another client request
+
+        Args:
+            steps : the list of treatment steps with their timestamp
+        """
+        self.__treatment_chain.extend(steps)
+
     def getTreatmentChain(self):
         """Get the list of treatment steps
 
@@ -153,3 +285,18 @@ class AbstractClientRequest(object):
     def __exit__(self, _type, value, traceback):
         self.__is_in_context = False
         self.exit()
+
+
+class DetachedClientRequest(AbstractClientRequest):
+    """Client request which only record the treatment of a message
+
+    It is used where the real client request is not reachable, for
+    example in worker processes, its recorded treatment chain and response
+    datas must be given back to the real client request
+    """
+
+    def enter(self):
+        pass
+
+    def exit(self):
+        pass
@@ -21,6 +21,15 @@
 
 This receiver create an input fifo on start, and read message from
 it
+
+With the default 'none' framing, the fifo is opened for each writer and all
+the data written until the writer closes the fifo is one message.
+Concurrent writers may be merged into one message.
+
+With 'newline' or 'length' framing (see utils.framing), the fifo is kept
+open and read as a stream of messages. Many writers can write at the same
+time as long as each message is written with one write call of at most
+PIPE_BUF bytes, because the system only keeps such writes atomic.
 """
 
 # System imports
@@ -30,10 +39,15 @@ import stat
 
 # Project import
 from . import AbstractReceiver, AbstractClientRequest
+from ..utils.framing import (FRAMING_MAP, DEFAULT_MAX_FRAME_SIZE,
+                             FrameDecoder, FrameTooLargeException)
 
 # Global project declarations
 g_logger = logging.getLogger('smsshell.receivers.fifo')
 
+# the maximum number of bytes read from the fifo at once
+READ_SIZE = 65536
+
 
 class ClientRequest(AbstractClientRequest):
     """Client request for fifo receiver
@@ -57,6 +71,19 @@ class Receiver(AbstractReceiver):
         """Init
         """
         self.__path = self.getConfig('path', fallback="/var/run/smsshell.fifo")
+        self.__fd = None
+        self.__framing = self.getConfig('framing', fallback='none')
+        if self.__framing not in FRAMING_MAP:
+            g_logger.error("invalid framing '%s', it must be in %s, fallback to none",
+                           self.__framing, FRAMING_MAP)
+            self.__framing = 'none'
+        try:
+            self.__max_frame_size = int(self.getConfig('max_frame_size',
+                                                       fallback=DEFAULT_MAX_FRAME_SIZE))
+        except ValueError:
+            self.__max_frame_size = DEFAULT_MAX_FRAME_SIZE
+            g_logger.error(("invalid integer parameter for option 'max_frame_size',"
+                            " fallback to default value %d"), DEFAULT_MAX_FRAME_SIZE)
 
     def start(self):
         """Start the socket (FIFO) runner
@@ -93,6 +120,9 @@ class Receiver(AbstractReceiver):
         Returns:
             a boolean that indicates the successful of the stop operation
         """
+        if self.__fd is not None:
+            os.close(self.__fd)
+            self.__fd = None
         try:
             os.unlink(self.__path)
         except OSError:
@@ -107,6 +137,51 @@ class Receiver(AbstractReceiver):
             Iterable
         """
         g_logger.info('Reading from fifo %s', self.__path)
+        if self.__framing != 'none':
+            yield from self.__readStream()
+            return
         while True:
-            with open(self.__path) as fifo:
-                yield ClientRequest(request_data=fifo.read())
+            with open(self.__path, 'rb') as fifo:
+                request_data = self.__decode(fifo.read())
+            if request_data is not None:
+                yield ClientRequest(request_data=request_data)
+
+    def __readStream(self):
+        """Return a read blocking iterable object for each frame in the fifo
+
+        The fifo is opened once for both reading and writing, so it never
+        reaches the end of file when the last writer closes it
+
+        Return:
+            Iterable
+        """
+        self.__fd = os.open(self.__path, os.O_RDWR)
+        decoder = FrameDecoder(self.__framing, self.__max_frame_size)
+        while self.__fd is not None:
+            data = os.read(self.__fd, READ_SIZE)
+            g_logger.debug('get %d bytes of data from fifo', len(data))
+            try:
+                frames = decoder.feed(data)
+            except FrameTooLargeException as ex:
+                g_logger.error('drop data from fifo because of a bad frame : %s', str(ex))
+                frames = ex.frames
+            for frame in frames:
+                g_logger.info('get a message of %d bytes from fifo', len(frame))
+                request_data = self.__decode(frame)
+                if request_data is not None:
+                    yield ClientRequest(request_data=request_data)
+
+    @staticmethod
+    def __decode(data):
+        """Decode a message read from the fifo
+
+        Args:
+            data: the message as bytes
+        Returns:
+            the message as string or None if it is not valid UTF-8
+        """
+        try:
+            return data.decode()
+        except UnicodeDecodeError as ex:
+            g_logger.error('drop data from fifo because of an invalid message : %s', str(ex))
+            return None
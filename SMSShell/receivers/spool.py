@@ -0,0 +1,355 @@
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+"""Message receiver from the inbox directory of gammu-smsd
+
+This receiver watches the inbox directory of the gammu-smsd files backend
+and decodes each new backup file in process, so gammu-smsd does not have
+to run a client for each received message.
+
+New files are detected with inotify, or by scanning the directory
+periodically if inotify is not available. Files that arrive together are
+read as one batch, in the order of their names.
+Each file is moved to the done directory once its message is treated,
+or to the error directory if it cannot be decoded or parsed or if its
+treatment reported an error. Both directories must be on the same file
+system as the inbox to be moved atomically.
+The files of messages rejected because the daemon is busy are left in
+the inbox and read again after poll_interval seconds.
+
+Messages are given to the message parser as JSON objects.
+"""
+
+# System imports
+import fnmatch
+import json
+import logging
+import os
+import select
+import threading
+import time
+
+# Project import
+from . import AbstractReceiver, AbstractClientRequest
+from ..utils import GammuSMSParser
+from ..utils import gammusmsdparser
+from ..utils import inotify
+
+# Global project declarations
+g_logger = logging.getLogger('smsshell.receivers.spool')
+
+WATCH_MAP = ['auto', 'inotify', 'poll']
+# these decoding errors prevent the message to be treated
+FATAL_DECODE_ERRORS = [GammuSMSParser.ERROR_BACKUP_FILE,
+                       GammuSMSParser.ERROR_PYTHON,
+                       GammuSMSParser.ERROR_NO_CONTENT]
+
+
+class ClientRequest(AbstractClientRequest):
+    """Client request for spool receiver
+
+    The answer of the request decides where the file is moved,
+    the file of a rejected message is left in the inbox to be retried
+    """
+
+    def __init__(self, receiver, name, **kwargs):
+        super().__init__(**kwargs)
+        self.__receiver = receiver
+        self.__name = name
+
+    def enter(self):
+        pass
+
+    def exit(self):
+        """Move the file of the message according to its treatment
+        """
+        response_data = self.popResponseData()
+        steps = [step for step, _ in self.getTreatmentChain()]
+        if 'rejected' in steps:
+            g_logger.warning("the message of file '%s' has been rejected, it will be retried",
+                             self.__name)
+            self.__receiver.releaseFile(self.__name)
+            return
+        parsed = 'parsed' in steps
+        if 'error' in response_data:
+            g_logger.error("the message of file '%s' failed : %s",
+                           self.__name, response_data['error'])
+        self.__receiver.moveFile(self.__name, parsed and 'error' not in response_data)
+
+
+class Receiver(AbstractReceiver):
+    """Receiver class, see module docstring for help
+    """
+
+    def init(self):
+        """Init function
+        """
+        self.__path = self.getConfig('path', fallback='/var/spool/gammu/inbox/')
+        self.__done_path = self.getConfig('done_path',
+                                          fallback=os.path.join(self.__path, 'done'))
+        self.__error_path = self.getConfig('error_path',
+                                           fallback=os.path.join(self.__path, 'error'))
+        self.__pattern = self.getConfig('pattern', fallback='IN*')
+        self.__watch = self.getConfig('watch', fallback='auto')
+        if self.__watch not in WATCH_MAP:
+            g_logger.error("invalid watch '%s', it must be in %s, fallback to auto",
+                           self.__watch, WATCH_MAP)
+            self.__watch = 'auto'
+        self.__poll_interval = self.__getFloatConfig('poll_interval', 1.0)
+        self.__batch_delay = self.__getFloatConfig('batch_delay', 0.1)
+        try:
+            self.__batch_size = int(self.getConfig('batch_size', fallback=100))
+        except ValueError:
+            self.__batch_size = 100
+            g_logger.error(("invalid integer parameter for option 'batch_size',"
+                            " fallback to default value 100"))
+
+        self.__inotify = None
+        # files read but not yet moved, and files released to be retried
+        # with the time after which they can be read again, the lock protect
+        # them against client requests closed by workers threads
+        self.__pending = set()
+        self.__retry = dict()
+        self.__pending_lock = threading.Lock()
+        # True when the directory must be scanned to find files
+        self.__rescan = True
+
+    def __getFloatConfig(self, key, fallback):
+        """Return a float configuration value
+
+        Args:
+            key: the name of the configuration option
+            fallback: the value to return if the option is not found or not valid
+        Returns:
+            the float value
+        """
+        try:
+            return float(self.getConfig(key, fallback=fallback))
+        except ValueError:
+            g_logger.error("invalid float parameter for option '%s', fallback to default value %s",
+                           key, fallback)
+            return fallback
+
+    def start(self):
+        """Start to watch the inbox directory
+
+        Returns:
+            a boolean that indicates the successful of the start operation
+        """
+        if not (os.path.isdir(self.__path) and os.access(self.__path, os.R_OK|os.W_OK|os.X_OK)):
+            g_logger.fatal('Unsufficients permissions into inbox directory %s', self.__path)
+            return False
+        for directory in [self.__done_path, self.__error_path]:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError as ex:
+                g_logger.fatal('Unable to create directory %s : %s', directory, str(ex))
+                return False
+            if os.stat(directory).st_dev != os.stat(self.__path).st_dev:
+                g_logger.warning(('directory %s is not on the file system of the inbox,'
+                                  ' files will not be moved atomically'), directory)
+        if gammusmsdparser.gammu is None:
+            # every file would be moved to the error directory
+            g_logger.fatal('the gammu package is not available to decode backup files')
+            return False
+
+        if self.__watch != 'poll':
+            try:
+                self.__inotify = inotify.Inotify()
+                self.__inotify.addWatch(self.__path,
+                                        inotify.IN_CLOSE_WRITE | inotify.IN_MOVED_TO |
+                                        inotify.IN_ONLYDIR)
+            except OSError as ex:
+                if self.__inotify is not None:
+                    self.__inotify.close()
+                    self.__inotify = None
+                if self.__watch == 'inotify':
+                    g_logger.fatal('Unable to watch the inbox directory : %s', str(ex))
+                    return False
+                g_logger.warning('inotify is not available, fallback to polling : %s', str(ex))
+        g_logger.info('Spool receiver ready to watch %s using %s', self.__path,
+                      'inotify' if self.__inotify else 'polling')
+        self.__rescan = True
+        return True
+
+    def stop(self):
+        """Stop to watch the inbox directory
+
+        Returns:
+            a boolean that indicates the successful of the stop operation
+        """
+        g_logger.info('Closing spool receiver')
+        if self.__inotify is not None:
+            self.__inotify.close()
+            self.__inotify = None
+        return True
+
+    def read(self):
+        """Return a read blocking iterable object for each file in the inbox
+
+        Returns:
+            Iterable
+        """
+        g_logger.info('Reading from inbox %s', self.__path)
+        while True:
+            for name in self.__waitBatch():
+                request = self.__newRequest(name)
+                if request is not None:
+                    yield request
+
+    def moveFile(self, name, success):
+        """Move a file out of the inbox
+
+        Args:
+            name: the name of the file in the inbox
+            success: True to move the file into the done directory,
+                        False to move it into the error directory
+        """
+        directory = self.__done_path if success else self.__error_path
+        try:
+            os.rename(os.path.join(self.__path, name), os.path.join(directory, name))
+        except OSError as ex:
+            g_logger.error("unable to move file '%s' to %s : %s", name, directory, str(ex))
+        else:
+            g_logger.debug("moved file '%s' to %s", name, directory)
+        with self.__pending_lock:
+            self.__pending.discard(name)
+
+    def releaseFile(self, name):
+        """Leave a file in the inbox to read it again later
+
+        The file is read again after poll_interval seconds
+
+        Args:
+            name: the name of the file in the inbox
+        """
+        with self.__pending_lock:
+            self.__pending.discard(name)
+            self.__retry[name] = time.monotonic() + self.__poll_interval
+            # released files do not produce new inotify events
+            self.__rescan = True
+
+    def __newRequest(self, name):
+        """Decode a file and build its client request
+
+        Args:
+            name: the name of the file in the inbox
+        Returns:
+            the client request, None if the file cannot be decoded
+        """
+        path = os.path.join(self.__path, name)
+        with self.__pending_lock:
+            # released files are read again by a scan once they are due
+            if name in self.__pending or name in self.__retry:
+                return None
+            # inotify events may be read after the file has been found
+            # by a scan, treated and moved out of the inbox
+            if not os.path.exists(path):
+                g_logger.debug("file '%s' is no longer in the inbox", name)
+                return None
+            self.__pending.add(name)
+
+        message = GammuSMSParser.decodeFromBackupFilePath(path)
+        errors = message.pop('errors', [])
+        for error_type, error_message in errors:
+            g_logger.warning("file '%s' decoded with error %s : %s",
+                             name, error_type, error_message)
+        if any(error_type in FATAL_DECODE_ERRORS for error_type, _ in errors):
+            self.moveFile(name, False)
+            return None
+        g_logger.info("get a message from file '%s'", name)
+        request = ClientRequest(receiver=self,
+                                name=name,
+                                request_data=json.dumps(message))
+        request.appendTreatmentChain('received')
+        return request
+
+    def __waitBatch(self):
+        """Wait for new files in the inbox
+
+        Returns:
+            the sorted list of new files names
+        """
+        if self.__inotify is None:
+            names = self.__scan()
+            if not names:
+                time.sleep(self.__poll_interval)
+            return names
+
+        if self.__rescan:
+            names = self.__scan()
+            with self.__pending_lock:
+                # files which do not fit in this batch or which are released
+                # will not produce inotify events, keep scanning until all
+                # of them have been read
+                self.__rescan = len(names) >= self.__batch_size or bool(self.__retry)
+            if names:
+                return names
+
+        # wait for the first file, then for the ones which arrive with it
+        names = set()
+        timeout = self.__poll_interval
+        while len(names) < self.__batch_size:
+            ready, _, _ = select.select([self.__inotify], [], [], timeout)
+            if not ready:
+                break
+            for _, mask, _, name in self.__inotify.read():
+                if mask & inotify.IN_Q_OVERFLOW:
+                    g_logger.warning('inotify queue overflowed, scanning the inbox')
+                    self.__rescan = True
+                elif name and fnmatch.fnmatch(name, self.__pattern):
+                    names.add(name)
+            timeout = self.__batch_delay
+        # after an overflow, the other files are found by the next scan
+        return sorted(names)
+
+    def __scan(self):
+        """List the files of the inbox
+
+        The files modified recently may be not yet completely written,
+        they will be found by the next scan or by their inotify event
+
+        Returns:
+            the sorted list of files names which are not being treated
+                and which are not waiting to be retried
+        """
+        names = []
+        min_mtime = time.time() - self.__batch_delay
+        now = time.monotonic()
+        with self.__pending_lock:
+            for name, retry_at in list(self.__retry.items()):
+                if retry_at <= now:
+                    del self.__retry[name]
+            pending = self.__pending | set(self.__retry)
+        try:
+            entries = list(os.scandir(self.__path))
+        except OSError as ex:
+            g_logger.error('unable to scan inbox directory : %s', str(ex))
+            return names
+        for entry in entries:
+            if entry.name in pending or not fnmatch.fnmatch(entry.name, self.__pattern):
+                continue
+            try:
+                if not entry.is_file() or entry.stat().st_mtime > min_mtime:
+                    continue
+            except OSError:
+                continue
+            names.append(entry.name)
+        names.sort()
+        return names[:self.__batch_size]
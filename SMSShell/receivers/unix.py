@@ -21,6 +21,21 @@
 
 This receiver open an unix socket locally on the local host
 and listen for incoming message on it
+
+By default each read on a connection is one message, as sent by the
+clients which write one message and wait for its acknowledgment.
+With the newline or length framing (see utils.framing), clients can send
+many messages over one connection, each message is a frame. Each message
+is acknowledged by a JSON object sent back using the same framing.
+
+Clients do not have to wait for an acknowledgment before to send the next
+message. Messages of one connection are numbered from 1 in their sending
+order and each acknowledgment contains the number of its message in the 'id'
+key, because acknowledgments are sent as soon as messages are treated and
+may be received in a different order.
+Acknowledgments are buffered and written without blocking, the connection
+is closed once the client has closed its side and all its messages have
+been acknowledged.
 """
 
 # System imports
@@ -30,23 +45,34 @@ import os
 import selectors
 import socket
 import stat
+import threading
+# asyncio is only imported by asyncio related functions
+# because it is slow to import and useless in standalone mode
 
 # Project import
-from . import AbstractReceiver, AbstractClientRequest
+from . import AbstractReceiver, AbstractAsyncReceiver, AbstractClientRequest
 from ..utils import groupToGid
+from ..utils.framing import (FRAMING_MAP, DEFAULT_MAX_FRAME_SIZE,
+                             FrameDecoder, FrameTooLargeException, encodeFrame)
 
 # Global project declarations
 g_logger = logging.getLogger('smsshell.receivers.unix')
 
+# the maximum number of bytes read from a client socket at once
+READ_SIZE = 65536
+# stop reading from a client which has more bytes than this waiting to be written
+OUTPUT_HIGH_WATER = 1048576
+
 
 class ClientRequest(AbstractClientRequest):
     """Client request for unix receiver
     """
 
-    def __init__(self, receiver, client_socket, **kwargs):
+    def __init__(self, receiver, client_socket, request_id, **kwargs):
         super().__init__(**kwargs)
         self.__receiver = receiver
         self.__client_socket = client_socket
+        self.addResponseData(id=request_id)
 
     def enter(self):
         pass
@@ -57,7 +83,34 @@ class ClientRequest(AbstractClientRequest):
         assert self.__client_socket
         response_data = self.popResponseData()
         response_data['chain'] = self.getTreatmentChain()
-        self.__receiver.writeToClient(self.__client_socket, json.dumps(response_data))
+        self.__receiver.writeToClient(self.__client_socket, json.dumps(response_data),
+                                      acknowledgment=True)
+
+
+class AsyncClientRequest(AbstractClientRequest):
+    """Client request for asyncio unix receiver
+    """
+
+    def __init__(self, writer, framing, request_id, done_callback=None, **kwargs):
+        super().__init__(**kwargs)
+        self.__writer = writer
+        self.__framing = framing
+        self.__done_callback = done_callback
+        self.addResponseData(id=request_id)
+
+    def enter(self):
+        pass
+
+    def exit(self):
+        """Pop all answer data and buffer them into the client stream
+        """
+        response_data = self.popResponseData()
+        response_data['chain'] = self.getTreatmentChain()
+        # StreamWriter.is_closing() is only available from python 3.7
+        if not self.__writer.transport.is_closing():
+            self.__writer.write(encodeFrame(self.__framing, json.dumps(response_data)))
+        if self.__done_callback:
+            self.__done_callback()
 
 
 class Receiver(AbstractReceiver):
@@ -70,6 +123,8 @@ class Receiver(AbstractReceiver):
         # Keeps track of the peers currently connected. Maps socket fd to
         # peer name.
         self.__current_peers = dict()
+        # answers may be written by workers threads
+        self.__peers_lock = threading.Lock()
 
         # Internal items that will be inits later
         self.__socket_selector = selectors.DefaultSelector()
@@ -86,24 +141,109 @@ class Receiver(AbstractReceiver):
             self.__listen_queue = 10
             g_logger.error(("invalid integer parameter for option 'listen_queue',"
                             " fallback to default value 10"))
+        self.__framing = self.getConfig('framing', fallback='none')
+        if self.__framing not in FRAMING_MAP:
+            g_logger.error("invalid framing '%s', it must be in %s, fallback to none",
+                           self.__framing, FRAMING_MAP)
+            self.__framing = 'none'
+        try:
+            self.__max_frame_size = int(self.getConfig('max_frame_size',
+                                                       fallback=DEFAULT_MAX_FRAME_SIZE))
+        except ValueError:
+            self.__max_frame_size = DEFAULT_MAX_FRAME_SIZE
+            g_logger.error(("invalid integer parameter for option 'max_frame_size',"
+                            " fallback to default value %d"), DEFAULT_MAX_FRAME_SIZE)
+
+    @property
+    def framing(self):
+        """Return the framing used on client connections
+
+        Returns:
+            the framing name
+        """
+        return self.__framing
 
-    def writeToClient(self, client_socket, data):
-        """Write data to client
+    def newFrameDecoder(self):
+        """Build the frames decoder of a new client connection
+
+        Returns:
+            a FrameDecoder instance
+        """
+        return FrameDecoder(self.__framing, self.__max_frame_size)
+
+    def writeToClient(self, client_socket, data, acknowledgment=False):
+        """Write one frame of data to client without blocking
+
+        The part of the frame that cannot be written immediately is buffered
+        and written by the reading loop when the socket becomes writable
 
         Args:
             client_socket : the socket used to write data
             data : bytes or string to write to client
+            acknowledgment : True if data is the acknowledgment of a message
         """
-        if not isinstance(data, bytes):
-            data = data.encode()
+        with self.__peers_lock:
+            peer = self.__current_peers.get(client_socket.fileno())
+            if peer is None or peer['sock'] is not client_socket:
+                g_logger.warning('client connection is closed, drop %d bytes of data', len(data))
+                return
+            if acknowledgment:
+                peer['inflight'] -= 1
+            peer['output'].extend(encodeFrame(self.__framing, data))
+            self.__flush(peer)
 
-        try:
-            client_socket.send(data)
-        except ConnectionError as ex:
-            g_logger.warning('client connection with FD %s raise connection error : %s',
-                             client_socket.fileno(),
-                             str(ex))
-            self.__closeConnection(client_socket)
+    def __flush(self, peer):
+        """Write as much buffered data as possible to a client
+
+        Must be called with the peers lock held
+
+        Args:
+            peer : the peer dict of the client
+        """
+        client_socket = peer['sock']
+        if peer['output']:
+            try:
+                sent = client_socket.send(peer['output'])
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            except OSError as ex:
+                g_logger.warning('client connection with FD %s raise connection error : %s',
+                                 client_socket.fileno(),
+                                 str(ex))
+                self.__close(peer)
+                return
+            del peer['output'][:sent]
+        self.__updateEvents(peer)
+
+    def __updateEvents(self, peer):
+        """Register the client socket for the events it is waiting for
+
+        Close the connection if the client has nothing more to wait for
+
+        Must be called with the peers lock held
+
+        Args:
+            peer : the peer dict of the client
+        """
+        events = 0
+        if not peer['eof'] and len(peer['output']) < OUTPUT_HIGH_WATER:
+            events |= selectors.EVENT_READ
+        if peer['output']:
+            events |= selectors.EVENT_WRITE
+        if not events and not peer['inflight']:
+            self.__close(peer)
+            return
+        if events == peer['events']:
+            return
+        if not peer['events']:
+            self.__socket_selector.register(fileobj=peer['sock'],
+                                            events=events,
+                                            data=self.__onRead)
+        elif not events:
+            self.__socket_selector.unregister(peer['sock'])
+        else:
+            self.__socket_selector.modify(peer['sock'], events, data=self.__onRead)
+        peer['events'] = events
 
     def __onAccept(self, server_socket, mask):
         """Call each time a new client connection occur
@@ -117,13 +257,24 @@ class Receiver(AbstractReceiver):
         # disable blocking on client socket
         client_socket.setblocking(0)
         # Register incoming client with metadatas in tracking dict
-        assert client_socket.fileno() not in self.__current_peers
-        self.__current_peers[client_socket.fileno()] = dict(sock=client_socket)
-
-        # register socket into the selector
-        self.__socket_selector.register(fileobj=client_socket,
-                                        events=selectors.EVENT_READ,
-                                        data=self.__onRead)
+        with self.__peers_lock:
+            assert client_socket.fileno() not in self.__current_peers
+            peer = dict(sock=client_socket,
+                        decoder=self.newFrameDecoder(),
+                        # the number of the last received message
+                        last_id=0,
+                        # the number of messages not yet acknowledged
+                        inflight=0,
+                        # the data not yet written to client
+                        output=bytearray(),
+                        # True once the client has closed its side
+                        eof=False,
+                        # the events for which the socket is registered
+                        events=0)
+            self.__current_peers[client_socket.fileno()] = peer
+
+            # register socket into the selector
+            self.__updateEvents(peer)
         g_logger.info('accepted new client with FD %d on unix socket', client_socket.fileno())
 
     def __onRead(self, client_socket, mask):
@@ -131,62 +282,134 @@ class Receiver(AbstractReceiver):
 
         Args:
             client_socket: the source client socket
+            mask: the selector events of the socket
+        Returns:
+            the list of client requests of all complete frames
         """
+        with self.__peers_lock:
+            peer = self.__current_peers.get(client_socket.fileno())
+            if peer is None or peer['sock'] is not client_socket:
+                return None
+            if mask & selectors.EVENT_WRITE:
+                self.__flush(peer)
+            if not mask & selectors.EVENT_READ or peer['eof']:
+                return None
+
         try:
-            request_data = client_socket.recv(1000)
-        except ConnectionError as ex:
+            data = client_socket.recv(READ_SIZE)
+        except (BlockingIOError, InterruptedError):
+            return None
+        except OSError as ex:
             g_logger.warning('client connection with FD %s raise connection error : %s',
                              client_socket.fileno(),
                              str(ex))
-            self.__closeConnection(client_socket)
+            with self.__peers_lock:
+                self.__close(peer)
             return None
 
         # If there is no data, the socket must have been closed from client side
-        if not request_data:
-            self.__closeConnection(client_socket)
-            return None
+        # the last message may not be terminated by its frame delimiter
+        if not data:
+            requests = self.__newRequests(peer, peer['decoder'].flush())
+            with self.__peers_lock:
+                self.__shutdown(peer)
+            return requests
 
         # if these is data, that mean client has send some bytes to read
-        # receive the data
-        g_logger.info('get %d bytes of data from client socket with FD %d',
-                      len(request_data),
-                      client_socket.fileno())
-        g_logger.debug('get data from FD %d: %s',
-                       client_socket.fileno(),
-                       request_data)
-        # decode data
-        raw_request_data_length = len(request_data)
-        if not isinstance(request_data, str):
-            request_data = request_data.decode()
-
-        # prepare client request context
-        request = ClientRequest(receiver=self,
-                                client_socket=client_socket,
-                                request_data=request_data)
-        # append a simple ACK to client next datas
-        # to confirm all is OK
-        g_logger.debug('send ACK to FD %d for %d bytes of data',
-                       client_socket.fileno(),
-                       raw_request_data_length)
-        request.addResponseData(received_length=raw_request_data_length)
-        request.appendTreatmentChain('received')
-
-        return request
-
-    def __closeConnection(self, client_socket):
-        """Call each time a socket is closed
-
-        Flush and close properly client socket
+        g_logger.debug('get %d bytes of data from client socket with FD %d',
+                       len(data),
+                       client_socket.fileno())
+        try:
+            frames = peer['decoder'].feed(data)
+        except FrameTooLargeException as ex:
+            g_logger.error('client socket with FD %d sent a bad frame : %s',
+                           client_socket.fileno(),
+                           str(ex))
+            requests = self.__newRequests(peer, ex.frames)
+            self.writeToClient(client_socket, json.dumps(dict(error=str(ex))))
+            with self.__peers_lock:
+                self.__shutdown(peer)
+            return requests
+        return self.__newRequests(peer, frames)
+
+    def __newRequests(self, peer, frames):
+        """Build the client requests of frames received from a client
+
+        Frames which are not valid UTF-8 are answered by an error
+
+        Args:
+            peer: the peer dict of the client
+            frames: the list of frames payloads as bytes
+        Returns:
+            the list of client requests
+        """
+        client_socket = peer['sock']
+        requests = []
+        for frame in frames:
+            g_logger.info('get a message of %d bytes from client socket with FD %d',
+                          len(frame),
+                          client_socket.fileno())
+            try:
+                request_data = frame.decode()
+            except UnicodeDecodeError as ex:
+                g_logger.error('client socket with FD %d sent an invalid message : %s',
+                               client_socket.fileno(),
+                               str(ex))
+                self.writeToClient(client_socket,
+                                   json.dumps(dict(error='invalid message : ' + str(ex))))
+                continue
+            with self.__peers_lock:
+                peer['last_id'] += 1
+                peer['inflight'] += 1
+                request_id = peer['last_id']
+            # prepare client request context
+            request = ClientRequest(receiver=self,
+                                    client_socket=client_socket,
+                                    request_id=request_id,
+                                    request_data=request_data)
+            # append a simple ACK to client next datas
+            # to confirm all is OK
+            request.addResponseData(received_length=len(frame))
+            request.appendTreatmentChain('received')
+            requests.append(request)
+        return requests
+
+    def __shutdown(self, peer):
+        """Stop reading from a client
+
+        The connection is closed once all its messages are acknowledged
+
+        Must be called with the peers lock held
 
         Args:
-            client_socket: the client socket to close
+            peer: the peer dict of the client
+        """
+        peer['eof'] = True
+        self.__updateEvents(peer)
+
+    def __close(self, peer):
+        """Close properly a client socket
+
+        Must be called with the peers lock held
+
+        Args:
+            peer: the peer dict of the client
         """
         # We can't ask conn for getpeername() here, because the peer may no
         # longer exist (hung up); instead we use our own mapping of socket
         # fds to peer names - our socket fd is still open.
+        client_socket = peer['sock']
+        if self.__current_peers.get(client_socket.fileno()) is not peer:
+            return
         del self.__current_peers[client_socket.fileno()]
-        self.__socket_selector.unregister(client_socket)
-        g_logger.info('closed client connection with FD %d', client_socket.fileno())
+        if peer['events']:
+            self.__socket_selector.unregister(client_socket)
+        if peer['inflight'] or peer['output']:
+            g_logger.warning(('closed client connection with FD %d with %d messages'
+                              ' not acknowledged and %d bytes not written'),
+                             client_socket.fileno(), peer['inflight'], len(peer['output']))
+        else:
+            g_logger.info('closed client connection with FD %d', client_socket.fileno())
         client_socket.close()
 
     def start(self):
@@ -197,6 +420,21 @@ class Receiver(AbstractReceiver):
         Returns:
             a boolean that indicates the successful of the stop operation
         """
+        if not self.bindServerSocket():
+            return False
+
+        ## Init sockets selector
+        self.__socket_selector.register(fileobj=self.__server_socket,
+                                        events=selectors.EVENT_READ,
+                                        data=self.__onAccept)
+        return True
+
+    def bindServerSocket(self):
+        """Create the listening unix server socket
+
+        Returns:
+            the listening socket, or False if the socket cannot be created
+        """
         directory = os.path.dirname(self.__path)
         # check permissions
         if not (os.path.isdir(directory) and os.access(directory, os.X_OK)):
@@ -268,12 +506,7 @@ class Receiver(AbstractReceiver):
         g_logger.info('Unix receiver ready to listen on %s FD %d',
                       self.__path,
                       self.__server_socket.fileno())
-
-        ## Init sockets selector
-        self.__socket_selector.register(fileobj=self.__server_socket,
-                                        events=selectors.EVENT_READ,
-                                        data=self.__onAccept)
-        return True
+        return self.__server_socket
 
     def stop(self):
         """Stop the unix socket receiver
@@ -283,8 +516,9 @@ class Receiver(AbstractReceiver):
         """
         g_logger.info('Closing unix receiver')
         g_logger.debug('closing all unix sockets')
-        for peer in self.__current_peers.values():
-            peer['sock'].close()
+        with self.__peers_lock:
+            for peer in list(self.__current_peers.values()):
+                self.__close(peer)
         g_logger.debug('closing server socket')
         self.__server_socket.close()
         self.__socket_selector.close()
@@ -311,10 +545,140 @@ class Receiver(AbstractReceiver):
             for key, mask in events:
                 # callback can be a function registered in selector
                 # currently we have only
-                # __onRead and __onAccept
+                # __onRead (for both read and write events) and __onAccept
                 callback = key.data
                 socket_data = callback(key.fileobj, mask)
-                # yield only data read from client sockets
+                # yield only requests read from client sockets
                 # compare the data object with the onread function
                 if callback == self.__onRead and socket_data is not None:
-                    yield socket_data
+                    for request in socket_data:
+                        yield request
+
+
+class AsyncReceiver(AbstractAsyncReceiver):
+    """Asyncio receiver class, see module docstring for help
+
+    Clients connections are served by the event loop, so idle clients
+    do not cost anything more than their socket
+    """
+
+    def init(self):
+        """Init function
+        """
+        # the synchronous receiver is only used to manage the socket path
+        self.__receiver = Receiver(config=self.config, metrics=self.metrics)
+        self.__server = None
+        self.__requests = None
+        # map each client writer to the event set when all
+        # its messages are acknowledged
+        self.__writers = dict()
+
+    async def start(self):
+        """Start the unix socket server into the event loop
+
+        Returns:
+            a boolean that indicates the successful of the start operation
+        """
+        import asyncio
+        server_socket = self.__receiver.bindServerSocket()
+        if not server_socket:
+            return False
+        self.__requests = asyncio.Queue(maxsize=self.queue_size)
+        self.__server = await asyncio.start_unix_server(self.__onClient, sock=server_socket)
+        return True
+
+    async def stop(self):
+        """Stop the unix socket server
+
+        Returns:
+            a boolean that indicates the successful of the stop operation
+        """
+        g_logger.info('Closing asyncio unix receiver')
+        self.__server.close()
+        for writer, idle in list(self.__writers.items()):
+            idle.set()
+            writer.close()
+        await self.__server.wait_closed()
+        return self.__receiver.stop()
+
+    async def read(self):
+        """Wait for the next client request
+
+        Returns:
+            an AsyncClientRequest instance
+        """
+        return await self.__requests.get()
+
+    async def __onClient(self, reader, writer):
+        """Serve a client connection until it is closed
+
+        Args:
+            reader: the client asyncio stream reader
+            writer: the client asyncio stream writer
+        """
+        import asyncio
+        idle = asyncio.Event()
+        idle.set()
+        self.__writers[writer] = idle
+        g_logger.info('accepted new client on asyncio unix socket')
+        decoder = self.__receiver.newFrameDecoder()
+        framing = self.__receiver.framing
+        # the number of the last received message and of the not acknowledged ones
+        counters = dict(last_id=0, inflight=0)
+
+        def onAcknowledged():
+            counters['inflight'] -= 1
+            if not counters['inflight']:
+                idle.set()
+
+        async def pushRequests(frames):
+            for frame in frames:
+                g_logger.info('get a message of %d bytes from client', len(frame))
+                try:
+                    request_data = frame.decode()
+                except UnicodeDecodeError as ex:
+                    g_logger.error('client sent an invalid message : %s', str(ex))
+                    writer.write(encodeFrame(framing,
+                                             json.dumps(dict(error='invalid message : ' + str(ex)))))
+                    continue
+                counters['last_id'] += 1
+                counters['inflight'] += 1
+                idle.clear()
+                request = AsyncClientRequest(writer=writer,
+                                             framing=framing,
+                                             request_id=counters['last_id'],
+                                             done_callback=onAcknowledged,
+                                             request_data=request_data)
+                request.addResponseData(received_length=len(frame))
+                request.appendTreatmentChain('received')
+                # stop reading the client while the queue is full
+                await self.__requests.put(request)
+
+        try:
+            while True:
+                data = await reader.read(READ_SIZE)
+                # If there is no data, the socket must have been closed from client side
+                # the last message may not be terminated by its frame delimiter
+                if not data:
+                    await pushRequests(decoder.flush())
+                    break
+                await pushRequests(decoder.feed(data))
+                # stop reading while the client does not read its acknowledgments
+                await writer.drain()
+        except FrameTooLargeException as ex:
+            g_logger.error('client sent a bad frame : %s', str(ex))
+            await pushRequests(ex.frames)
+            writer.write(encodeFrame(framing, json.dumps(dict(error=str(ex)))))
+        except ConnectionError as ex:
+            g_logger.warning('client connection raise connection error : %s', str(ex))
+        try:
+            # wait for the acknowledgment of all messages before to close
+            await idle.wait()
+            if not writer.transport.is_closing():
+                await writer.drain()
+        except ConnectionError as ex:
+            g_logger.warning('client connection raise connection error : %s', str(ex))
+        finally:
+            self.__writers.pop(writer, None)
+            writer.close()
+            g_logger.info('closed asyncio client connection')
@@ -0,0 +1,256 @@
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+"""This module contains abstract class for sessions stores
+
+A sessions store keeps the sessions of the daemon in a persistent storage.
+The session of a subject is loaded when the shell does not have it in
+memory, and saved after each command.
+
+Saved sessions are written behind : they are kept in memory and written
+by batches by a background thread, each flush_interval seconds or as soon
+as batch_size sessions are waiting.
+"""
+
+# System imports
+import logging
+import threading
+import time
+
+# Project imports
+from ..abstract import AbstractModule
+from ..models import Session, SessionException
+
+# Global project declarations
+g_logger = logging.getLogger('smsshell.sessionstores')
+
+
+class AbstractSessionStore(AbstractModule):
+    """An abstract sessions store with write behind
+
+    Any valid sessions store implementation must inherit this one and
+    implement the _open, _close, _read and _write methods
+    """
+
+    def __init__(self, config=None, metrics=None):
+        """Constructor :
+
+        Args:
+            config : dict config all available configuration keys
+            metrics : the metrics handler
+        """
+        # sessions data waiting to be written per subject, and the ones
+        # being written, both are protected by the condition's lock
+        self.__pending = dict()
+        self.__writing = dict()
+        self.__condition = threading.Condition()
+        # only one flush at a time
+        self.__flush_lock = threading.Lock()
+        self.__running = False
+        self.__thread = None
+        # the tasks run by the writer thread, see addPeriodicTask()
+        self.__tasks = []
+        super().__init__(config=config, metrics=metrics)
+        self.flush_interval = self.getFloatConfig('flush_interval', 1.0)
+        try:
+            self.batch_size = max(1, int(self.getConfig('batch_size', fallback=100)))
+        except ValueError:
+            self.batch_size = 100
+            g_logger.error(("invalid integer parameter for option 'batch_size',"
+                            " fallback to default value 100"))
+
+    def getFloatConfig(self, key, fallback):
+        """Return a float configuration value
+
+        Args:
+            key: the name of the configuration option
+            fallback: the value to return if the option is not found or not valid
+        Returns:
+            the float value
+        """
+        try:
+            return float(self.getConfig(key, fallback=fallback))
+        except ValueError:
+            g_logger.error("invalid float parameter for option '%s', fallback to default value %s",
+                           key, fallback)
+            return fallback
+
+    def start(self):
+        """Open the storage and start the writer thread
+
+        Returns:
+            True if start has success, otherwise False
+        """
+        if not self._open():
+            return False
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__run, name='session-store', daemon=True)
+        self.__thread.start()
+        return True
+
+    def stop(self):
+        """Write the waiting sessions and close the storage
+
+        Returns:
+            True if stop has success, otherwise False
+        """
+        if self.__thread is not None:
+            with self.__condition:
+                self.__running = False
+                self.__condition.notify()
+            self.__thread.join()
+            self.__thread = None
+        self.flush()
+        self._close()
+        return True
+
+    def addPeriodicTask(self, callback, interval):
+        """Run a callback periodically from the writer thread
+
+        The tasks are checked after each flush, so they may be run up to
+        flush_interval seconds late
+
+        Args:
+            callback: the callable run without argument
+            interval: the time in seconds between two runs
+        """
+        self.__tasks.append(dict(callback=callback, interval=interval,
+                                 next_run=time.monotonic() + interval))
+
+    def load(self, subject):
+        """Load the session of the given subject
+
+        Args:
+            subject: the session subject
+        Returns:
+            the valid Session instance or None if it does not exist or is expired
+        """
+        with self.__condition:
+            data = self.__pending.get(subject) or self.__writing.get(subject)
+        if data is None:
+            data = self._read(subject)
+        if data is None:
+            return None
+        try:
+            sess = Session.fromDict(data)
+        except SessionException as ex:
+            g_logger.error('ignoring stored session of %s : %s', subject, str(ex))
+            return None
+        if not sess.isValid():
+            return None
+        return sess
+
+    def save(self, session):
+        """Queue the given session to be written
+
+        Args:
+            session: the Session instance to save
+        """
+        data = session.asDict()
+        with self.__condition:
+            self.__pending[session.subject] = data
+            if len(self.__pending) >= self.batch_size:
+                self.__condition.notify()
+
+    def flush(self):
+        """Write all waiting sessions
+
+        The sessions which cannot be written are kept to be written
+        by the next flush
+
+        Returns:
+            the number of written sessions
+        """
+        with self.__flush_lock:
+            with self.__condition:
+                if not self.__pending:
+                    return 0
+                self.__writing, self.__pending = self.__pending, dict()
+                records = list(self.__writing.values())
+            written = self._write(records)
+            with self.__condition:
+                if not written:
+                    # keep the failed sessions unless they have been saved again
+                    for subject, data in self.__writing.items():
+                        self.__pending.setdefault(subject, data)
+                self.__writing = dict()
+        if not written:
+            return 0
+        g_logger.debug('wrote %d sessions to store', len(records))
+        return len(records)
+
+    def __run(self):
+        """Main loop of the writer thread
+        """
+        while True:
+            with self.__condition:
+                if self.__running and len(self.__pending) < self.batch_size:
+                    self.__condition.wait(self.flush_interval)
+                running = self.__running
+            if not running:
+                return
+            self.flush()
+            self.__runPeriodicTasks()
+
+    def __runPeriodicTasks(self):
+        """Run the periodic tasks which are due
+        """
+        now = time.monotonic()
+        for task in self.__tasks:
+            if now < task['next_run']:
+                continue
+            task['next_run'] = now + task['interval']
+            try:
+                task['callback']()
+            except Exception as ex:
+                g_logger.exception('periodic task of sessions store failed : %s', str(ex))
+
+    def _open(self):
+        """Open the storage
+
+        Returns:
+            True if the storage can be used, otherwise False
+        """
+        raise NotImplementedError("You must implement the '_open' method in session store class")
+
+    def _close(self):
+        """Close the storage
+        """
+        raise NotImplementedError("You must implement the '_close' method in session store class")
+
+    def _read(self, subject):
+        """Read the session data of the given subject
+
+        Args:
+            subject: the session subject
+        Returns:
+            the dict produced by Session.asDict() or None if the subject
+            has no valid session in the storage
+        """
+        raise NotImplementedError("You must implement the '_read' method in session store class")
+
+    def _write(self, records):
+        """Write sessions data to the storage, replacing the previous ones
+
+        Args:
+            records: the list of dicts produced by Session.asDict()
+        Returns:
+            True if the sessions have been written, otherwise False
+        """
+        raise NotImplementedError("You must implement the '_write' method in session store class")
@@ -0,0 +1,317 @@
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+"""A sessions store in an append only file
+
+Each written session is appended to the file as a line of JSON, so a batch
+of sessions costs one write and one fsync. The store keeps in memory the
+position of the last line of each subject, which is read on load.
+
+When the file becomes too large compared to the size of the live sessions,
+or each compact_interval seconds, it is compacted : the valid sessions are
+copied to a new file which replaces the current one.
+Many daemon processes can use the same file, they are synchronized by
+a lock on a companion '.lock' file and find the lines appended by the
+others before each read and write.
+"""
+
+# System imports
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+
+# Project imports
+from . import AbstractSessionStore
+
+# Global project declarations
+g_logger = logging.getLogger('smsshell.sessionstores.file')
+
+READ_SIZE = 1048576
+# files smaller than this size are never compacted because of their size
+MIN_COMPACT_SIZE = 1048576
+
+
+class SessionStore(AbstractSessionStore):
+    """SessionStore class, see module docstring for help
+    """
+
+    def init(self):
+        """Init function
+        """
+        self.__path = self.getConfig('path', fallback='/var/lib/smsshell/sessions.log')
+        self.__compact_ratio = max(1.0, self.getFloatConfig('compact_ratio', 2.0))
+        self.__compact_interval = self.getFloatConfig('compact_interval', 3600.0)
+        self.__fd = None
+        self.__lock_fd = None
+        # the file is used by the writer thread and the workers
+        self.__lock = threading.Lock()
+        self.__reset()
+
+    def __reset(self):
+        """Forget the content of the file
+        """
+        self.__inode = None
+        # the size of the file which has been indexed
+        self.__size = 0
+        # position, length and expiry time of the last line of each subject
+        self.__index = dict()
+        # the total length of the indexed lines
+        self.__live = 0
+        self.__compacted_at = time.monotonic()
+
+    def _open(self):
+        """Open the file and index its content
+
+        Returns:
+            True if the file can be used, otherwise False
+        """
+        try:
+            self.__lock_fd = os.open(self.__path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+            with self.__locked(fcntl.LOCK_EX):
+                self.__reopen()
+                if self.__size > self.__live:
+                    # drop the lines of sessions saved many times
+                    self.__compact()
+        except OSError as ex:
+            g_logger.fatal("Unable to open the sessions file '%s' : %s", self.__path, str(ex))
+            self._close()
+            return False
+        g_logger.info("using sessions file '%s' with %d sessions", self.__path, len(self.__index))
+        return True
+
+    def _close(self):
+        """Close the file
+        """
+        for fd in [self.__fd, self.__lock_fd]:
+            if fd is not None:
+                os.close(fd)
+        self.__fd = None
+        self.__lock_fd = None
+        self.__reset()
+
+    def _read(self, subject):
+        """Read the session data of the given subject
+
+        Args:
+            subject: the session subject
+        Returns:
+            the session data as dict or None
+        """
+        try:
+            with self.__locked(fcntl.LOCK_SH):
+                self.__sync()
+                entry = self.__index.get(subject)
+                if entry is None or entry[2] <= time.time():
+                    return None
+                line = os.pread(self.__fd, entry[1], entry[0])
+        except OSError as ex:
+            g_logger.error('unable to read the session of %s : %s', subject, str(ex))
+            return None
+        try:
+            return json.loads(line.decode())
+        except ValueError as ex:
+            g_logger.error('invalid stored session of %s : %s', subject, str(ex))
+            return None
+
+    def _write(self, records):
+        """Append sessions data to the file
+
+        Args:
+            records: the list of sessions data
+        Returns:
+            True if the sessions have been written
+        """
+        entries = []
+        for data in records:
+            try:
+                entries.append((data['subject'], data['access_at'] + data['ttl'],
+                                json.dumps(data).encode()))
+            except (TypeError, ValueError) as ex:
+                g_logger.error('unable to store the session of %s : %s', data['subject'], str(ex))
+        if not entries:
+            return True
+        try:
+            with self.__locked(fcntl.LOCK_EX):
+                self.__sync()
+                offset = os.fstat(self.__fd).st_size
+                payload = bytearray()
+                if offset > self.__size:
+                    # terminate the incomplete line left by a crash
+                    payload += b'\n'
+                    offset += 1
+                positions = []
+                for _, _, line in entries:
+                    positions.append(offset)
+                    payload += line
+                    payload += b'\n'
+                    offset += len(line) + 1
+                view = memoryview(payload)
+                while view:
+                    view = view[os.write(self.__fd, view):]
+                os.fsync(self.__fd)
+                self.__size = offset
+                for position, (subject, expires_at, line) in zip(positions, entries):
+                    self.__indexLine(subject, position, len(line), expires_at)
+                if self.__needCompaction():
+                    self.__compact()
+        except OSError as ex:
+            g_logger.error('unable to write %d sessions : %s', len(entries), str(ex))
+            return False
+        return True
+
+    @contextlib.contextmanager
+    def __locked(self, operation):
+        """Context manager that hold the lock of the file
+
+        Args:
+            operation: fcntl.LOCK_SH to read the file, fcntl.LOCK_EX to write it
+        """
+        with self.__lock:
+            fcntl.flock(self.__lock_fd, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.__lock_fd, fcntl.LOCK_UN)
+
+    def __sync(self):
+        """Index the lines appended by other processes
+
+        The file is opened again if another process has compacted it
+        Must be called with the lock held
+        """
+        try:
+            inode = os.stat(self.__path).st_ino
+        except FileNotFoundError:
+            inode = None
+        if inode != self.__inode:
+            self.__reopen()
+        else:
+            self.__scan()
+
+    def __reopen(self):
+        """Open the file and index all its lines
+
+        Must be called with the lock held
+        """
+        if self.__fd is not None:
+            os.close(self.__fd)
+            self.__fd = None
+        self.__reset()
+        self.__fd = os.open(self.__path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o600)
+        self.__inode = os.fstat(self.__fd).st_ino
+        self.__scan()
+
+    def __scan(self):
+        """Index the lines which follow the indexed part of the file
+
+        An incomplete line at the end of the file is not indexed
+        Must be called with the lock held
+        """
+        end = os.fstat(self.__fd).st_size
+        offset = self.__size
+        size = READ_SIZE
+        while offset < end:
+            chunk = os.pread(self.__fd, min(size, end - offset), offset)
+            last = chunk.rfind(b'\n')
+            if last == -1:
+                if offset + len(chunk) >= end:
+                    break
+                # a line longer than the chunk
+                size *= 2
+                continue
+            position = offset
+            for line in chunk[:last].split(b'\n'):
+                self.__indexRecord(position, line)
+                position += len(line) + 1
+            offset += last + 1
+            size = READ_SIZE
+        self.__size = offset
+
+    def __indexRecord(self, position, line):
+        """Index one line of the file
+
+        Args:
+            position: the position of the line in the file
+            line: the content of the line
+        """
+        try:
+            data = json.loads(line.decode())
+            self.__indexLine(data['subject'], position, len(line),
+                             data['access_at'] + data['ttl'])
+        except (KeyError, TypeError, ValueError):
+            if line:
+                g_logger.warning("ignoring invalid line at position %d of '%s'",
+                                 position, self.__path)
+
+    def __indexLine(self, subject, position, length, expires_at):
+        """Make the given line the last session of its subject
+
+        Args:
+            subject: the session subject
+            position: the position of the line in the file
+            length: the length of the line without its newline
+            expires_at: the expiry timestamp of the session
+        """
+        previous = self.__index.get(subject)
+        if previous is not None:
+            self.__live -= previous[1] + 1
+        self.__index[subject] = (position, length, expires_at)
+        self.__live += length + 1
+
+    def __needCompaction(self):
+        """Return True if the file must be compacted
+        """
+        if time.monotonic() - self.__compacted_at >= self.__compact_interval:
+            return True
+        return self.__size > MIN_COMPACT_SIZE and self.__size > self.__compact_ratio * self.__live
+
+    def __compact(self):
+        """Replace the file by a new one which only contains the valid sessions
+
+        Must be called with the exclusive lock held
+        """
+        now = time.time()
+        tmp_path = self.__path + '.tmp'
+        index = dict()
+        offset = 0
+        entries = sorted(self.__index.items(), key=lambda item: item[1][0])
+        with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600),
+                       'wb') as tmp:
+            for subject, (position, length, expires_at) in entries:
+                if expires_at <= now:
+                    continue
+                tmp.write(os.pread(self.__fd, length, position) + b'\n')
+                index[subject] = (offset, length, expires_at)
+                offset += length + 1
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, self.__path)
+        g_logger.info("compacted the sessions file from %d to %d bytes, %d sessions",
+                      self.__size, offset, len(index))
+        os.close(self.__fd)
+        self.__fd = os.open(self.__path, os.O_RDWR | os.O_APPEND)
+        self.__inode = os.fstat(self.__fd).st_ino
+        self.__index = index
+        self.__size = offset
+        self.__live = offset
+        self.__compacted_at = time.monotonic()
@@ -0,0 +1,66 @@
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+"""A sessions store which does not keep anything
+
+Sessions only live in the memory of the daemon, they are lost when it
+is restarted. Saved sessions are dropped when they are written.
+This is the default sessions store.
+"""
+
+# Project imports
+from . import AbstractSessionStore
+
+
+class SessionStore(AbstractSessionStore):
+    """SessionStore class, see module docstring for help
+    """
+
+    def _open(self):
+        """Nothing to open
+
+        Returns:
+            True
+        """
+        return True
+
+    def _close(self):
+        """Nothing to close
+        """
+        pass
+
+    def _read(self, subject):
+        """No session is kept
+
+        Args:
+            subject: the session subject
+        Returns:
+            None
+        """
+        return None
+
+    def _write(self, records):
+        """Drop the sessions data
+
+        Args:
+            records: the list of sessions data
+        Returns:
+            True
+        """
+        return True
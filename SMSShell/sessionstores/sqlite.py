@@ -0,0 +1,143 @@
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+"""A sessions store in a SQLite database
+
+The database is used in WAL mode, so many daemon processes can share
+the same sessions. Each batch of sessions is written in one transaction
+which also drops the expired sessions.
+"""
+
+# System imports
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+# Project imports
+from . import AbstractSessionStore
+
+# Global project declarations
+g_logger = logging.getLogger('smsshell.sessionstores.sqlite')
+
+SCHEMA = [
+    ('CREATE TABLE IF NOT EXISTS sessions ('
+     'subject TEXT PRIMARY KEY, expires_at REAL NOT NULL, data TEXT NOT NULL)'),
+    'CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)',
+]
+
+
+class SessionStore(AbstractSessionStore):
+    """SessionStore class, see module docstring for help
+    """
+
+    def init(self):
+        """Init function
+        """
+        self.__path = self.getConfig('path', fallback='/var/lib/smsshell/sessions.sqlite')
+        self.__timeout = self.getFloatConfig('timeout', 5.0)
+        self.__connection = None
+        # the connection is shared by the writer thread and the workers
+        self.__lock = threading.Lock()
+
+    def _open(self):
+        """Open the database and create its schema
+
+        Returns:
+            True if the database can be used, otherwise False
+        """
+        try:
+            self.__connection = sqlite3.connect(self.__path,
+                                                timeout=self.__timeout,
+                                                isolation_level=None,
+                                                check_same_thread=False)
+            self.__connection.execute('PRAGMA journal_mode=WAL')
+            self.__connection.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                self.__connection.execute(statement)
+        except sqlite3.Error as ex:
+            g_logger.fatal("Unable to open the sessions database '%s' : %s", self.__path, str(ex))
+            self._close()
+            return False
+        g_logger.info("using sessions database '%s'", self.__path)
+        return True
+
+    def _close(self):
+        """Close the database
+        """
+        if self.__connection is not None:
+            self.__connection.close()
+            self.__connection = None
+
+    def _read(self, subject):
+        """Read the session data of the given subject
+
+        Args:
+            subject: the session subject
+        Returns:
+            the session data as dict or None
+        """
+        try:
+            with self.__lock:
+                row = self.__connection.execute(
+                    'SELECT data FROM sessions WHERE subject = ? AND expires_at > ?',
+                    (subject, time.time())).fetchone()
+        except sqlite3.Error as ex:
+            g_logger.error('unable to read the session of %s : %s', subject, str(ex))
+            return None
+        if row is None:
+            return None
+        try:
+            return json.loads(row[0])
+        except ValueError as ex:
+            g_logger.error('invalid stored session of %s : %s', subject, str(ex))
+            return None
+
+    def _write(self, records):
+        """Write sessions data and drop the expired sessions
+
+        Args:
+            records: the list of sessions data
+        Returns:
+            True if the sessions have been written
+        """
+        rows = []
+        for data in records:
+            try:
+                rows.append((data['subject'], data['access_at'] + data['ttl'], json.dumps(data)))
+            except (TypeError, ValueError) as ex:
+                g_logger.error('unable to store the session of %s : %s', data['subject'], str(ex))
+        try:
+            with self.__lock:
+                self.__connection.execute('BEGIN IMMEDIATE')
+                try:
+                    self.__connection.executemany(
+                        'INSERT OR REPLACE INTO sessions (subject, expires_at, data)'
+                        ' VALUES (?, ?, ?)', rows)
+                    self.__connection.execute('DELETE FROM sessions WHERE expires_at <= ?',
+                                              (time.time(),))
+                except sqlite3.Error:
+                    self.__connection.execute('ROLLBACK')
+                    raise
+                self.__connection.execute('COMMIT')
+        except sqlite3.Error as ex:
+            g_logger.error('unable to write %d sessions : %s', len(rows), str(ex))
+            return False
+        return True
@@ -22,18 +22,24 @@
 
 # System imports
 import argparse
+import contextlib
+import hashlib
 import importlib
-import importlib.util
 import inspect
 import logging
 import re
 import os
 import shlex
+import threading
+import time
+# asyncio is only imported by asyncio related functions
+# because it is slow to import and useless in standalone mode
 
 # Project imports
 from .exceptions import ShellException, BadCommandCall
-from .models import Session, SessionStates
+from .models import Session, SessionStates, SessionMap
 from .commands import (AbstractCommand,
+                       AbstractAsyncCommand,
                        CommandForbidden,
                        CommandNotFoundException,
                        CommandBadImplemented,
@@ -44,6 +50,43 @@ from .commands import (AbstractCommand,
 g_logger = logging.getLogger('smsshell.shell')
 
 
+class ShellWrapper(object):
+    """This class if a wrapper for Shell
+
+    It prevent some shell attributes to be accessed directly
+    """
+
+    __slots__ = ('__shell',)
+
+    ALLOWED_ATTRIBUTES = frozenset([
+        'flushCommandCache',
+        'getAvailableCommands',
+        'getCommand'
+    ])
+
+    def __init__(self, shell):
+        """Build a new shell wrapper
+
+        Args:
+            shell: the initial shell instance
+        """
+        self.__shell = shell
+
+    def __getattr__(self, name):
+        """Allow some shell's functions to be accessed through shell wrapper
+
+        Args:
+            name: the attribute's name
+        Returns:
+            the shell attribute
+        Raise:
+            ShellException if attribute is not allowed
+        """
+        if name in ShellWrapper.ALLOWED_ATTRIBUTES:
+            return getattr(self.__shell, name)
+        raise ShellException("attribute {} is not reachable using shell wrapper".format(name))
+
+
 class Shell(object):
     """This class is the execution core of the shell
 
@@ -51,6 +94,11 @@ class Shell(object):
     command execution over commands instance
     """
     WORD_REGEX_PATTERN = re.compile("[^A-Za-z]+")
+    # characters which require the POSIX shell quoting rules
+    QUOTING_REGEX_PATTERN = re.compile('[\'"\\\\]')
+    # without quoting, arguments are the runs of characters which are not
+    # a shlex whitespace
+    ARGUMENT_REGEX_PATTERN = re.compile('[^ \t\r\n]+')
 
     def __init__(self, configparser, metrics):
         """Constructor: Build a new shell object
@@ -60,8 +108,31 @@ class Shell(object):
         """
         self.configparser = configparser
         self.__metrics = metrics
-        self.__sessions = dict()
+        self.__session_ttl = configparser.getModeConfigInt('session_ttl', 600, minimum=0)
+        self.__sessions = SessionMap(configparser.getModeConfigInt('session_max_count',
+                                                                   0, minimum=0),
+                                     configparser.getModeConfigInt('session_shards',
+                                                                   16, minimum=1))
+        # the time between two sweeps of the expired sessions, 0 disables them
+        self.__sweep_interval = configparser.getModeConfigInt('session_sweep_interval',
+                                                              60, minimum=0)
+        # the dispatch entry of each loaded command, see __loadCommand()
         self.__commands = dict()
+        # the module of each loaded command and the state of its source file
+        self.__modules = dict()
+        # the minimum time between two checks of a command source file
+        # 0 means that commands are only reloaded by flushCommandCache()
+        self.__reload_interval = configparser.getModeConfigInt('commands_reload_interval',
+                                                               0, minimum=0)
+        # protect commands cache against concurrent loading
+        self.__commands_lock = threading.RLock()
+        # lock and number of waiting callers per subject
+        self.__subject_locks = dict()
+        self.__subject_locks_lock = threading.Lock()
+        # the wrapper given to commands, see getSecureShell()
+        self.__secure_shell = ShellWrapper(self)
+        # the optional persistent store of sessions, see setSessionStore()
+        self.__session_store = None
 
     def exec(self, subject, cmdline, as_role=None):
         """Run the given arguments for the given subject
@@ -70,8 +141,44 @@ class Shell(object):
             subject: an identifier of the command launcher
             cmdline: the raw command line
         """
+        return self.__exec(subject, self.__splitCommandLine(subject, cmdline), as_role)
+
+    async def execAsync(self, subject, cmdline, as_role=None, executor=None):
+        """Coroutine version of exec() for the daemon event loop
+
+        Asyncio commands are awaited in the event loop, all other
+        commands are run into the executor
+
+        Args:
+            subject: an identifier of the command launcher
+            cmdline: the raw command line
+            executor: the executor used to run blocking operations
+        """
+        import asyncio
+        loop = asyncio.get_event_loop()
+        argv = self.__splitCommandLine(subject, cmdline)
+        call = await loop.run_in_executor(executor, self.__prepareAsyncCall,
+                                          subject, argv, as_role)
+        if call is None:
+            return await loop.run_in_executor(executor, self.__exec, subject, argv, as_role)
+        com, args, sess = call
         try:
-            argv = shlex.split(cmdline)
+            return self.__checkResult(argv[0], await com.main(*args)).strip()
+        finally:
+            if as_role is None:
+                self.__saveSession(sess)
+
+    def __splitCommandLine(self, subject, cmdline):
+        """Split the command line into an arguments vector
+
+        Args:
+            subject: an identifier of the command launcher
+            cmdline: the raw command line
+        Returns:
+            the non empty list of arguments, starting with the command name
+        """
+        try:
+            argv = Shell.splitArguments(cmdline)
         except ValueError as ex:
             raise ShellException('Command line parsing failed because of bad syntax: ' + str(ex),
                                  'bad syntax: ' + str(ex).lower().strip())
@@ -87,22 +194,145 @@ class Shell(object):
             raise ShellException('The passed subject is empty')
 
         g_logger.info("Subject '%s' run command '%s' with args : %s", subject, cmd, str(argv[1:]))
+        return argv
+
+    def __exec(self, subject, argv, as_role):
+        """Run the arguments vector for the given subject
+
+        Commands of the same subject are run one at a time, commands of
+        differents subjects are run in parallel
+
+        Args:
+            subject: an identifier of the command launcher
+            argv: the arguments vector
+            as_role: the optional forced role
+        Returns:
+            the command output
+        """
+        with self.__subjectLock(subject):
+            sess = self.__getSession(subject, argv[0], as_role)
+            try:
+                return self.__call(sess, argv[0], argv[1:]).strip()
+            finally:
+                if as_role is None:
+                    self.__saveSession(sess)
+
+    def __prepareAsyncCall(self, subject, argv, as_role):
+        """Prepare the call of an asyncio command
+
+        The caller is responsible of the ordering of the calls of the same
+        subject, as the command will run outside of the subject lock
+
+        Args:
+            subject: an identifier of the command launcher
+            argv: the arguments vector
+            as_role: the optional forced role
+        Returns:
+            None if the command is not an asyncio command, otherwise
+            a tuple of the command instance bound to the session,
+            its main() arguments and the session
+        """
+        if not self.__getEntry(argv[0])['coroutine']:
+            return None
+        with self.__subjectLock(subject):
+            sess = self.__getSession(subject, argv[0], as_role)
+            com, args = self.__prepareCall(sess, argv[0], argv[1:])
+            return com._bindSession(sess.getSecureSession()), args, sess
+
+    @contextlib.contextmanager
+    def __subjectLock(self, subject):
+        """Context manager that hold the lock of the given subject
+
+        Args:
+            subject: an identifier of the command launcher
+        """
+        with self.__subject_locks_lock:
+            if subject not in self.__subject_locks:
+                self.__subject_locks[subject] = [threading.Lock(), 0]
+            subject_lock = self.__subject_locks[subject]
+            subject_lock[1] += 1
+        try:
+            with subject_lock[0]:
+                yield
+        finally:
+            with self.__subject_locks_lock:
+                subject_lock[1] -= 1
+                if not subject_lock[1]:
+                    del self.__subject_locks[subject]
+
+    def __getSession(self, subject, cmd, as_role):
+        """Return the session to use to run the command
+
+        Args:
+            subject: an identifier of the command launcher
+            cmd: the command name
+            as_role: the optional forced role
+        Returns:
+            the Session instance
+        """
         if as_role is not None:
             assert isinstance(as_role, SessionStates)
             sess = Session(subject, time_to_live=0)
             sess.forceState(as_role)
-            g_logger.info("Subject '%s' run command '%s' as forced role : %s", subject, cmd, as_role.name)
-        else:
-            sess = self.__getSessionForSubject(subject)
-        return self.__call(sess, cmd, argv[1:]).strip()
+            g_logger.info("Subject '%s' run command '%s' as forced role : %s",
+                          subject, cmd, as_role.name)
+            return sess
+        return self.__getSessionForSubject(subject)
+
+    def getSession(self, subject):
+        """Return the current session of the given subject
+
+        Args:
+            subject: an identifier of the command launcher
+        Returns:
+            the valid Session instance or None if the subject has no session
+        """
+        return self.__sessions.get(subject)
+
+    def getSessionMap(self):
+        """Return the map which keep the sessions of this shell
+
+        Returns:
+            the SessionMap instance
+        """
+        return self.__sessions
+
+    def setSessionStore(self, store):
+        """Use a persistent store for the sessions of this shell
+
+        Sessions which are not in memory are loaded from the store and
+        sessions are saved into it after each command. The writer thread
+        of the store also sweeps the expired sessions of the shell
+
+        Args:
+            store: the AbstractSessionStore instance
+        """
+        self.__session_store = store
+        if self.__sweep_interval:
+            store.addPeriodicTask(self.__sweepSessions, self.__sweep_interval)
+
+    def __sweepSessions(self):
+        """Evict all expired sessions from memory
+        """
+        count = self.__sessions.sweep()
+        if count:
+            g_logger.debug('swept %d expired sessions', count)
 
     def flushCommandCache(self):
-        """Perform a flush of all command instance in local cache
+        """Reload the commands whose source file has changed
 
-        This cause that all next call to each command will require the
-        re-instanciation of the command
+        The other commands are kept as is, so they do not have to be
+        imported and instanciated again
+
+        Returns:
+            the sorted list of the reloaded commands names
         """
-        self.__commands = dict()
+        reloaded = []
+        with self.__commands_lock:
+            for name in list(self.__modules):
+                if self.__reloadCommandIfChanged(name):
+                    reloaded.append(name)
+        return sorted(reloaded)
 
     def getCommand(self, session, name):
         """Return the command instance of the given command name as the session
@@ -116,41 +346,120 @@ class Shell(object):
             CommandForbidden is the given session is not allowed to run
             the requested command
         """
-        com = self.__getCommand(name)
-        if not Shell.hasSessionAccessToCommand(session, com):
+        entry = self.__getEntry(name)
+        if not Shell.__hasAccess(session, entry):
             raise CommandForbidden('You are not allowed to call this command from here')
-        return com
+        return entry['command']
 
-    def __getCommand(self, name):
-        """Return the command instance of the given command name
+    def __getEntry(self, name):
+        """Return the dispatch entry of the given command name
 
         Args:
             name: the name of the command to retrieve
         Returns:
-            commands.Command instance
+            the dispatch entry dict
         """
-        if name not in self.__commands:
-            self.__loadCommand(name)
-        return self.__commands[name]
+        commands = self.__commands
+        if name not in commands:
+            with self.__commands_lock:
+                # the command may have been loaded while waiting for the lock
+                if name not in self.__commands:
+                    self.__loadCommand(name)
+                commands = self.__commands
+        elif (self.__reload_interval and
+              self.__modules[name]['checked_at'] + self.__reload_interval < time.monotonic()):
+            with self.__commands_lock:
+                self.__reloadCommandIfChanged(name)
+            commands = self.__commands
+        return commands[name]
 
-    def __loadCommand(self, name):
+    @staticmethod
+    def __sourceState(path):
+        """Return the values used to detect a change of a source file
+
+        Args:
+            path: the path of the source file
+        Returns:
+            a tuple of the modification time and the size of the file,
+            None if the file cannot be read
+        """
+        try:
+            stat = os.stat(path)
+        except (OSError, TypeError):
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @staticmethod
+    def __sourceDigest(path):
+        """Return the digest of the content of a source file
+
+        Args:
+            path: the path of the source file
+        Returns:
+            the digest as bytes, None if the file cannot be read
+        """
+        try:
+            with open(path, 'rb') as source:
+                return hashlib.sha1(source.read()).digest()
+        except (OSError, TypeError):
+            return None
+
+    def __reloadCommandIfChanged(self, name):
+        """Reload a loaded command if its source file has changed
+
+        The file content is only read when its modification time or size
+        has changed. If the new source cannot be loaded, the previous
+        command is kept
+
+        Must be called with the commands lock held
+
+        Args:
+            name: the name of the loaded command
+        Returns:
+            True if the command has been reloaded
+        """
+        module_state = self.__modules[name]
+        module_state['checked_at'] = time.monotonic()
+        path = module_state['module'].__file__
+        state = Shell.__sourceState(path)
+        if state == module_state['state']:
+            return False
+        module_state['state'] = state
+        digest = Shell.__sourceDigest(path)
+        if digest == module_state['digest']:
+            return False
+
+        g_logger.info("source of command '%s' has changed, reloading it", name)
+        try:
+            mod = importlib.reload(module_state['module'])
+            self.__loadCommand(name, mod)
+        except Exception as ex:
+            g_logger.error("unable to reload command '%s', keeping the previous one : %s",
+                           name, str(ex))
+            return False
+        return True
+
+    def __loadCommand(self, name, mod=None):
         """Try to load the given command into the cache dir
 
+        The module of the command is imported only once, it is only
+        reloaded by __reloadCommandIfChanged()
+
         Args:
             name: the name of the command to load
+            mod: the optional already imported module of the command
         Returns:
             commands.Command instance
         Raises:
             CommandNotFoundException if the command do not exists
         """
         g_logger.debug("loading command handler with name '%s'", name)
-        try:
-            mod = importlib.import_module('.commands.' + name, package='SMSShell')
-            if importlib.util.find_spec('.commands.' + name, package='SMSShell') is not None:
-                importlib.reload(mod)
-        except ImportError:
-            raise CommandNotFoundException(("Command handler '{0}' cannot" +
-                                            " be found in commands/ folder.").format(name))
+        if mod is None:
+            try:
+                mod = importlib.import_module('.commands.' + name, package='SMSShell')
+            except ImportError:
+                raise CommandNotFoundException(("Command handler '{0}' cannot" +
+                                                " be found in commands/ folder.").format(name))
 
         cls_name = Shell.toCamelCase(name)
         try: # instanciate
@@ -175,8 +484,28 @@ class Shell(object):
         else:
             g_logger.debug("command '%s' config ok", name)
 
+        # precompute everything needed to dispatch a call to the command
+        states = cmd._inputStates()
+        parser = cmd._argsParser()
+        arity = 2 if parser else 1
+        if len(inspect.signature(cmd.main).parameters) != arity:
+            raise CommandBadImplemented(("main() function of command '{0}' "
+                                         "must take {1} arguments").format(name, arity))
+        entry = dict(command=cmd,
+                     # None means that the command is reachable from all states
+                     states=frozenset(states) if states else None,
+                     # the parser is built once and shared by all calls
+                     parser=parser,
+                     arity=arity,
+                     coroutine=isinstance(cmd, AbstractAsyncCommand))
+
         # register command into cache
-        self.__commands[name] = cmd
+        path = getattr(mod, '__file__', None)
+        self.__modules[name] = dict(module=mod,
+                                    state=Shell.__sourceState(path),
+                                    digest=Shell.__sourceDigest(path),
+                                    checked_at=time.monotonic())
+        self.__commands[name] = entry
 
     def getAvailableCommands(self, session):
         """Return the list of available command for the given session
@@ -186,8 +515,8 @@ class Shell(object):
         """
         all_commands = []
         self.loadAllCommands()
-        for key in self.__commands:
-            if Shell.hasSessionAccessToCommand(session, self.__commands[key]):
+        for key, entry in list(self.__commands.items()):
+            if Shell.__hasAccess(session, entry):
                 all_commands.append(key)
         return all_commands
 
@@ -197,7 +526,7 @@ class Shell(object):
         for com in os.listdir(os.path.dirname(__file__) + "/commands"):
             if not com.startswith('_') and com.endswith(".py"):
                 try:
-                    self.__getCommand(os.path.splitext(com)[0])
+                    self.__getEntry(os.path.splitext(com)[0])
                     # intercept exception to prevent command execution stop
                 except CommandException as ex:
                     g_logger.error(str(ex))
@@ -212,40 +541,79 @@ class Shell(object):
         Returns:
             the command output
         """
-        com = self.__getCommand(cmd_name)
+        com, args = self.__prepareCall(session, cmd_name, argv)
+
+        com = com._bindSession(session.getSecureSession())
+        if isinstance(com, AbstractAsyncCommand):
+            result = Shell.runCoroutine(com.main(*args))
+        else:
+            result = com.main(*args)
+
+        return self.__checkResult(cmd_name, result)
+
+    def __prepareCall(self, session, cmd_name, argv):
+        """Check and prepare the execution of the command with the given name
+
+        Args:
+            session: models.Session the session object to use
+            cmd_name: the name of the command to call
+            argv: the list of string arguments to pass to the command
+        Returns:
+            a tuple of the command instance and its main() arguments
+        """
+        entry = self.__getEntry(cmd_name)
         # set the prefix to separate session's namespaces
         session.setStoragePrefix(cmd_name)
         # check command aceptance conditions
-        if not Shell.hasSessionAccessToCommand(session, com):
+        if not Shell.__hasAccess(session, entry):
             raise CommandForbidden('You are not allowed to call this command from here')
 
-        # parse arguments
+        # parse arguments, the main() signature has been checked at load
         args = [argv]
-        parser = com._argsParser()
-        if parser:
+        if entry['parser'] is not None:
             try:
-                args.append(parser.parse_args(argv))
+                args.append(entry['parser'].parse_args(argv))
             except argparse.ArgumentError as ex:
                 raise BadCommandCall('Error with command arguments: {}'.format(str(ex)))
 
-        # check command signature
-        sig = inspect.signature(com.main)
-        if len(sig.parameters) != len(args):
-            raise CommandBadImplemented(("main() function of command '{0}' "
-                                         "must take {1} arguments").format(cmd_name, len(args)))
-
         # refresh session
         session.access()
-        com.session = session.getSecureSession()
-        result = com.main(*args)
-        com.session = None
+        return entry['command'], args
+
+    @staticmethod
+    def __checkResult(cmd_name, result):
+        """Check the output of a command
 
+        Args:
+            cmd_name: the name of the called command
+            result: the object returned by the command
+        Returns:
+            the command output
+        """
         # handler class checking
         if not isinstance(result, str):
             raise CommandBadImplemented(("Command '{0}' 's return object "
                                          "must be a str").format(cmd_name))
         return result
 
+    @staticmethod
+    def runCoroutine(coroutine):
+        """Run a coroutine to completion in a private event loop
+
+        Used to run asyncio commands outside of the daemon event loop
+
+        Args:
+            coroutine: the coroutine object to run
+        Returns:
+            the coroutine result
+        """
+        import asyncio
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
     @staticmethod
     def hasSessionAccessToCommand(session, command):
         """Check if the given session has access to the given command
@@ -258,70 +626,90 @@ class Shell(object):
             false otherwise
         """
         states = command._inputStates()
-        if states and session.state not in command._inputStates():
+        if states and session.state not in states:
             return False
         return True
 
+    @staticmethod
+    def __hasAccess(session, entry):
+        """Check if the given session has access to the command of a dispatch entry
+
+        Args:
+            session: a models.Session instance
+            entry: the dispatch entry of the command
+        Returns:
+            True if the given session is allowed to run the command
+        """
+        return entry['states'] is None or session.state in entry['states']
+
     def __getSessionForSubject(self, key):
         """Retrieve the session associated with this user
 
         @param str the name of the subject
         @return Session
         """
-        if key in self.__sessions:
-            sess = self.__sessions[key]
-            if sess.isValid():
-                g_logger.debug('using existing session')
+        sess = self.__sessions.get(key)
+        if sess is not None:
+            g_logger.debug('using existing session')
+            return sess
+        if self.__session_store is not None:
+            sess = self.__session_store.load(key)
+            if sess is not None:
+                g_logger.debug('loaded the session of subject %s from store', key)
+                self.__sessions.put(sess)
                 return sess
 
-        self.__sessions[key] = Session(key)
-        self.__sessions[key].ttl = self.configparser.getModeConfig('session_ttl', fallback=600)
-        g_logger.debug('creating a new session for subject : %s with ttl %d',
-                       key,
-                       self.__sessions[key].ttl)
-        return self.__sessions[key]
+        sess, created = self.__sessions.getOrCreate(key, self.__newSession)
+        if created:
+            g_logger.debug('creating a new session for subject : %s with ttl %d',
+                           key,
+                           sess.ttl)
+        return sess
+
+    def __saveSession(self, session):
+        """Save the given session into the persistent store if any
+
+        Args:
+            session: the Session instance
+        """
+        if self.__session_store is not None:
+            self.__session_store.save(session)
+
+    def __newSession(self, subject):
+        """Build a new session for the given subject
+
+        @param str the name of the subject
+        @return Session
+        """
+        return Session(subject, time_to_live=self.__session_ttl)
 
 
     def getSecureShell(self):
         """Return a secure wrapper of the shell
 
         Returns:
-            instance of shell wrapper
-        """
-        class ShellWrapper(object):
-            """This class if a wrapper for Shell
-
-            It prevent some shell attributes to be accessed directly
-            """
-            ALLOWED_ATTRIBUTES = [
-                'flushCommandCache',
-                'getAvailableCommands',
-                'getCommand'
-            ]
-
-            def __init__(self, shell):
-                """Build a new shell wrapper
-
-                Args:
-                    shell: the initial shell instance
-                """
-                self.__shell = shell
-
-            def __getattr__(self, name):
-                """Allow some shell's functions to be accessed through shell wrapper
-
-                Args:
-                    name: the attribute's name
-                Returns:
-                    the shell attribute
-                Raise:
-                    ShellException if attribute is not allowed
-                """
-                if name in ShellWrapper.ALLOWED_ATTRIBUTES:
-                    return getattr(self.__shell, name)
-                raise ShellException("attribute {} is not reachable using shell wrapper".format(name))
-
-        return ShellWrapper(self)
+            the shell wrapper shared by all commands
+        """
+        return self.__secure_shell
+
+    @classmethod
+    def splitArguments(cls, cmdline):
+        """Split a command line into arguments like shlex.split()
+
+        Command lines without any quote or escape character, which are the
+        most common, are split by a regular expression, the others are
+        given to shlex
+
+        Args:
+            cmdline: the raw command line
+        Returns:
+            the list of arguments
+        Raises:
+            ValueError if the quoting of the command line is invalid
+        """
+        if cls.QUOTING_REGEX_PATTERN.search(cmdline) is None:
+            return cls.ARGUMENT_REGEX_PATTERN.findall(cmdline)
+        return shlex.split(cmdline)
 
     @classmethod
     def toCamelCase(cls, string):
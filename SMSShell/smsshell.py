@@ -27,23 +27,34 @@ __maintainer__ = 'Pierre GINDRAUD'
 __email__ = 'pgindraud@gmail.com'
 
 # System imports
+import contextlib
+import functools
 import importlib
+import json
 import logging
 import logging.handlers
 import os
 import signal
 import sys
+import threading
+import time
+# asyncio and multiprocessing are only imported by the functions which use them
+# because they are slow to import and useless in standalone mode
 
 # Projet Imports
 from .config import MyConfigParser
 from .validators import ValidationException, ValidatorChain
 from .filters import FilterException, FilterChain
 from .models import Message, SessionStates
-from .receivers import AbstractReceiver
+from .receivers import AbstractReceiver, AbstractAsyncReceiver, AsyncReceiverAdapter
+from .receivers import DetachedClientRequest
 from .parsers import AbstractParser
-from .transmitters import AbstractTransmitter
-from .metrics import AbstractMetricsHelper
+from .sessionstores import AbstractSessionStore
+from .transmitters import AbstractTransmitter, AbstractAsyncTransmitter, AsyncTransmitterAdapter
+from .metrics import AbstractMetricsHelper, MetricsRecorder
 from .shell import Shell
+from .utils import GammuSMSParser
+from .pipeline import Pipeline
 from .exceptions import SMSShellException, SMSException, ShellException, ShellInitException
 
 # Global project declarations
@@ -54,6 +65,9 @@ class SMSShell(object):
     """SMSShell main class
     """
 
+    # ordered list of the messages treatment pipeline stages
+    PIPELINE_STAGES = ['validate', 'execute', 'output', 'transmit']
+
     def __init__(self, daemon=False, log_level=None):
         """Constructor : Build the program lead object
 
@@ -76,6 +90,18 @@ class SMSShell(object):
         # Internal reference to metrics handler
         self.__metrics = None
 
+        # Internal references to daemon mode objects
+        self.__shell = None
+        self.__transmitter = None
+        self.__session_store = None
+        self.__tokens_store = dict()
+        self.__input_validators_chain = None
+        self.__input_filters_chain = None
+        self.__output_validators_chain = None
+        # the validators caches totals already counted per chain and result
+        self.__cache_counts = dict()
+        self.__cache_counts_lock = threading.Lock()
+
     def load(self, config_file):
         """Load configuration function
 
@@ -92,17 +118,22 @@ class SMSShell(object):
             return False, ('the configuration file {} is '
                            'not readable by the service').format(config_file)
 
+        load_start = time.perf_counter()
         status, msg = self.cp.load(config_file)
         if status:
             self.setLogLevel(self.__log_level or self.cp.getLogLevel())
             self.setLogTarget(self.cp.get(self.cp.MAIN_SECTION, 'log_target', fallback='STDOUT'))
+            g_logger.debug('configuration loaded in %.1fms',
+                           (time.perf_counter() - load_start) * 1000)
         return status, msg
 
-    def start(self, pid_path=None):
+    def start(self, pid_path=None, inputs=None):
         """Run the service features
 
         Daemonize only if daemon is True in constructor
         @param str pid_path : pid file's path
+        @param list inputs : the identifiers of the messages to treat
+                                in standalone mode
         @return boolean True is start success, False otherwise
         """
         # Restreint access to only owner
@@ -127,31 +158,10 @@ class SMSShell(object):
                 g_logger.fatal('Could not create daemon')
                 raise Exception('Could not create daemon')
 
-        # Check pidfile
-        if pid_path is None:
-            pid_path = self.cp.get(self.cp.MAIN_SECTION, 'pid', fallback='/var/run/smsshell.pid')
-        self.__pid_path = pid_path
-
-        # prevent program to run if the pidfile already exists
-        if os.path.isfile(self.__pid_path):
-            with open(self.__pid_path, 'r') as pid_file:
-                current_pid = pid_file.read()
-            if os.path.isdir('/proc/{}'.format(current_pid)):
-                with open('/proc/{}/cmdline'.format(current_pid)) as cmdline:
-                    current_cmdline_parts = cmdline.read().split('\0')
-
-                if current_cmdline_parts:
-                    current_cmdline = current_cmdline_parts[0]
-                raise ShellInitException('pidfile exists and associated ' +
-                                         'with running program {}'.format(current_cmdline))
-
-        # Create the pid file
-        try:
-            g_logger.debug("Creating PID file '%s'", self.__pid_path)
-            with open(self.__pid_path, 'w') as pid_file:
-                pid_file.write(str(os.getpid()))
-        except IOError:
-            g_logger.error("Unable to create PID file: %s", self.__pid_path)
+        # one-shot runs of standalone mode can be concurrent and do not use a pid file
+        standalone = self.cp.getMode() == 'STANDALONE'
+        if not standalone:
+            self.__createPidFile(pid_path)
 
         # loose users privileges if needed
         self.__downgrade()
@@ -159,7 +169,7 @@ class SMSShell(object):
         # Init metrics handler
         try:
             metrics = self.importAndLoadModule(
-                '.metrics.' + self.cp.get('daemon', 'metrics_handler', fallback='none'),
+                '.metrics.' + self.cp.getModeConfig('metrics_handler', fallback='none'),
                 'MetricsHelper', AbstractMetricsHelper, 'metrics'
             )
         except ShellInitException as ex:
@@ -175,18 +185,47 @@ class SMSShell(object):
         self.__stop_callbacks.append(metrics.stop)
 
         # run the fonctionnal endpoint
-        if self.cp.getMode() == 'STANDALONE':
-            # Init standalone mode
-            self.stop()
-            raise NotImplementedError('STANDALONE mode not yet implemented')
+        if standalone:
+            status = self.runStandaloneMode(inputs)
         else:
             self.runDaemonMode()
+            status = True
 
         # Stop properly
         self.stop()
 
-        return True
+        return status
+
+    def __createPidFile(self, pid_path):
+        """Create the pid file of this program
+
+        @param str pid_path : pid file's path, None to use the configured one
+        """
+        # Check pidfile
+        if pid_path is None:
+            pid_path = self.cp.get(self.cp.MAIN_SECTION, 'pid', fallback='/var/run/smsshell.pid')
+        self.__pid_path = pid_path
+
+        # prevent program to run if the pidfile already exists
+        if os.path.isfile(self.__pid_path):
+            with open(self.__pid_path, 'r') as pid_file:
+                current_pid = pid_file.read()
+            if os.path.isdir('/proc/{}'.format(current_pid)):
+                with open('/proc/{}/cmdline'.format(current_pid)) as cmdline:
+                    current_cmdline_parts = cmdline.read().split('\0')
 
+                if current_cmdline_parts:
+                    current_cmdline = current_cmdline_parts[0]
+                raise ShellInitException('pidfile exists and associated ' +
+                                         'with running program {}'.format(current_cmdline))
+
+        # Create the pid file
+        try:
+            g_logger.debug("Creating PID file '%s'", self.__pid_path)
+            with open(self.__pid_path, 'w') as pid_file:
+                pid_file.write(str(os.getpid()))
+        except IOError:
+            g_logger.error("Unable to create PID file: %s", self.__pid_path)
 
     def importAndLoadModule(self, module_path, class_name, abstract_class=None, config_section=None):
         """Import a sub module, instanciate a class and check object's instance
@@ -218,6 +257,36 @@ class SMSShell(object):
                                       "AbstractCommand class").format(module_path))
         return inst
 
+    def importAndLoadAsyncModule(self, module_path, class_name, abstract_class,
+                                 async_abstract_class, adapter_class,
+                                 config_section=None, executor=None):
+        """Import a sub module and instanciate its asyncio class
+
+        The 'Async' prefixed class is used if the module provides it, otherwise
+        the synchronous class is wrapped into the adapter class
+
+        @param str module_path the path to the module in the file system
+        @param str class_name the name of the synchronous class to instanciate
+        @param cls abstract_class the abstract class of the synchronous class
+        @param cls async_abstract_class the abstract class of the asyncio class
+        @param cls adapter_class the class used to wrap the synchronous instance
+        @param str config_section the name of the configuration section to load into
+                    the instance
+        @param executor the executor given to the adapter
+        """
+        try:
+            mod = importlib.import_module(module_path, package='SMSShell')
+        except ImportError as ex:
+            raise ShellInitException(("Unable to import the module '{0}',"
+                                      " reason : {1}").format(module_path, str(ex)))
+        if hasattr(mod, 'Async' + class_name):
+            return self.importAndLoadModule(module_path, 'Async' + class_name,
+                                            async_abstract_class, config_section)
+        g_logger.debug("module '%s' is run into executor", module_path)
+        return adapter_class(self.importAndLoadModule(module_path, class_name,
+                                                      abstract_class, config_section),
+                             executor)
+
     def getTokensStoreFromConfig(self):
         """Build the authentication tokens store from config
 
@@ -272,7 +341,7 @@ class SMSShell(object):
         """
         try:
             auth_attr = message.attribute('auth')
-        except KeyError:
+        except AttributeError:
             return None
 
         assert isinstance(auth_attr, dict)
@@ -298,10 +367,114 @@ class SMSShell(object):
             return needed_state
         return None
 
+    def runStandaloneMode(self, inputs=None):
+        """Entrypoint of standalone mode
+
+        Treat the messages given by gammu-smsd RunOnReceive and exit.
+        Only the modules and the command needed by the messages are loaded,
+        sessions are kept between runs by the optional sessions store
+
+        Args:
+            inputs: the identifiers of the messages given by gammu-smsd
+                    used by the 'file' input
+        Returns:
+            True if all messages have been treated and transmitted
+        """
+        run_start = time.perf_counter()
+        self.__shell = Shell(self.cp, self.__metrics)
+        self.initMessagesTreatments()
+        try:
+            parser = self.importAndLoadModule(
+                '.parsers.' + self.cp.getModeConfig('message_parser', fallback="json"),
+                'Parser', AbstractParser, 'parser'
+            )
+            self.__transmitter = self.importAndLoadModule(
+                '.transmitters.' + self.cp.getModeConfig('transmitter_type',
+                                                         fallback="python_gammu"),
+                'Transmitter', AbstractTransmitter, 'transmitter'
+            )
+            self.__session_store = self.importAndLoadModule(
+                '.sessionstores.' + self.cp.getModeConfig('session_store_type',
+                                                          fallback='memory'),
+                'SessionStore', AbstractSessionStore, 'session_store'
+            )
+        except ShellInitException as ex:
+            g_logger.fatal("Unable to load an internal module : %s", str(ex))
+            return False
+
+        raw_messages = self.readGammuMessages(inputs or [])
+        if not raw_messages:
+            g_logger.error('no message to treat')
+            return False
+
+        if not self.__transmitter.start():
+            g_logger.fatal('Unable to open transmitter')
+            return False
+        self.__stop_callbacks.append(self.__transmitter.stop)
+        if not self.__session_store.start():
+            g_logger.fatal('Unable to open sessions store')
+            return False
+        # the waiting sessions are written when the sessions store stops
+        self.__stop_callbacks.append(self.__session_store.stop)
+        self.__shell.setSessionStore(self.__session_store)
+        g_logger.debug('standalone mode ready in %.1fms',
+                       (time.perf_counter() - run_start) * 1000)
+
+        status = True
+        for raw_message in raw_messages:
+            client_context = DetachedClientRequest(json.dumps(raw_message))
+            with client_context as client_context_data:
+                msg = self.parseMessage(parser, client_context, client_context_data)
+                if msg is None:
+                    status = False
+                    continue
+                status = self.treatMessage(client_context, msg) and status
+        g_logger.info('treated %d messages in %.1fms',
+                      len(raw_messages), (time.perf_counter() - run_start) * 1000)
+        return status
+
+    def readGammuMessages(self, inputs):
+        """Read the messages given by gammu-smsd to the standalone mode
+
+        Args:
+            inputs: the identifiers of the messages, for the 'file' input they
+                        are the backup files names relative to the inbox path
+        Returns:
+            the list of decoded messages as dict
+        """
+        if self.cp.getInput() == 'env':
+            return [GammuSMSParser.decodeFromEnv()]
+
+        inbox_path = self.cp.getModeConfig('inbox_path', fallback='')
+        return [GammuSMSParser.decodeFromBackupFilePath(os.path.join(inbox_path, name))
+                for name in inputs]
+
     def runDaemonMode(self):
         """Entrypoint of daemon mode
         """
-        shell = Shell(self.cp, self.__metrics)
+        self.__shell = Shell(self.cp, self.__metrics)
+        self.initMessagesTreatments()
+        self.initSessionsMetrics()
+        try:
+            self.__session_store = self.importAndLoadModule(
+                '.sessionstores.' + self.cp.get('daemon', 'session_store_type',
+                                                fallback='memory'),
+                'SessionStore', AbstractSessionStore, 'session_store'
+            )
+        except ShellInitException as ex:
+            g_logger.fatal("Unable to load an internal module : %s", str(ex))
+            return False
+        self.__shell.setSessionStore(self.__session_store)
+
+        if self.cp.getEventLoop() == 'asyncio':
+            if self.cp.getWorkers('processes') > 1:
+                g_logger.error("option 'processes' is not available with the asyncio"
+                               " event loop, it is ignored")
+            if not self.__session_store.start():
+                g_logger.fatal('Unable to open sessions store')
+                return False
+            self.__stop_callbacks.append(self.__session_store.stop)
+            return self.runAsyncDaemonMode()
 
         # Init daemon mode objects
         try:
@@ -313,7 +486,7 @@ class SMSShell(object):
                 '.receivers.' + self.cp.get('daemon', 'receiver_type', fallback="fifo"),
                 'Receiver', AbstractReceiver, 'receiver'
             )
-            transm = self.importAndLoadModule(
+            self.__transmitter = self.importAndLoadModule(
                 '.transmitters.' + self.cp.get('daemon', 'transmitter_type', fallback="file"),
                 'Transmitter', AbstractTransmitter, 'transmitter'
             )
@@ -321,20 +494,388 @@ class SMSShell(object):
             g_logger.fatal("Unable to load an internal module : %s", str(ex))
             return False
 
+        # fork worker processes before opening the receiver
+        # so they do not inherit its file descriptors
+        processes = self.buildProcessPool()
+        if processes is not None:
+            processes.start()
+            self.__stop_callbacks.insert(0, processes.stop)
+
         if not recv.start():
             g_logger.fatal('Unable to open receiver')
             return False
         # register the receiver close callback to properly close opened file descriptors
         self.__stop_callbacks.append(recv.stop)
 
-        if not transm.start():
-            g_logger.fatal('Unable to open transmitter')
+        # with worker processes, the transmitter and the sessions store
+        # are run by each worker
+        pipeline = None
+        if processes is None:
+            if not self.__transmitter.start():
+                g_logger.fatal('Unable to open transmitter')
+                return False
+            self.__stop_callbacks.append(self.__transmitter.stop)
+            if not self.__session_store.start():
+                g_logger.fatal('Unable to open sessions store')
+                return False
+            self.__stop_callbacks.append(self.__session_store.stop)
+
+            # init the messages treatment pipeline
+            pipeline = self.buildPipeline()
+            if pipeline is not None:
+                pipeline.start()
+                self.__stop_callbacks.insert(0, pipeline.stop)
+        reject_when_full = self.cp.getQueueFullPolicy() == 'reject'
+
+        # read and parse each message from receiver
+        for client_context in recv.read():
+            with contextlib.ExitStack() as client_stack:
+                client_context_data = client_stack.enter_context(client_context)
+                # parse received content
+                msg = self.parseMessage(parser, client_context, client_context_data)
+                if msg is None:
+                    continue
+
+                if processes is not None:
+                    # the worker process of the number treats the message
+                    # and the pool becomes responsible of closing the client context
+                    job = (client_context, client_stack.pop_all())
+                    if not processes.submit(msg.number,
+                                            (msg.number, msg.content, msg.attributes),
+                                            job,
+                                            block=not reject_when_full):
+                        self.rejectMessage(client_context)
+                        job[1].close()
+                    continue
+
+                if pipeline is None:
+                    self.treatMessage(client_context, msg)
+                    continue
+
+                # the pipeline becomes responsible of closing the client context
+                # all messages from the same number are run in their arrival order
+                job = dict(client_context=client_context, msg=msg,
+                           client_stack=client_stack.pop_all())
+                if not pipeline.feed(msg.number, job, block=not reject_when_full):
+                    self.rejectMessage(client_context)
+                    job['client_stack'].close()
+
+    def buildPipeline(self):
+        """Build the staged pipeline used to treat parsed messages
+
+        The pipeline is only used if at least one stage is run by more
+        than one worker
+
+        Returns:
+            the Pipeline instance or None if messages must be treated
+            by the receiver's thread
+        """
+        workers = self.cp.getWorkers()
+        # transmitters are not required to be thread safe
+        # so the transmit stage is run by one worker by default
+        stages_workers = [(name, self.cp.getWorkers(name + '_workers',
+                                                    default=1 if name == 'transmit' else workers))
+                          for name in self.PIPELINE_STAGES]
+        if all(count == 1 for _, count in stages_workers):
+            return None
+
+        queue_size = self.cp.getQueueSize()
+        g_logger.info('using a pipeline with stages %s and a queue size of %d',
+                      ', '.join('{}({})'.format(name, count) for name, count in stages_workers),
+                      queue_size)
+        stages_funcs = dict(validate=self.__stageValidate,
+                            execute=self.__stageExecute,
+                            output=self.__stageOutput,
+                            transmit=self.__stageTransmit)
+        pipeline = Pipeline('pipeline',
+                            done_callback=self.__closeJob,
+                            metrics=self.__metrics)
+        for name, count in stages_workers:
+            pipeline.addStage(name, stages_funcs[name], count, queue_size)
+        return pipeline
+
+    def buildProcessPool(self):
+        """Build the pool of worker processes used to treat parsed messages
+
+        Messages are dispatched to worker processes using their number, so
+        each session lives in only one worker process
+
+        Returns:
+            the ProcessPool instance or None if messages must be treated
+            by the main process
+        """
+        processes = self.cp.getWorkers('processes')
+        if processes == 1:
+            return None
+        from .processes import ProcessPool
+
+        queue_size = self.cp.getQueueSize()
+        g_logger.info('using %d worker processes with a queue size of %d',
+                      processes, queue_size)
+        return ProcessPool('processes',
+                           self.__treatInProcess,
+                           processes,
+                           queue_size,
+                           initializer=self.__startWorkerProcess,
+                           finalizer=self.__stopWorkerProcess,
+                           done_callback=self.__closeProcessJob,
+                           metrics=self.__metrics)
+
+    def __startWorkerProcess(self):
+        """Open the transmitter and the sessions store of a worker process
+
+        The counters of the worker process are recorded to be replayed
+        by the main process, which exports them
+
+        Returns:
+            True if both have been opened
+        """
+        self.__metrics = MetricsRecorder()
+        if not self.__transmitter.start():
+            return False
+        if not self.__session_store.start():
+            self.__transmitter.stop()
             return False
-        self.__stop_callbacks.append(transm.stop)
+        return True
 
+    def __stopWorkerProcess(self):
+        """Close the transmitter and the sessions store of a worker process
+        """
+        self.__transmitter.stop()
+        self.__session_store.stop()
+
+    def runAsyncDaemonMode(self):
+        """Entrypoint of daemon mode with asyncio event loop
+
+        Receivers and transmitters which do not provide an asyncio
+        implementation are run into an executor
+        """
+        import asyncio
+        import concurrent.futures
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.cp.getWorkers())
+        try:
+            parser = self.importAndLoadModule(
+                '.parsers.' + self.cp.get('daemon', 'message_parser', fallback="json"),
+                'Parser', AbstractParser, 'parser'
+            )
+            recv = self.importAndLoadAsyncModule(
+                '.receivers.' + self.cp.get('daemon', 'receiver_type', fallback="fifo"),
+                'Receiver', AbstractReceiver, AbstractAsyncReceiver, AsyncReceiverAdapter,
+                'receiver', executor
+            )
+            transm = self.importAndLoadAsyncModule(
+                '.transmitters.' + self.cp.get('daemon', 'transmitter_type', fallback="file"),
+                'Transmitter', AbstractTransmitter, AbstractAsyncTransmitter,
+                AsyncTransmitterAdapter, 'transmitter', executor
+            )
+        except ShellInitException as ex:
+            g_logger.fatal("Unable to load an internal module : %s", str(ex))
+            executor.shutdown(wait=False)
+            return False
+
+        g_logger.info('using asyncio event loop with %d executor workers',
+                      self.cp.getWorkers())
+        # the receiver stops reading while queue_size requests are waiting
+        recv.setQueueSize(self.cp.getQueueSize())
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            return loop.run_until_complete(self.__runEventLoop(parser, recv, transm, executor))
+        finally:
+            loop.close()
+            executor.shutdown(wait=False)
+
+    async def __runEventLoop(self, parser, recv, transm, executor):
+        """Main coroutine of the asyncio daemon mode
+
+        Args:
+            parser: the message parser
+            recv: the AbstractAsyncReceiver instance
+            transm: the AbstractAsyncTransmitter instance
+            executor: the executor used to run blocking operations
+        Returns:
+            False if the receiver or transmitter cannot be started
+        """
+        import asyncio
+        loop = asyncio.get_event_loop()
+        if not await recv.start():
+            g_logger.fatal('Unable to open receiver')
+            return False
+        try:
+            if not await transm.start():
+                g_logger.fatal('Unable to open transmitter')
+                return False
+            treatments = set()
+            reading = asyncio.ensure_future(
+                self.__readAsync(parser, recv, transm, executor, treatments))
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                loop.add_signal_handler(signum, reading.cancel)
+            try:
+                await reading
+            except asyncio.CancelledError:
+                g_logger.debug('stop reading from receiver')
+            # let running treatments finish
+            if treatments:
+                await asyncio.wait(treatments)
+            await transm.stop()
+        finally:
+            await recv.stop()
+        return True
+
+    async def __readAsync(self, parser, recv, transm, executor, treatments):
+        """Read client requests and run a treatment task for each of them
+
+        Args:
+            parser: the message parser
+            recv: the AbstractAsyncReceiver instance
+            transm: the AbstractAsyncTransmitter instance
+            executor: the executor used to run blocking operations
+            treatments: the set of running treatments tasks
+        """
+        import asyncio
+        # lock and number of waiting tasks per subject
+        subject_locks = dict()
+        max_treatments = self.cp.getQueueSize()
+        reject_when_full = self.cp.getQueueFullPolicy() == 'reject'
+        while True:
+            client_context = await recv.read()
+            if max_treatments and len(treatments) >= max_treatments:
+                if reject_when_full:
+                    with client_context:
+                        self.rejectMessage(client_context)
+                    continue
+                # stop reading until one treatment finishes
+                await asyncio.wait(treatments, return_when=asyncio.FIRST_COMPLETED)
+            task = asyncio.ensure_future(self.__treatClientRequestAsync(
+                parser, client_context, transm, executor, subject_locks))
+            treatments.add(task)
+            task.add_done_callback(treatments.discard)
+
+    async def __treatClientRequestAsync(self, parser, client_context, transm,
+                                        executor, subject_locks):
+        """Parse and treat one client request
+
+        Messages of the same subject are treated in their arrival order
+
+        Args:
+            parser: the message parser
+            client_context: the client request context
+            transm: the AbstractAsyncTransmitter instance
+            executor: the executor used to run blocking operations
+            subject_locks: the dict of per subject locks
+        """
+        import asyncio
+        with client_context as client_context_data:
+            msg = self.parseMessage(parser, client_context, client_context_data)
+            if msg is None:
+                return
+
+            # the lock is taken before any await to keep arrival order
+            if msg.number not in subject_locks:
+                subject_locks[msg.number] = [asyncio.Lock(), 0]
+            subject_lock = subject_locks[msg.number]
+            subject_lock[1] += 1
+            try:
+                async with subject_lock[0]:
+                    await self.treatMessageAsync(client_context, msg, transm, executor)
+            finally:
+                subject_lock[1] -= 1
+                if not subject_lock[1]:
+                    del subject_locks[msg.number]
+
+    def __stageValidate(self, job):
+        """Pipeline stage : validate and filter the incoming message
+        """
+        return self.validateInputMessage(job['client_context'], job['msg'])
+
+    def __stageExecute(self, job):
+        """Pipeline stage : run the message in the shell
+        """
+        job['response'] = self.executeMessage(job['client_context'], job['msg'])
+        return True
+
+    def __stageOutput(self, job):
+        """Pipeline stage : forge and validate the answer
+        """
+        job['answer'] = self.forgeAnswer(job['client_context'], job['msg'], job['response'])
+        return job['answer'] is not None
+
+    def __stageTransmit(self, job):
+        """Pipeline stage : transmit the answer
+        """
+        return self.transmitAnswer(job['client_context'], job['answer'])
+
+    @staticmethod
+    def __closeJob(job):
+        """Close the client context of a job leaving the pipeline
+        """
+        job['client_stack'].close()
+
+    def __treatInProcess(self, payload):
+        """Treat a message inside a worker process
+
+        Args:
+            payload: the tuple of message number, content and attributes
+        Returns:
+            the tuple of the treatment chain and the response datas
+            to give back to the client request, and of the counters
+            increments recorded during the treatment
+        """
+        number, content, attributes = payload
+        client_context = DetachedClientRequest(None)
+        self.treatMessage(client_context, Message(number, content, attributes))
+        return (client_context.getTreatmentChain(), client_context.popResponseData(),
+                self.__metrics.popRecords())
+
+    def __closeProcessJob(self, job, result):
+        """Give back the treatment result of a worker process to the client
+
+        Args:
+            job: the tuple of client context and its exit stack
+            result: the value returned by __treatInProcess() or None if
+                        the worker process failed
+        """
+        client_context, client_stack = job
+        if result is None:
+            client_context.addResponseData(error='message treatment failed')
+        else:
+            chain, response_data, records = result
+            MetricsRecorder.replay(records, self.__metrics)
+            client_context.extendTreatmentChain(chain)
+            client_context.addResponseData(**response_data)
+        client_stack.close()
+
+    def hasWorkerProcesses(self):
+        """Return True if messages are treated by worker processes
+
+        Returns:
+            boolean
+        """
+        return self.cp.getEventLoop() != 'asyncio' and self.cp.getWorkers('processes') > 1
+
+    def initSessionsMetrics(self):
+        """Declare the gauges which describe the sessions of the shell
+
+        With worker processes, the sessions live in the workers
+        so these gauges are not declared
+        """
+        if self.hasWorkerProcesses():
+            return
+        sessions = self.__shell.getSessionMap()
+        self.__metrics.gauge('session.live', callback=sessions.__len__,
+                             description='Number of sessions kept in memory')
+        self.__metrics.gauge('session.evicted', labels=['reason'],
+                             description='Number of evicted sessions per reason')
+        for reason in ['expired', 'overflow']:
+            self.__metrics.gauge('session.evicted', labels=dict(reason=reason),
+                                 callback=functools.partial(sessions.evictedCount, reason))
+
+    def initMessagesTreatments(self):
+        """Init the authentication tokens, metrics and chains used by treatments
+        """
         g_logger.debug('initialize authentication tokens store')
-        tokens_store = self.getTokensStoreFromConfig()
-        g_logger.info('loaded %d authentication tokens in store', len(tokens_store))
+        self.__tokens_store = self.getTokensStoreFromConfig()
+        g_logger.info('loaded %d authentication tokens in store', len(self.__tokens_store))
 
         # init counters
         g_logger.debug('initialize metrics counters')
@@ -342,88 +883,255 @@ class SMSShell(object):
         self.__metrics.counter('message.transmit.total', labels=['status'], description='Number of transmitted messages per status')
 
         # init messages filters
+        g_logger.debug('initialize incoming messages validators')
+        cache_size = self.cp.getModeConfigInt('validators_cache_size', 0, minimum=0)
+        self.__input_validators_chain = ValidatorChain(cache_size)
+        self.__input_validators_chain.addLinksFromDict(self.cp.getValidatorsFromConfig('input_validators'))
+        self.__input_filters_chain = FilterChain()
+        self.__input_filters_chain.addLinksFromDict(self.cp.getFiltersFromConfig('input_filters'))
+        g_logger.debug('initialize outgoing messages validators')
+        self.__output_validators_chain = ValidatorChain(cache_size)
+        self.__output_validators_chain.addLinksFromDict(self.cp.getValidatorsFromConfig('output_validators'))
+        if cache_size:
+            self.__metrics.counter('validator.cache.total', labels=['chain', 'result'],
+                                   description='Number of values validated by the validators caches per result')
+
+    def parseMessage(self, parser, client_context, client_context_data):
+        """Parse the received content
+
+        Args:
+            parser: the message parser
+            client_context: the client request context
+            client_context_data: the received content
+        Returns:
+            the Message instance, None if the content is invalid
+        """
         try:
-            g_logger.debug('initialize incoming messages validators')
-            input_validators_chain = ValidatorChain()
-            input_validators_chain.addLinksFromDict(self.cp.getValidatorsFromConfig('input_validators'))
-            input_filters_chain = FilterChain()
-            input_filters_chain.addLinksFromDict(self.cp.getFiltersFromConfig('input_filters'))
-            g_logger.debug('initialize outgoing messages validators')
-            output_validators_chain = ValidatorChain()
-            output_validators_chain.addLinksFromDict(self.cp.getValidatorsFromConfig('output_validators'))
-        except ShellInitException as ex:
-            raise ex
-            g_logger.fatal("Unable to load a classes : %s", str(ex))
+            msg = parser.parse(client_context_data)
+        except SMSException as ex:
+            self.__metrics.counter('message.receive.total', labels=dict(status='error'))
+            g_logger.error('received a bad message, skipping because of %s', str(ex))
+            return None
+        client_context.appendTreatmentChain('parsed')
+        return msg
+
+    def treatMessage(self, client_context, msg):
+        """Run all treatments steps of a parsed message
+
+        Validate, execute the command and transmit the answer
+
+        Args:
+            client_context: the client request context
+            msg: the parsed Message
+        Returns:
+            True if the answer was transmitted, False otherwise
+        """
+        if not self.validateInputMessage(client_context, msg):
             return False
 
-        # read and parse each message from receiver
-        for client_context in recv.read():
-            with client_context as client_context_data:
-                # parse received content
-                try:
-                    msg = parser.parse(client_context_data)
-                    client_context.appendTreatmentChain('parsed')
-                except SMSException as ex:
-                    self.__metrics.counter('message.receive.total', labels=dict(status='error'))
-                    g_logger.error('received a bad message, skipping because of %s', str(ex))
-                    continue
+        response_content = self.executeMessage(client_context, msg)
 
-                # validate received content
-                try:
-                    input_validators_chain.callChainOnObject(msg)
-                    input_filters_chain.callChainOnObject(msg)
-                except (ValidationException, FilterException) as ex:
-                    self.__metrics.counter('message.receive.total', labels=dict(status='error'))
-                    g_logger.error(('incoming message did not passed the' +
-                                    ' validation step because of : %s'),
-                                   str(ex))
-                    continue
-                self.__metrics.counter('message.receive.total', labels=dict(status='ok'))
-                client_context.appendTreatmentChain('input_validated')
+        answer = self.forgeAnswer(client_context, msg, response_content)
+        if answer is None:
+            return False
 
-                # extract optional overrided role
-                as_role = SMSShell.extractRoleFromMessageAndStore(tokens_store, msg)
+        return self.transmitAnswer(client_context, answer)
 
-                # run in shell
-                try:
-                    response_content = shell.exec(msg.number, msg.asString(), as_role=as_role)
-                    client_context.appendTreatmentChain('executed')
-                except ShellException as ex:
-                    g_logger.error('error during command execution : %s', ex.args[0])
-                    if len(ex.args) > 1 and ex.args[1]:
-                        ex_message = ex.args[1]
-                    else:
-                        ex_message = str(ex)
-                    response_content = '#Err: {}'.format(ex_message)
-
-                # forge the answer
-
-                answer = Message(msg.number, response_content)
-                client_context.addResponseData(output=answer.asString())
-
-                if not msg.attribute('transmit', True):
-                    self.__metrics.counter('message.transmit.total', labels=dict(status='discarded'))
-                    continue
+    def rejectMessage(self, client_context):
+        """Answer to the client that its message cannot be treated now
 
-                # validate outgoing content
-                try:
-                    output_validators_chain.callChainOnObject(answer)
-                except ValidationException as ex:
-                    self.__metrics.counter('message.transmit.total', labels=dict(status='error'))
-                    g_logger.error('outgoing message did not passed validation')
-                    continue
-                client_context.appendTreatmentChain('output_validated')
+        Args:
+            client_context: the client request context
+        """
+        self.__metrics.counter('message.receive.total', labels=dict(status='rejected'))
+        g_logger.warning('messages queue is full, rejecting incoming message')
+        client_context.addResponseData(error='server busy, message rejected')
+        client_context.appendTreatmentChain('rejected')
 
-                # transmit answer to client
-                try:
-                    transm.transmit(answer)
-                except SMSException as ex:
-                    self.__metrics.counter('message.transmit.total', labels=dict(status='error'))
-                    g_logger.error('error on emitting a message: %s', str(ex))
-                    continue
-                self.__metrics.counter('message.transmit.total', labels=dict(status='ok'))
-                client_context.appendTreatmentChain('transmitted')
+    def executeMessage(self, client_context, msg):
+        """Run the message in the shell
+
+        Args:
+            client_context: the client request context
+            msg: the validated Message
+        Returns:
+            the response content
+        """
+        try:
+            response_content = self.__shell.exec(msg.number, msg.asString(),
+                                                 as_role=self.__extractRole(msg))
+            client_context.appendTreatmentChain('executed')
+        except ShellException as ex:
+            response_content = SMSShell.formatShellError(ex)
+        return response_content
+
+    def transmitAnswer(self, client_context, answer):
+        """Transmit the answer to the end user
+
+        Args:
+            client_context: the client request context
+            answer: the answer Message
+        Returns:
+            True if the answer was transmitted, False otherwise
+        """
+        try:
+            self.__transmitter.transmit(answer)
+        except SMSException as ex:
+            return self.__transmitted(client_context, ex)
+        return self.__transmitted(client_context)
+
+    async def treatMessageAsync(self, client_context, msg, transm, executor):
+        """Coroutine version of treatMessage() for the asyncio daemon mode
+
+        Args:
+            client_context: the client request context
+            msg: the parsed Message
+            transm: the AbstractAsyncTransmitter instance
+            executor: the executor used to run blocking operations
+        Returns:
+            True if the answer was transmitted, False otherwise
+        """
+        if not self.validateInputMessage(client_context, msg):
+            return False
 
+        # run in shell
+        try:
+            response_content = await self.__shell.execAsync(msg.number, msg.asString(),
+                                                            as_role=self.__extractRole(msg),
+                                                            executor=executor)
+            client_context.appendTreatmentChain('executed')
+        except ShellException as ex:
+            response_content = SMSShell.formatShellError(ex)
+
+        answer = self.forgeAnswer(client_context, msg, response_content)
+        if answer is None:
+            return False
+
+        # transmit answer to client
+        try:
+            await transm.transmit(answer)
+        except SMSException as ex:
+            return self.__transmitted(client_context, ex)
+        return self.__transmitted(client_context)
+
+    def validateInputMessage(self, client_context, msg):
+        """Run the input validators and filters chains on the message
+
+        Args:
+            client_context: the client request context
+            msg: the parsed Message
+        Returns:
+            True if the message is valid, False otherwise
+        """
+        try:
+            try:
+                self.__input_validators_chain.callChainOnObject(msg)
+            finally:
+                self.__countValidatorsCache('input', self.__input_validators_chain)
+            self.__input_filters_chain.callChainOnObject(msg)
+        except (ValidationException, FilterException) as ex:
+            self.__metrics.counter('message.receive.total', labels=dict(status='error'))
+            g_logger.error(('incoming message did not passed the' +
+                            ' validation step because of : %s'),
+                           str(ex))
+            return False
+        self.__metrics.counter('message.receive.total', labels=dict(status='ok'))
+        client_context.appendTreatmentChain('input_validated')
+        return True
+
+    def forgeAnswer(self, client_context, msg, response_content):
+        """Build and validate the answer message
+
+        Args:
+            client_context: the client request context
+            msg: the received Message
+            response_content: the output of the command
+        Returns:
+            the answer Message to transmit, None if it must not be transmitted
+        """
+        answer = Message(msg.number, response_content)
+        client_context.addResponseData(output=answer.asString())
+
+        if not msg.attribute('transmit', True):
+            self.__metrics.counter('message.transmit.total', labels=dict(status='discarded'))
+            return None
+
+        # validate outgoing content
+        try:
+            self.__output_validators_chain.callChainOnObject(answer)
+        except ValidationException as ex:
+            self.__countValidatorsCache('output', self.__output_validators_chain)
+            self.__metrics.counter('message.transmit.total', labels=dict(status='error'))
+            g_logger.error('outgoing message did not passed validation')
+            return None
+        self.__countValidatorsCache('output', self.__output_validators_chain)
+        client_context.appendTreatmentChain('output_validated')
+        return answer
+
+    def __countValidatorsCache(self, chain_name, chain):
+        """Increase the validators cache counters by the values validated since the last call
+
+        Args:
+            chain_name: the name of the chain in the counter labels
+            chain: the ValidatorChain instance
+        """
+        if not chain.cache_size:
+            return
+        with self.__cache_counts_lock:
+            increases = []
+            for result in ['hit', 'miss']:
+                count = chain.cacheCount(result)
+                last = self.__cache_counts.get((chain_name, result), 0)
+                self.__cache_counts[(chain_name, result)] = count
+                # the caches are emptied when the chain is compiled again
+                increases.append((result, count - last if count >= last else count))
+        for result, value in increases:
+            if value:
+                self.__metrics.counter('validator.cache.total', value=value,
+                                       labels=dict(chain=chain_name, result=result))
+
+    def __transmitted(self, client_context, error=None):
+        """Account the result of a transmission
+
+        Args:
+            client_context: the client request context
+            error: the optional SMSException raised by the transmitter
+        Returns:
+            True if the answer was transmitted, False otherwise
+        """
+        if error is not None:
+            self.__metrics.counter('message.transmit.total', labels=dict(status='error'))
+            g_logger.error('error on emitting a message: %s', str(error))
+            return False
+        self.__metrics.counter('message.transmit.total', labels=dict(status='ok'))
+        client_context.appendTreatmentChain('transmitted')
+        return True
+
+    def __extractRole(self, msg):
+        """Extract optional overrided role from the message
+
+        Args:
+            msg: the received Message
+        Returns:
+            the SessionStates or None
+        """
+        return SMSShell.extractRoleFromMessageAndStore(self.__tokens_store, msg)
+
+    @staticmethod
+    def formatShellError(ex):
+        """Build the answer content of a command execution error
+
+        Args:
+            ex: the ShellException raised during command execution
+        Returns:
+            the answer content as a string
+        """
+        g_logger.error('error during command execution : %s', ex.args[0])
+        if len(ex.args) > 1 and ex.args[1]:
+            ex_message = ex.args[1]
+        else:
+            ex_message = str(ex)
+        return '#Err: {}'.format(ex_message)
 
     def stop(self):
         """Stop properly the server after signal received
@@ -441,11 +1149,12 @@ class SMSShell(object):
                                  cb_stop.__self__.__class__,
                                  str(ex))
         # Remove the pid file
-        try:
-            g_logger.debug("Remove PID file %s", self.__pid_path)
-            os.remove(self.__pid_path)
-        except OSError as ex:
-            g_logger.error("Unable to remove PID file: %s", str(ex))
+        if self.__pid_path is not None:
+            try:
+                g_logger.debug("Remove PID file %s", self.__pid_path)
+                os.remove(self.__pid_path)
+            except OSError as ex:
+                g_logger.error("Unable to remove PID file: %s", str(ex))
 
         g_logger.info("Exiting SMSShell")
 
@@ -53,3 +53,83 @@ class AbstractTransmitter(AbstractModule):
         """
         assert isinstance(answer, Message)
         raise NotImplementedError("You must implement the 'transmit' method in transmitter class")
+
+
+class AbstractAsyncTransmitter(AbstractModule):
+    """An abstract asyncio transmitter
+
+    All methods are coroutines run by the daemon event loop
+    """
+
+    async def start(self):
+        """Prepare the transmitter
+
+        Returns:
+            True if init has success, otherwise False
+        """
+        raise NotImplementedError("You must implement the 'start' method in transmitter class")
+
+    async def stop(self):
+        """Close properly the transmitter
+
+        Returns:
+            True if stop has success, otherwise False
+        """
+        raise NotImplementedError("You must implement the 'stop' method in transmitter class")
+
+    async def transmit(self, answer):
+        """Forward the message to end user
+
+        Args:
+            answer : the Message instance of the message to transmit to end user
+        """
+        assert isinstance(answer, Message)
+        raise NotImplementedError("You must implement the 'transmit' method in transmitter class")
+
+
+class AsyncTransmitterAdapter(AbstractAsyncTransmitter):
+    """Run a synchronous transmitter behind the asyncio transmitter interface
+
+    Each call of the wrapped transmitter is run into the executor.
+    Transmitters are not required to be thread safe, so answers are
+    transmitted one by one
+    """
+
+    def __init__(self, transmitter, executor=None):
+        """Constructor :
+
+        Args:
+            transmitter : the AbstractTransmitter instance to wrap
+            executor : the executor used to run the transmitter's methods
+        """
+        assert isinstance(transmitter, AbstractTransmitter)
+        self.__transmitter = transmitter
+        self.__executor = executor
+        # serialize transmissions, it is built by start() into the event loop
+        self.__lock = None
+        super().__init__(config=transmitter.config, metrics=transmitter.metrics)
+
+    async def start(self):
+        import asyncio
+        self.__lock = asyncio.Lock()
+        return await self.__runInExecutor(self.__transmitter.start)
+
+    async def stop(self):
+        return await self.__runInExecutor(self.__transmitter.stop)
+
+    async def transmit(self, answer):
+        assert isinstance(answer, Message)
+        async with self.__lock:
+            return await self.__runInExecutor(self.__transmitter.transmit, answer)
+
+    async def __runInExecutor(self, func, *args):
+        """Run a method of the wrapped transmitter into the executor
+
+        Args:
+            func: the callable to run
+            args: the arguments to give to the callable
+        Returns:
+            the value returned by the callable
+        """
+        import asyncio
+        return await asyncio.get_event_loop().run_in_executor(self.__executor, func, *args)
@@ -23,6 +23,7 @@
 # System imports
 import logging
 import os
+import threading
 
 # Project imports
 from . import AbstractTransmitter
@@ -41,6 +42,9 @@ class Transmitter(AbstractTransmitter):
         """
         self.__smsd = None
         self.__default_umask = 0o117
+        # the umask is process wide and the gammu SMSD handle
+        # is not known to be thread safe, so messages are sent one by one
+        self.__lock = threading.Lock()
 
         # configuration
         self.__config = self.getConfig('smsdrc_configuration', fallback='/etc/gammu-smsdrc')
@@ -100,6 +104,9 @@ class Transmitter(AbstractTransmitter):
         }
 
         # change umask before to create outbox file
-        old_umask = os.umask(self.__umask)
-        self.__smsd.InjectSMS([message])
-        os.umask(old_umask)
+        with self.__lock:
+            old_umask = os.umask(self.__umask)
+            try:
+                self.__smsd.InjectSMS([message])
+            finally:
+                os.umask(old_umask)
@@ -26,6 +26,7 @@ import pwd
 
 # Project imports
 from .gammusmsdparser import GammuSMSParser
+from .framing import FrameDecoder, FrameTooLargeException, encodeFrame
 
 
 def userToUid(user):
@@ -0,0 +1,213 @@
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+"""Framing utilities to carry many messages over one byte stream
+
+Availables framings are :
+  none    : each read chunk is a message, only suitable for one short
+            message per connection
+  newline : each message is terminated by a newline character, JSON
+            messages never contain a raw newline
+  length  : each message is prefixed by its length as a 4 bytes big endian
+            unsigned integer
+"""
+
+# System imports
+import struct
+
+# Project imports
+from ..exceptions import SMSException
+
+FRAMING_MAP = ['none', 'newline', 'length']
+DEFAULT_MAX_FRAME_SIZE = 65536
+
+LENGTH_PREFIX = struct.Struct('!I')
+NEWLINE = b'\n'
+
+
+class FrameTooLargeException(SMSException):
+    """Raised when a received frame exceed the maximum frame size
+
+    Args:
+        message: the error message
+        frames: the list of the complete frames received with the faulty one
+    """
+
+    def __init__(self, message, frames=None):
+        super().__init__(message)
+        self.frames = frames or []
+
+
+def encodeFrame(framing, payload):
+    """Build the frame which carry the given payload
+
+    Args:
+        framing: the name of the framing in FRAMING_MAP
+        payload: the payload as bytes or string
+    Returns:
+        the frame as bytes
+    """
+    assert framing in FRAMING_MAP
+    if not isinstance(payload, bytes):
+        payload = payload.encode()
+    if framing == 'newline':
+        return payload + NEWLINE
+    if framing == 'length':
+        return LENGTH_PREFIX.pack(len(payload)) + payload
+    return payload
+
+
+class FrameDecoder(object):
+    """Reassemble the frames received from one byte stream
+    """
+
+    def __init__(self, framing='newline', max_frame_size=DEFAULT_MAX_FRAME_SIZE):
+        """Constructor: Build a new decoder with an empty buffer
+
+        Args:
+            framing: the name of the framing in FRAMING_MAP
+            max_frame_size: the maximum size of one frame payload in bytes
+        """
+        assert framing in FRAMING_MAP
+        self.framing = framing
+        self.max_frame_size = int(max_frame_size)
+        self.__buffer = bytearray()
+        # the remaining part of a too large frame is dropped as it is
+        # received, the number of bytes with length framing, until the
+        # next newline with newline framing
+        self.__skip = 0
+        self.__skip_line = False
+
+    def pending(self):
+        """Return the number of buffered bytes which do not form a complete frame
+
+        Returns:
+            the number of bytes as integer
+        """
+        return len(self.__buffer)
+
+    def flush(self):
+        """Extract the buffered bytes as a last frame, at the end of the stream
+
+        With newline framing, the last message may not be terminated
+        by a newline. With length framing, the buffered bytes are an
+        incomplete frame, they are dropped
+
+        Returns:
+            the list of the last frame payload as bytes, which may be empty
+        """
+        data = bytes(self.__buffer)
+        self.__buffer = bytearray()
+        skip_line = self.__skip_line
+        self.__skip = 0
+        self.__skip_line = False
+        if self.framing != 'newline' or not data or skip_line:
+            return []
+        return [data]
+
+    def feed(self, data):
+        """Append received bytes and extract all complete frames
+
+        Args:
+            data: the received bytes
+        Returns:
+            the list of complete frames payloads as bytes
+        Raises:
+            FrameTooLargeException if a frame exceed the maximum frame size,
+            the frame is dropped and the decoder can still be used to read the
+            following ones. The complete frames are given by the exception
+        """
+        if self.framing == 'none':
+            if len(data) > self.max_frame_size:
+                raise FrameTooLargeException('frame of {} bytes exceed the maximum of {}'.format(
+                    len(data), self.max_frame_size))
+            return [bytes(data)]
+
+        scanned = len(self.__buffer)
+        self.__buffer.extend(data)
+        if self.framing == 'newline':
+            frames, sizes = self.__splitNewline(scanned)
+        else:
+            frames, sizes = self.__splitLength()
+        if sizes:
+            raise FrameTooLargeException('frames of {} bytes exceed the maximum of {}'.format(
+                ', '.join(str(size) for size in sizes), self.max_frame_size), frames)
+        return frames
+
+    def __splitNewline(self, scanned):
+        """Extract newline terminated frames from the buffer
+
+        Args:
+            scanned: the number of bytes already known to not contain a newline
+        Returns:
+            the list of frames and the list of the sizes of too large frames
+        """
+        frames = []
+        sizes = []
+        start = 0
+        while True:
+            end = self.__buffer.find(NEWLINE, max(start, scanned))
+            if end == -1:
+                break
+            if self.__skip_line:
+                # end of a too large frame
+                self.__skip_line = False
+            elif end - start > self.max_frame_size:
+                sizes.append(end - start)
+            else:
+                frames.append(bytes(self.__buffer[start:end]))
+            start = end + 1
+        del self.__buffer[:start]
+        if len(self.__buffer) > self.max_frame_size:
+            if not self.__skip_line:
+                sizes.append(len(self.__buffer))
+            self.__buffer = bytearray()
+            self.__skip_line = True
+        return frames, sizes
+
+    def __splitLength(self):
+        """Extract length prefixed frames from the buffer
+
+        Returns:
+            the list of frames and the list of the sizes of too large frames
+        """
+        frames = []
+        sizes = []
+        start = 0
+        while True:
+            if self.__skip:
+                dropped = min(self.__skip, len(self.__buffer) - start)
+                start += dropped
+                self.__skip -= dropped
+                if self.__skip:
+                    break
+            if len(self.__buffer) - start < LENGTH_PREFIX.size:
+                break
+            size, = LENGTH_PREFIX.unpack_from(self.__buffer, start)
+            if size > self.max_frame_size:
+                sizes.append(size)
+                self.__skip = LENGTH_PREFIX.size + size
+                continue
+            end = start + LENGTH_PREFIX.size + size
+            if end > len(self.__buffer):
+                break
+            frames.append(bytes(self.__buffer[start + LENGTH_PREFIX.size:end]))
+            start = end
+        del self.__buffer[:start]
+        return frames, sizes
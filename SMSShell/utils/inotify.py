@@ -0,0 +1,130 @@
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+"""Minimal binding to the Linux inotify API
+
+The binding uses the C library through ctypes, so it is only available
+on Linux systems which provide inotify, see isAvailable()
+"""
+
+# System imports
+import ctypes
+import ctypes.util
+import os
+import struct
+
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    _libc.inotify_init1.argtypes = [ctypes.c_int]
+    _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+except (OSError, AttributeError):
+    _libc = None
+
+# events masks, see inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0o2000000)
+
+EVENT_HEADER = struct.Struct('iIII')
+# large enough for many events with file names up to NAME_MAX
+READ_SIZE = 64 * (EVENT_HEADER.size + 256)
+
+
+def isAvailable():
+    """Return True if the inotify API can be used on this system
+
+    Returns:
+        boolean
+    """
+    return _libc is not None
+
+
+class Inotify(object):
+    """An inotify instance which watches some paths
+    """
+
+    def __init__(self):
+        """Constructor: Build a new non blocking inotify instance
+
+        Raises:
+            OSError if the inotify instance cannot be created
+        """
+        if _libc is None:
+            raise OSError('inotify is not available on this system')
+        self.__fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.__fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+    def fileno(self):
+        """Return the file descriptor to use with select
+
+        Returns:
+            the file descriptor as integer
+        """
+        return self.__fd
+
+    def addWatch(self, path, mask):
+        """Watch the events of the given path
+
+        Args:
+            path: the path to watch
+            mask: the events to watch
+        Returns:
+            the watch descriptor as integer
+        Raises:
+            OSError if the path cannot be watched
+        """
+        wd = _libc.inotify_add_watch(self.__fd, os.fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def read(self):
+        """Read all available events without blocking
+
+        Returns:
+            the list of (watch descriptor, mask, cookie, name) tuples
+        """
+        events = []
+        while True:
+            try:
+                data = os.read(self.__fd, READ_SIZE)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                events.append((wd, mask, cookie, name))
+
+    def close(self):
+        """Close the inotify instance and remove all its watches
+        """
+        if self.__fd >= 0:
+            os.close(self.__fd)
+            self.__fd = -1
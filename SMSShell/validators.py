@@ -21,15 +21,24 @@
 """
 
 # System imports
+import functools
+import logging
+import os
 import re
+import threading
+import time
 
 # Project imports
 from .chain import Chain
 
 __all__ = [
-    'Regexp'
+    'Regexp',
+    'NumberList'
 ]
 
+# Global project declarations
+g_logger = logging.getLogger('smsshell.validators')
+
 
 class ValidationException(Exception):
     """Base class for all exceptions relating to messages validation
@@ -43,6 +52,10 @@ class AbstractValidator(object):
     All validators must inherit this class
     """
 
+    # True if the result of the validator only depends on the data,
+    # so it can be cached, see CachedValidator
+    PURE = False
+
     def __call__(self, data):
         """Data validation function
         """
@@ -56,6 +69,81 @@ class ValidatorChain(Chain):
     ABSTRACT_CLASS = AbstractValidator
     EXCEPTION = ValidationException
 
+    def __init__(self, cache_size=0):
+        """Init a new empty chain
+
+        Args:
+            cache_size: the number of values of which each field's pure
+                        validators keep the result, 0 to disable the cache
+        """
+        self.cache_size = int(cache_size)
+        self.__caches = []
+        super().__init__()
+
+    def cacheCount(self, result):
+        """Return the number of values validated by the caches of the chain
+
+        Args:
+            result: 'hit' for the values found in the caches,
+                    'miss' for the values actually validated
+        Returns:
+            the number of values as integer
+        """
+        infos = [cache.cacheInfo() for cache in self.__caches]
+        if result == 'hit':
+            return sum(info.hits for info in infos)
+        return sum(info.misses for info in infos)
+
+    def compile(self):
+        """Build the steps run by the chain, see Chain.compile()
+
+        The caches are built again, empty
+        """
+        self.__caches = []
+        super().compile()
+
+    def _compileLinks(self, links):
+        """Fuse the consecutive Regexp validators of a field and put the
+        consecutive pure validators behind a cache
+
+        Args:
+            links: the list of the validators of the field
+        Returns:
+            the list of validators to run
+        """
+        compiled = []
+        regexps = []
+        for link in links + [None]:
+            fusable = type(link) is Regexp and RegexpGroup.canFuse(link)
+            if fusable and (not regexps or link.regex.flags == regexps[0].regex.flags):
+                regexps.append(link)
+                continue
+            # end of the current run of fusable validators
+            if len(regexps) > 1:
+                compiled.append(RegexpGroup(regexps))
+            else:
+                compiled.extend(regexps)
+            regexps = [link] if fusable else []
+            if link is not None and not fusable:
+                compiled.append(link)
+        if self.cache_size <= 0:
+            return compiled
+
+        cached = []
+        pures = []
+        for link in compiled + [None]:
+            if link is not None and link.PURE:
+                pures.append(link)
+                continue
+            if pures:
+                cache = CachedValidator(pures, self.cache_size)
+                self.__caches.append(cache)
+                cached.append(cache)
+                pures = []
+            if link is not None:
+                cached.append(link)
+        return cached
+
 
 class Regexp(AbstractValidator):
     """Validates the field against a user provided regexp.
@@ -69,6 +157,8 @@ class Regexp(AbstractValidator):
         message: Error message to raise in case of a validation error.
     """
 
+    PURE = True
+
     def __init__(self, regex, flags=0, message='Data did not match the expression'):
         if isinstance(regex, str):
             regex = re.compile(regex, flags)
@@ -80,3 +170,296 @@ class Regexp(AbstractValidator):
         if not match:
             raise ValidationException(self.message)
         return data
+
+    def callOnBatch(self, values):
+        """Validate many values at once
+
+        Args:
+            values: the list of values
+        Returns:
+            the list of the values, in which invalid ones are replaced
+            by a ValidationException
+        """
+        match = self.regex.match
+        return [data if match(data or '') else ValidationException(self.message)
+                for data in values]
+
+
+class RegexpGroup(AbstractValidator):
+    """Validates the field against many Regexp validators at once
+
+    The expressions are fused into a single one made of a lookahead per
+    expression, so the field is scanned by one match whatever the number
+    of expressions. When it does not match, each validator is run in turn
+    to raise the error of the first failing one.
+
+    Args:
+        regexps: the list of Regexp validators, see canFuse()
+    """
+
+    PURE = True
+
+    # backreferences and conditionals refer to groups by their number,
+    # which would be shifted by the groups of the previous expressions
+    GROUP_REFERENCE = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+    def __init__(self, regexps):
+        self.regexps = list(regexps)
+        self.regex = re.compile(''.join('(?=(?:{}))'.format(r.regex.pattern)
+                                        for r in self.regexps),
+                                self.regexps[0].regex.flags)
+
+    @classmethod
+    def canFuse(cls, regexp):
+        """Return True if the given validator can be fused with others
+
+        Only the string expressions without global inline flags,
+        named groups or references to groups can be fused
+
+        Args:
+            regexp: the Regexp validator
+        Returns:
+            boolean
+        """
+        pattern = regexp.regex.pattern
+        if not isinstance(pattern, str) or regexp.regex.groupindex:
+            return False
+        if cls.GROUP_REFERENCE.search(pattern):
+            return False
+        # flags set at the beginning of the expression apply to the whole
+        # expression, they must be given to re.compile() instead
+        return re.compile(pattern).flags == re.compile('').flags
+
+    def __call__(self, data):
+        if self.regex.match(data or ''):
+            return data
+        for regexp in self.regexps:
+            regexp(data)
+        return data
+
+    def callOnBatch(self, values):
+        """Validate many values at once, see Regexp.callOnBatch()
+        """
+        match = self.regex.match
+        outputs = []
+        for data in values:
+            if match(data or ''):
+                outputs.append(data)
+                continue
+            try:
+                outputs.append(self(data))
+            except ValidationException as ex:
+                outputs.append(ex)
+        return outputs
+
+
+class NumberList(AbstractValidator):
+    """Validates the field against a list of numbers and prefixes of numbers
+
+    The list is read from a file which contains one entry per line, an entry
+    which ends with '*' is a prefix, the others are exact numbers.
+    Empty lines and lines starting with '#' are ignored. Example :
+
+        # all french mobile numbers
+        +336*
+        +337*
+        +3225551234
+
+    Entries are kept in a trie of their characters, so a number is looked up
+    in a time which depends on its length only, whatever the size of the list.
+    The file is read again when its modification time has changed, checked at
+    most each interval seconds. If it cannot be read, the previous list is kept.
+
+    Args:
+        path: the path of the list file
+        mode: 'allow' to accept only the listed numbers,
+                'deny' to reject them
+        interval: the minimum time in seconds between two checks of the file,
+                    0 to never reload it
+    """
+
+    # the suffix of prefixes entries in the list file
+    PREFIX_SUFFIX = '*'
+    # keys of the trie's nodes which mark the end of an entry, they are not
+    # strings so they never collide with the characters of the entries
+    EXACT = 0
+    PREFIX = 1
+
+    MODES = ['allow', 'deny']
+
+    def __init__(self, path, mode='allow', interval=5):
+        if mode not in self.MODES:
+            raise ValueError("mode '{}' must be in {}".format(mode, self.MODES))
+        self.path = path
+        self.allow = mode == 'allow'
+        self.interval = float(interval)
+        self.__reload_lock = threading.Lock()
+        self.__checked_at = time.monotonic()
+        self.__trie, self.__stat = self.__load()
+
+    def __len__(self):
+        """Return the number of entries in the list
+
+        Returns:
+            the number of entries as integer
+        """
+        return self.__count
+
+    def __load(self):
+        """Read the list file and build its trie
+
+        Returns:
+            a tuple of the trie and the stat key of the read file
+        Raises:
+            OSError if the file cannot be read
+        """
+        with open(self.path, 'r') as list_file:
+            stat = os.fstat(list_file.fileno())
+            lines = list_file.readlines()
+        trie = dict()
+        count = 0
+        for line in lines:
+            entry = line.strip()
+            if not entry or entry.startswith('#'):
+                continue
+            marker = self.EXACT
+            if entry.endswith(self.PREFIX_SUFFIX):
+                entry, marker = entry[:-len(self.PREFIX_SUFFIX)], self.PREFIX
+            node = trie
+            for char in entry:
+                node = node.setdefault(char, dict())
+            node[marker] = True
+            count += 1
+        self.__count = count
+        g_logger.debug("loaded %d entries from numbers list '%s'", count, self.path)
+        return trie, (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def reload(self):
+        """Read the list file again if it has changed
+
+        Returns:
+            True if the list has been reloaded
+        """
+        if not self.__reload_lock.acquire(blocking=False):
+            # another thread is reloading, use the current list meanwhile
+            return False
+        try:
+            self.__checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+                if (stat.st_ino, stat.st_size, stat.st_mtime_ns) == self.__stat:
+                    return False
+                self.__trie, self.__stat = self.__load()
+            except OSError as ex:
+                g_logger.error("unable to reload numbers list '%s', keeping the previous one : %s",
+                               self.path, str(ex))
+                return False
+            g_logger.info("reloaded numbers list '%s'", self.path)
+            return True
+        finally:
+            self.__reload_lock.release()
+
+    def contains(self, number):
+        """Return True if the number is listed, as an exact number or by a prefix
+
+        Args:
+            number: the number to search
+        Returns:
+            boolean
+        """
+        node = self.__trie
+        for char in number:
+            if self.PREFIX in node:
+                return True
+            node = node.get(char)
+            if node is None:
+                return False
+        return self.EXACT in node or self.PREFIX in node
+
+    def __call__(self, data):
+        if self.interval and time.monotonic() - self.__checked_at >= self.interval:
+            self.reload()
+        if self.contains(data or '') != self.allow:
+            raise ValidationException(self.__errorMessage())
+        return data
+
+    def callOnBatch(self, values):
+        """Validate many values at once, see Regexp.callOnBatch()
+
+        The file is checked once for the whole batch
+        """
+        if self.interval and time.monotonic() - self.__checked_at >= self.interval:
+            self.reload()
+        contains = self.contains
+        allow = self.allow
+        return [data if contains(data or '') == allow
+                else ValidationException(self.__errorMessage())
+                for data in values]
+
+    def __errorMessage(self):
+        """Return the message of validation errors
+
+        Returns:
+            the message string
+        """
+        return "Data is {} the numbers list '{}'".format('not in' if self.allow else 'in',
+                                                         self.path)
+
+
+class CachedValidator(AbstractValidator):
+    """Validates the field against pure validators and keeps their results
+
+    The results of the least recently validated values are dropped
+    when the cache is full. The errors are kept as their class and
+    arguments, and raised again as new exceptions.
+
+    Args:
+        validators: the list of pure validators
+        size: the maximum number of values kept in the cache
+    """
+
+    PURE = True
+
+    def __init__(self, validators, size):
+        self.validators = list(validators)
+        self.__validate = functools.lru_cache(maxsize=size)(self.__validateAll)
+
+    def __validateAll(self, data):
+        """Run all validators on the data
+
+        Args:
+            data: the data to validate
+        Returns:
+            None if the data is valid, otherwise a tuple of the class and
+            the arguments of the ValidationException
+        """
+        try:
+            for validator in self.validators:
+                validator(data)
+        except ValidationException as ex:
+            return (ex.__class__, ex.args)
+        return None
+
+    def cacheInfo(self):
+        """Return the statistics of the cache
+
+        Returns:
+            the named tuple of functools.lru_cache's cache_info()
+        """
+        return self.__validate.cache_info()
+
+    def __call__(self, data):
+        error = self.__validate(data)
+        if error is not None:
+            raise error[0](*error[1])
+        return data
+
+    def callOnBatch(self, values):
+        """Validate many values at once, see Regexp.callOnBatch()
+        """
+        validate = self.__validate
+        outputs = []
+        for data in values:
+            error = validate(data)
+            outputs.append(data if error is None else error[0](*error[1]))
+        return outputs
@@ -0,0 +1,157 @@
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+"""This module contains the worker pool used to run message treatments
+
+Each worker thread owns a lane (a FIFO queue). Jobs are dispatched to a lane
+using a hash of their key, so all jobs that share the same key are run
+by the same worker in their submission order.
+"""
+
+# System imports
+import logging
+import queue
+import threading
+
+# Global project declarations
+g_logger = logging.getLogger('smsshell.workers')
+
+
+class WorkerPool(object):
+    """A pool of worker threads with ordered lanes per key
+    """
+
+    def __init__(self, name, size=1, queue_size=0):
+        """Constructor: Build a new worker pool
+
+        Args:
+            name: the name of the pool, used in threads names
+            size: the number of worker threads
+            queue_size: the maximum number of pending jobs per lane
+                        0 means unlimited
+        """
+        assert int(size) > 0
+        self.name = name
+        self.__size = int(size)
+        self.__lanes = [queue.Queue(maxsize=int(queue_size)) for _ in range(self.__size)]
+        self.__threads = []
+
+    @property
+    def size(self):
+        """Return the number of workers of this pool
+
+        Returns:
+            the number of workers as integer
+        """
+        return self.__size
+
+    def start(self):
+        """Start all worker threads
+
+        Returns:
+            True if start has success
+        """
+        for index, lane in enumerate(self.__lanes):
+            thread = threading.Thread(target=self.__run,
+                                      args=(lane,),
+                                      name='{}-{}'.format(self.name, index))
+            thread.daemon = True
+            thread.start()
+            self.__threads.append(thread)
+        g_logger.debug('started %d workers in pool %s', self.__size, self.name)
+        return True
+
+    def stop(self):
+        """Stop all worker threads once their pending jobs are done
+
+        Returns:
+            True if stop has success
+        """
+        for lane in self.__lanes:
+            lane.put(None)
+        for thread in self.__threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        self.__threads = []
+        g_logger.debug('stopped workers in pool %s', self.name)
+        return True
+
+    def laneForKey(self, key):
+        """Return the lane index used for the given key
+
+        Args:
+            key: the hashable key of the job
+        Returns:
+            the index of the lane as integer
+        """
+        return hash(key) % self.__size
+
+    def submit(self, key, func, *args, **kwargs):
+        """Queue a job on the lane associated with the given key
+
+        Block while the lane is full
+
+        Args:
+            key: the hashable key used to select the lane
+            func: the callable to run
+            args, kwargs: the arguments to give to the callable
+        """
+        self.__lanes[self.laneForKey(key)].put((func, args, kwargs))
+
+    def trySubmit(self, key, func, *args, **kwargs):
+        """Queue a job on the lane associated with the given key if not full
+
+        Args:
+            key: the hashable key used to select the lane
+            func: the callable to run
+            args, kwargs: the arguments to give to the callable
+        Returns:
+            True if the job has been queued, False if the lane is full
+        """
+        try:
+            self.__lanes[self.laneForKey(key)].put_nowait((func, args, kwargs))
+        except queue.Full:
+            return False
+        return True
+
+    def qsize(self):
+        """Return the number of pending jobs in all lanes
+
+        Returns:
+            the approximate number of pending jobs
+        """
+        return sum(lane.qsize() for lane in self.__lanes)
+
+    def __run(self, lane):
+        """Main loop of each worker thread
+
+        Args:
+            lane: the queue from which to pick up jobs
+        """
+        while True:
+            job = lane.get()
+            if job is None:
+                break
+            func, args, kwargs = job
+            try:
+                func(*args, **kwargs)
+            except Exception as ex:
+                g_logger.exception('unhandled error in worker of pool %s : %s',
+                                   self.name,
+                                   str(ex))
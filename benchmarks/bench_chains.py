@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Benchmark of the validators and filters chains
+
+Run input and output chains like the ones of the sample configuration
+on messages, like the daemon does for each received message, one by one
+and by batches
+
+Run from the repository root : python3 benchmarks/bench_chains.py
+"""
+
+# System imports
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
+
+# Project imports
+import SMSShell.config
+from SMSShell.filters import FilterChain
+from SMSShell.models import Message
+from SMSShell.validators import Regexp, ValidatorChain
+
+CHAINS_CONFIG = r"""
+[main]
+mode = DAEMON
+
+[daemon]
+input_validators = number=regexp:^\+(33[0-9]+|localhost)$
+                   content=regexp:(?a)^\w+( *\w+)+$
+input_filters = content=lowerCase:1
+output_validators = number=regexp:^\+33[0-9]+$
+"""
+
+
+def loadChains(path=None, cache_size=0):
+    """Build the chains of the daemon mode from a configuration file
+
+    Args:
+        path: the path of the configuration file, None to use the chains above
+        cache_size: the size of the validators caches
+    Returns:
+        the input validators, input filters and output validators chains
+    """
+    conf = SMSShell.config.MyConfigParser()
+    if path is None:
+        conf.read_string(CHAINS_CONFIG)
+    else:
+        assert conf.load(path)[1]
+    input_validators = ValidatorChain(cache_size)
+    input_validators.addLinksFromDict(conf.getValidatorsFromConfig('input_validators'))
+    input_filters = FilterChain()
+    input_filters.addLinksFromDict(conf.getFiltersFromConfig('input_filters'))
+    output_validators = ValidatorChain(cache_size)
+    output_validators.addLinksFromDict(conf.getValidatorsFromConfig('output_validators'))
+    return input_validators, input_filters, output_validators
+
+
+def regexpsChain(count, cache_size=0):
+    """Build a chain of the given number of regexp validators on the number
+
+    Returns:
+        the validators chain
+    """
+    chain = ValidatorChain(cache_size)
+    chain.addLinksFromDict({'number': [Regexp('^\\+(?!{:04d})[0-9]+$'.format(i))
+                                       for i in range(count)]})
+    return chain
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validators and filters chains benchmark')
+    parser.add_argument('-c', '--config',
+                        help='the configuration file which defines the chains')
+    parser.add_argument('-r', '--regexps', type=int, nargs='+', default=[1, 4, 16, 64],
+                        help='numbers of regexp validators on the same field')
+    parser.add_argument('-b', '--batch', type=int, default=100,
+                        help='number of messages of each batch')
+    parser.add_argument('--cache', type=int, default=0,
+                        help='size of the validators caches, 0 to disable them')
+    parser.add_argument('-n', '--number', type=int, default=100000,
+                        help='number of messages')
+    pargs = parser.parse_args()
+
+    input_validators, input_filters, output_validators = loadChains(pargs.config, pargs.cache)
+    message = Message('+33612345678', 'Help desc whoami')
+    answer = Message('+33612345678', 'available commands: help desc whoami')
+
+    def treat():
+        input_validators.callChainOnObject(message)
+        input_filters.callChainOnObject(message)
+        output_validators.callChainOnObject(answer)
+
+    print('{:<20} {:>10}'.format('chain', 'us/msg'))
+    for name, func in [('input validators', lambda: input_validators.callChainOnObject(message)),
+                       ('input filters', lambda: input_filters.callChainOnObject(message)),
+                       ('output validators', lambda: output_validators.callChainOnObject(answer)),
+                       ('all', treat)]:
+        duration = min(timeit.repeat(func, number=pargs.number, repeat=5))
+        print('{:<20} {:>10.3f}'.format(name, duration / pargs.number * 1e6))
+
+    print()
+    print('{:<20} {:>10}'.format('regexps', 'us/msg'))
+    for count in pargs.regexps:
+        chain = regexpsChain(count, pargs.cache)
+        duration = min(timeit.repeat(lambda: chain.callChainOnObject(message),
+                                     number=pargs.number, repeat=5))
+        print('{:<20} {:>10.3f}'.format(count, duration / pargs.number * 1e6))
+
+    print()
+    print('{:<20} {:>10} {:>10}'.format('batch of {}'.format(pargs.batch), 'one by one', 'batch'))
+    messages = [Message('+336{:08d}'.format(i), 'Help desc whoami') for i in range(pargs.batch)]
+    repeat = max(1, pargs.number // pargs.batch)
+    for name, chain in [('input validators', input_validators),
+                        ('input filters', input_filters),
+                        ('output validators', output_validators)]:
+        single = min(timeit.repeat(lambda: [chain.callChainOnObject(m) for m in messages],
+                                   number=repeat, repeat=5))
+        batch = min(timeit.repeat(lambda: chain.callChainOnBatch(messages),
+                                  number=repeat, repeat=5))
+        print('{:<20} {:>10.3f} {:>10.3f}'.format(name,
+                                                  single / repeat / pargs.batch * 1e6,
+                                                  batch / repeat / pargs.batch * 1e6))
+
+
+if __name__ == '__main__':
+    main()
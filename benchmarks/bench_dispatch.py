@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+"""Microbenchmark of the dispatch of commands by the shell
+
+Run from the repository root : python3 benchmarks/bench_dispatch.py
+"""
+
+# System imports
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
+
+# Project imports
+import SMSShell.config
+import SMSShell.metrics.none
+import SMSShell.models
+import SMSShell.shell
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shell commands dispatch microbenchmark')
+    parser.add_argument('-n', '--number', type=int, default=20000,
+                        help='number of calls per measure')
+    pargs = parser.parse_args()
+
+    shell = SMSShell.shell.Shell(SMSShell.config.MyConfigParser(),
+                                 SMSShell.metrics.none.MetricsHelper())
+    session = SMSShell.models.Session('bench')
+    print('{:<16} {:>16} {:>16}'.format('command', 'dispatch us/call', 'exec us/call'))
+    for cmdline in ['whoami', 'role', 'desc whoami', 'help whoami']:
+        argv = cmdline.split()
+        # load the command and create the session before to measure
+        shell.exec('bench', cmdline)
+        # the dispatch is everything done by the shell before to run main()
+        dispatch = min(timeit.repeat(
+            lambda: shell._Shell__prepareCall(session, argv[0], argv[1:]),
+            number=pargs.number, repeat=3))
+        execution = min(timeit.repeat(lambda: shell.exec('bench', cmdline),
+                                      number=pargs.number, repeat=3))
+        print('{:<16} {:>16.2f} {:>16.2f}'.format(cmdline,
+                                                  dispatch / pargs.number * 1e6,
+                                                  execution / pargs.number * 1e6))
+
+
+if __name__ == '__main__':
+    main()
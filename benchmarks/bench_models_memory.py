@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Benchmark of the memory used by sessions and messages
+
+Measure the memory allocated per Session and per Message object,
+including their attributes, when a large number of them is alive
+
+Run from the repository root : python3 benchmarks/bench_models_memory.py
+"""
+
+# System imports
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
+
+# Project imports
+from SMSShell.models import Message, Session
+
+
+def buildSessions(count):
+    """Build sessions like the ones of distinct senders which send one message
+    """
+    sessions = []
+    for i in range(count):
+        sess = Session('+336{:08d}'.format(i))
+        sess.access()
+        sessions.append(sess)
+    return sessions
+
+
+def buildMessages(count):
+    """Build messages like the ones decoded by the json parser
+    """
+    return [Message('+336{:08d}'.format(i), 'help') for i in range(count)]
+
+
+def measure(build, count):
+    """Measure the memory allocated by objects which stay alive
+
+    Args:
+        build: the callable which builds the objects
+        count: the number of objects
+    Returns:
+        a tuple of the allocated bytes per object and the build time per object
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    objects = build(count)
+    duration = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size / count, duration / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sessions and messages memory benchmark')
+    parser.add_argument('-n', '--count', type=int, default=1000000,
+                        help='number of objects of each type')
+    pargs = parser.parse_args()
+
+    print('{:<10} {:>12} {:>12} {:>10}'.format('model', 'objects', 'bytes/obj', 'us/obj'))
+    for name, build in [('Session', buildSessions), ('Message', buildMessages)]:
+        per_object, duration = measure(build, pargs.count)
+        print('{:<10} {:>12} {:>12.0f} {:>10.2f}'.format(name, pargs.count, per_object,
+                                                         duration * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Benchmark of the contention on the sessions map
+
+Many threads look up the sessions of random synthetic subjects, like the
+workers which run commands, and the latency of each lookup is measured
+for different numbers of shards
+
+Run from the repository root : python3 benchmarks/bench_session_contention.py
+"""
+
+# System imports
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
+
+# Project imports
+from SMSShell.models import Session, SessionMap
+
+
+def worker(smap, subjects, lookups, latencies, seed, start):
+    """Look up the sessions of random subjects
+
+    Args:
+        smap: the SessionMap instance
+        subjects: the list of subjects
+        lookups: the number of lookups
+        latencies: the list to fill with the latency of each lookup in ns
+        seed: the seed of the random generator
+        start: the event which starts all workers together
+    """
+    rand = random.Random(seed)
+    chosen = [rand.choice(subjects) for _ in range(lookups)]
+    clock = time.perf_counter_ns
+    start.wait()
+    for subject in chosen:
+        begin = clock()
+        smap.getOrCreate(subject, Session)
+        latencies.append(clock() - begin)
+
+
+def run(shards, threads, subjects, lookups):
+    """Run all workers on a new map
+
+    Returns:
+        a tuple of the sorted latencies and the total duration in seconds
+    """
+    smap = SessionMap(shards=shards)
+    start = threading.Event()
+    latencies = [[] for _ in range(threads)]
+    workers = [threading.Thread(target=worker,
+                                args=(smap, subjects, lookups, latencies[i], i, start))
+               for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    begin = time.perf_counter()
+    start.set()
+    for thread in workers:
+        thread.join()
+    duration = time.perf_counter() - begin
+    return sorted(value for values in latencies for value in values), duration
+
+
+def percentile(values, ratio):
+    """Return a percentile of sorted values
+    """
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sessions map contention benchmark')
+    parser.add_argument('-t', '--threads', type=int, default=16,
+                        help='number of threads')
+    parser.add_argument('-s', '--subjects', type=int, default=10000,
+                        help='number of synthetic subjects')
+    parser.add_argument('-n', '--lookups', type=int, default=50000,
+                        help='number of lookups per thread')
+    pargs = parser.parse_args()
+
+    subjects = ['+336{:08d}'.format(i) for i in range(pargs.subjects)]
+    print('{} threads, {} subjects, {} lookups per thread'.format(
+        pargs.threads, pargs.subjects, pargs.lookups))
+    print('{:>7} {:>10} {:>10} {:>10} {:>14}'.format('shards', 'p50 us', 'p99 us',
+                                                    'p99.9 us', 'lookups/s'))
+    for shards in [1, 4, 16, 64]:
+        latencies, duration = run(shards, pargs.threads, subjects, pargs.lookups)
+        print('{:>7} {:>10.2f} {:>10.2f} {:>10.2f} {:>14.0f}'.format(
+            shards,
+            percentile(latencies, 0.5) / 1000,
+            percentile(latencies, 0.99) / 1000,
+            percentile(latencies, 0.999) / 1000,
+            len(latencies) / duration))
+
+
+if __name__ == '__main__':
+    main()
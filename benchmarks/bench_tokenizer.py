@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf8 -*-
+
+# This file is a part of SMSShell
+#
+# Copyright (c) 2016-2019 Pierre GINDRAUD
+#
+# SMSShell is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# SMSShell is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with SMSShell. If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmark of the split of command lines into arguments
+
+Compare shlex.split() with Shell.splitArguments() on corpora of SMS
+command lines
+
+Run from the repository root : python3 benchmarks/bench_tokenizer.py
+"""
+
+# System imports
+import argparse
+import os
+import random
+import shlex
+import sys
+import timeit
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir))
+
+# Project imports
+import SMSShell.shell
+
+# command lines as typed on a phone, most of them without any quote
+PLAIN_LINES = [
+    'help',
+    'whoami',
+    'role',
+    'desc whoami',
+    'help desc',
+    'auth 1234',
+    'Status',
+    'reboot now',
+    'wol 00:11:22:33:44:55',
+    'send +33612345678 running late see you at 8',
+    'note add buy bread and milk before going home',
+    'météo demain à Paris',
+]
+QUOTED_LINES = [
+    'note add "buy bread"',
+    "send +33612345678 'see you'",
+    'path /home/user/my\\ file',
+    "it's broken",
+]
+
+
+def buildCorpus(size, quoted_ratio, seed=0):
+    """Build a corpus of command lines
+
+    Args:
+        size: the number of command lines
+        quoted_ratio: the part of command lines with quotes or escapes
+        seed: the seed of the random generator
+    Returns:
+        the list of command lines
+    """
+    rand = random.Random(seed)
+    return [rand.choice(QUOTED_LINES if rand.random() < quoted_ratio else PLAIN_LINES)
+            for _ in range(size)]
+
+
+def splitAll(split, corpus):
+    """Split all command lines of a corpus, ignoring the syntax errors
+    """
+    for cmdline in corpus:
+        try:
+            split(cmdline)
+        except ValueError:
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Command line tokenizer benchmark')
+    parser.add_argument('-n', '--size', type=int, default=10000,
+                        help='number of command lines per corpus')
+    pargs = parser.parse_args()
+
+    print('{:<12} {:>14} {:>14} {:>8}'.format('quoted', 'shlex us/line',
+                                            'split us/line', 'speedup'))
+    for quoted_ratio in [0.0, 0.05, 0.25, 1.0]:
+        corpus = buildCorpus(pargs.size, quoted_ratio)
+        # both tokenizers must give the same results
+        for cmdline in set(corpus):
+            try:
+                expected = shlex.split(cmdline)
+            except ValueError:
+                expected = None
+            try:
+                result = SMSShell.shell.Shell.splitArguments(cmdline)
+            except ValueError:
+                result = None
+            assert result == expected, cmdline
+        timings = [min(timeit.repeat(lambda: splitAll(split, corpus), number=1, repeat=5))
+                   for split in [shlex.split, SMSShell.shell.Shell.splitArguments]]
+        print('{:<12} {:>14.2f} {:>14.2f} {:>7.1f}x'.format(
+            '{:.0%}'.format(quoted_ratio),
+            timings[0] / pargs.size * 1e6,
+            timings[1] / pargs.size * 1e6,
+            timings[0] / timings[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@
 
 import queue
 import os
+import pytest
 import shlex
 import stat
 import subprocess
@@ -122,3 +123,42 @@ def test_cmdline_write_unix():
     # clean
     assert receiver.stop()
     assert not os.path.exists(m_unix)
+
+@pytest.mark.parametrize('framing', ['none', 'newline', 'length'])
+def test_cmdline_write_many_to_unix(framing):
+    """Test to write many messages to an unix socket
+
+    Without framing each message is sent over its own connection
+    """
+    m_unix = './unix'
+    m_data = ['first', 'second', 'third']
+    m_channel = queue.Queue()
+
+    def writeToUnix(queue, unix, data):
+        p = subprocess.Popen(shlex.split('./bin/sms-shell-client -m -f {} -i stdin -o unix -oa {}'.format(framing, unix)),
+                             stdin=subprocess.PIPE,
+                             stdout=subprocess.PIPE)
+
+        (stdout, stderr) = p.communicate(input='\n'.join(data).encode())
+        queue.put((stdout, stderr, p.returncode))
+
+    # init socket
+    receiver = SMSShell.receivers.unix.Receiver(config=dict(path=m_unix, framing=framing))
+    assert receiver.start()
+
+    # start client
+    threading.Thread(target=writeToUnix, args=(m_channel, m_unix, m_data)).start()
+
+    # fetch all messages from the client
+    reader = receiver.read()
+    received = []
+    for _ in m_data:
+        with next(reader) as client_context_data:
+            received.append(client_context_data)
+    assert all(data in received_data for data, received_data in zip(m_data, received))
+
+    # assert client
+    stdout, stderr, returncode = m_channel.get()
+    assert returncode == 0
+    # clean
+    assert receiver.stop()
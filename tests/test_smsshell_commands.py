@@ -6,6 +6,7 @@ import pytest
 
 import SMSShell
 import SMSShell.commands
+import SMSShell.shell
 
 
 def test_abstract_init():
@@ -84,3 +85,51 @@ def test_abstract_bad_arg_parser_init():
               object())
     with pytest.raises(SMSShell.commands.CommandBadImplemented):
         com._argsParser()
+
+def test_abstract_async_not_implemented():
+    abs = SMSShell.commands.AbstractAsyncCommand(logging.getLogger(),
+                                                 object(),
+                                                 object(),
+                                                 object())
+
+    with pytest.raises(SMSShell.commands.CommandBadImplemented):
+        SMSShell.shell.Shell.runCoroutine(abs.main([]))
+
+def test_bind_session():
+    """Each call get its own command instance
+    """
+    abs = SMSShell.commands.AbstractCommand(logging.getLogger(),
+                                            object(),
+                                            object(),
+                                            object())
+
+    session = object()
+    com = abs._bindSession(session)
+    assert com is not abs
+    assert com.session is session
+    with pytest.raises(AssertionError):
+        abs.session
+
+def test_args_parser_built_once():
+    """The arguments parser is reused by all calls of the command
+    """
+    class Com(SMSShell.commands.AbstractCommand):
+        built = 0
+        def argsParser(self):
+            Com.built += 1
+            parser = self.createArgsParser()
+            parser.add_argument('value')
+            return parser
+        def description(self, argv):
+            return 'com'
+
+    com = Com(logging.getLogger(),
+              object(),
+              object(),
+              object())
+    parser = com._argsParser()
+    assert com._argsParser() is parser
+    assert com._bindSession(object())._argsParser() is parser
+    assert 'value' in com.usage(['a'])
+    assert Com.built == 1
+    assert parser.parse_args(['a']).value == 'a'
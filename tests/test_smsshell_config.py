@@ -190,3 +190,33 @@ def test_with_classes_chain_bad_filter_config():
 
     with pytest.raises(SMSShell.exceptions.ShellInitException):
         spec = conf.getClassesChainFromConfig('test', 'chain', module)
+
+def test_workers_option():
+    """Test the workers count option
+    """
+    conf = SMSShell.config.MyConfigParser()
+    assert conf.getWorkers() == 1
+
+    conf.read_dict({'daemon': {'workers': '4'}})
+    assert conf.getWorkers() == 4
+
+    conf.read_dict({'daemon': {'workers': 'a'}})
+    assert conf.getWorkers() == 1
+
+    conf.read_dict({'daemon': {'workers': '0'}})
+    assert conf.getWorkers() == 1
+
+def test_queue_options():
+    """Test the queue size and full policy options
+    """
+    conf = SMSShell.config.MyConfigParser()
+    assert conf.getQueueSize() == 100
+    assert conf.getQueueFullPolicy() == 'block'
+
+    conf.read_dict({'daemon': {'queue_size': '0', 'queue_full': 'reject'}})
+    assert conf.getQueueSize() == 0
+    assert conf.getQueueFullPolicy() == 'reject'
+
+    conf.read_dict({'daemon': {'queue_size': '-1', 'queue_full': 'drop'}})
+    assert conf.getQueueSize() == 100
+    assert conf.getQueueFullPolicy() == 'block'
@@ -46,6 +46,26 @@ def test_message_filter_on_missing_field():
     with pytest.raises(SMSShell.filters.FilterException):
         chain.callChainOnObject(m)
 
+def test_message_filter_chained_links():
+    m = SMSShell.models.message.Message('a', 'Ab')
+
+    class Append(SMSShell.filters.AbstractFilter):
+        def __init__(self, suffix):
+            self.suffix = suffix
+
+        def __call__(self, data):
+            return data + self.suffix
+
+    chain = SMSShell.filters.FilterChain()
+    chain.addLinksFromDict({'content': [SMSShell.filters.LowerCase(1), Append('c')]})
+    assert chain.callChainOnObject(m)
+    assert m.content == 'abc'
+
+    # links added after the compilation are run too
+    chain.addFieldLink('content', Append('d'))
+    assert chain.callChainOnObject(m)
+    assert m.content == 'abccd'
+
 # LowerCase filter
 
 def test_lowercase_load():
@@ -64,3 +84,21 @@ def test_lowercase_filtering():
     """
     val = SMSShell.filters.LowerCase(1)
     assert val('Abcdef') == 'abcdef'
+
+def test_batch_filter():
+    class Fail(SMSShell.filters.AbstractFilter):
+        def __call__(self, data):
+            if data == 'bad':
+                raise SMSShell.filters.FilterException('bad')
+            return data
+
+    chain = SMSShell.filters.FilterChain()
+    chain.addLinksFromDict({'content': [SMSShell.filters.LowerCase(3), Fail()]})
+    messages = [SMSShell.models.message.Message('a', 'ABCD'),
+                SMSShell.models.message.Message('a', 'BAD')]
+    results = chain.callChainOnBatch(messages)
+    assert results[0] is True
+    assert isinstance(results[1], SMSShell.filters.FilterException)
+    assert messages[0].content == 'abcD'
+    # failed objects are not modified
+    assert messages[1].content == 'BAD'
@@ -5,6 +5,9 @@ import pytest
 import os
 
 import SMSShell
+import SMSShell.metrics
+import SMSShell.models
+import SMSShell.receivers
 
 
 def test_loading():
@@ -22,12 +25,42 @@ def test_loading_without_config():
 
     assert not status
 
-def test_start_standalone_mode():
+def test_start_standalone_mode(tmp_path, monkeypatch, capsys):
+    """Treat one message from gammu-smsd environment and exit
     """
+    writer = configparser.ConfigParser()
+    writer['main'] = dict()
+    writer['main']['mode'] = 'STANDALONE'
+    writer['standalone'] = dict()
+    writer['standalone']['transmitter_type'] = 'stdout'
+    writer['standalone']['session_store_type'] = 'file'
+    writer['session_store'] = dict()
+    writer['session_store']['path'] = str(tmp_path / 'sessions.json')
+
+    with open('start.ini', 'w') as configfile:
+        writer.write(configfile)
+
+    program = SMSShell.SMSShell()
+    status, msg = program.load('start.ini')
+    assert status
+    os.unlink('start.ini')
+
+    monkeypatch.setenv('SMS_MESSAGES', '1')
+    monkeypatch.setenv('SMS_1_NUMBER', '+33612345678')
+    monkeypatch.setenv('SMS_1_TEXT', 'whoami')
+    assert program.start('./pid.pid')
+    assert not os.path.exists('./pid.pid')
+    assert '+33612345678' in capsys.readouterr().out
+    assert os.path.isfile(str(tmp_path / 'sessions.json'))
+
+def test_start_standalone_mode_without_message(monkeypatch):
+    """The standalone mode fails if gammu-smsd did not give any message
     """
     writer = configparser.ConfigParser()
     writer['main'] = dict()
     writer['main']['mode'] = 'STANDALONE'
+    writer['standalone'] = dict()
+    writer['standalone']['transmitter_type'] = 'stdout'
 
     with open('start.ini', 'w') as configfile:
         writer.write(configfile)
@@ -37,5 +70,37 @@ def test_start_standalone_mode():
     assert status
     os.unlink('start.ini')
 
-    with pytest.raises(NotImplementedError):
-        program.start('./pid.pid')
+    monkeypatch.delenv('SMS_MESSAGES', raising=False)
+    assert not program.start('./pid.pid')
+
+def test_validators_cache_counters():
+    """The validators caches results are counted per chain and result
+    """
+    writer = configparser.ConfigParser()
+    writer['main'] = dict(mode='DAEMON')
+    writer['daemon'] = dict(validators_cache_size='10',
+                            input_validators='number=regexp:^\\+33[0-9]+$',
+                            output_validators='number=regexp:^\\+33[0-9]+$')
+    with open('start.ini', 'w') as configfile:
+        writer.write(configfile)
+    program = SMSShell.SMSShell()
+    status, msg = program.load('start.ini')
+    assert status
+    os.unlink('start.ini')
+
+    metrics = SMSShell.metrics.MetricsRecorder()
+    program._SMSShell__metrics = metrics
+    program.initMessagesTreatments()
+    for _ in range(3):
+        client_context = SMSShell.receivers.DetachedClientRequest(request_data='')
+        msg = SMSShell.models.Message('+33612345678', 'whoami')
+        assert program.validateInputMessage(client_context, msg)
+        assert program.forgeAnswer(client_context, msg, 'ok') is not None
+
+    totals = dict()
+    for name, value, labels in metrics.popRecords():
+        if name == 'validator.cache.total':
+            key = (labels['chain'], labels['result'])
+            totals[key] = totals.get(key, 0) + value
+    assert totals == {('input', 'miss'): 1, ('input', 'hit'): 2,
+                      ('output', 'miss'): 1, ('output', 'hit'): 2}
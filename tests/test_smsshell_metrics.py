@@ -36,3 +36,22 @@ def test_abstract_name_normalizer():
     name2 = abs_with_underscore.normalizeName('1.2.3.4.5')
     assert abs_with_underscore.SEPARATOR in name2
     assert '.' not in name2
+
+def test_recorder_replay():
+    """Counters increments are replayed, declarations and gauges are dropped
+    """
+    recorder = SMSShell.metrics.MetricsRecorder()
+    recorder.counter('a', labels=['status'], description='declared')
+    recorder.counter('a', labels=dict(status='ok'))
+    recorder.counter('b', 2)
+    recorder.gauge('c', callback=lambda: 1)
+    records = recorder.popRecords()
+    assert recorder.popRecords() == []
+
+    calls = []
+    class Helper(object):
+        def counter(self, *args, **kwargs):
+            calls.append((args, kwargs))
+    SMSShell.metrics.MetricsRecorder.replay(records, Helper())
+    assert calls == [(('a', 1), dict(labels=dict(status='ok'))),
+                     (('b', 2), dict(labels=None))]
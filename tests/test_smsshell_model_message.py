@@ -1,5 +1,6 @@
 # -*- coding: utf8 -*-
 
+import pickle
 import pytest
 
 import SMSShell
@@ -29,3 +30,15 @@ def test_message_missing_attribute():
         m.attribute('b')
 
     assert m.attribute('b', 'fallback') == 'fallback'
+
+def test_message_has_no_dict():
+    m = SMSShell.models.message.Message('a', 'b', attributes={'a': 2})
+    assert not hasattr(m, '__dict__')
+    assert m.a == 2
+    with pytest.raises(AttributeError):
+        m.b
+
+def test_message_pickle():
+    m = SMSShell.models.message.Message('a', 'b', attributes={'a': 2})
+    r = pickle.loads(pickle.dumps(m))
+    assert (r.number, r.content, r.attributes) == ('a', 'b', {'a': 2})
@@ -1,6 +1,7 @@
 # -*- coding: utf8 -*-
 
 import datetime
+import pickle
 import pytest
 import time
 
@@ -91,3 +92,73 @@ def test_session_secure_wrapper_isolation():
 
     with pytest.raises(AttributeError):
         sw.forceState(SessionStates.STATE_LOGININPROGRESS)
+
+    with pytest.raises(AttributeError):
+        sw.session = s
+
+def test_session_secure_wrapper_cache():
+    """Test that the secure session is built once and follows the session
+    """
+    s = SMSShell.models.session.Session('sender')
+    sw = s.getSecureSession()
+    assert s.getSecureSession() is sw
+
+    s.state = SessionStates.STATE_LOGININPROGRESS
+    assert sw.state == SessionStates.STATE_LOGININPROGRESS
+    assert s.getSecureSession() is sw
+
+    s.forceState(SessionStates.STATE_ADMIN)
+    assert sw.state == SessionStates.STATE_ADMIN
+
+def test_session_secure_wrapper_read_only():
+    """Test that the subject and the state cannot be changed by the wrapper
+    """
+    s = SMSShell.models.session.Session('sender')
+    sw = s.getSecureSession()
+    with pytest.raises(AttributeError):
+        sw.state = SessionStates.STATE_ADMIN
+    with pytest.raises(AttributeError):
+        sw.subject = 'other'
+    assert s.state == SessionStates.STATE_GUEST
+    assert s.subject == 'sender'
+
+def test_session_dict_export():
+    """Export and rebuild a session
+    """
+    s = SMSShell.models.session.Session('sender', 20)
+    s.state = SessionStates.STATE_USER
+    s.set('key', 'value')
+
+    r = SMSShell.models.session.Session.fromDict(s.asDict())
+    assert r.subject == 'sender'
+    assert r.state == SessionStates.STATE_USER
+    assert r.ttl == 20
+    assert r.get('key') == 'value'
+    assert r.created_at == s.created_at
+    assert r.access_at == s.access_at
+
+    with pytest.raises(SMSShell.models.session.SessionException):
+        SMSShell.models.session.Session.fromDict(dict(subject='sender'))
+
+def test_session_idle_for_days_is_expired():
+    """Test that the days of the idle time are not ignored
+    """
+    data = SMSShell.models.session.Session('sender', 600).asDict()
+    data['access_at'] -= 86400 + 5
+    assert not SMSShell.models.session.Session.fromDict(data).isValid()
+
+    s = SMSShell.models.session.Session('sender', 90000)
+    assert s.ttl == 90000
+    assert s.expires_at == pytest.approx(time.monotonic() + 90000, abs=1)
+    assert s.isValid()
+
+def test_session_has_no_dict():
+    s = SMSShell.models.session.Session('sender')
+    assert not hasattr(s, '__dict__')
+    assert s.asDict()['storage'] == {}
+    s.set('key', 'value')
+
+    r = pickle.loads(pickle.dumps(s))
+    assert r.subject == 'sender'
+    assert r.get('key') == 'value'
+    assert r.isValid()
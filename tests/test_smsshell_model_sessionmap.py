@@ -0,0 +1,77 @@
+# -*- coding: utf8 -*-
+
+import time
+
+from SMSShell.models import Session, SessionMap
+
+
+def test_get_and_create():
+    """Test the lookup and the creation of sessions
+    """
+    smap = SessionMap()
+    assert smap.get('a') is None
+
+    sess, created = smap.getOrCreate('a', Session)
+    assert created
+    assert sess.subject == 'a'
+    assert smap.getOrCreate('a', Session) == (sess, False)
+    assert smap.get('a') is sess
+    assert len(smap) == 1
+
+def test_expired_sessions_are_evicted():
+    """Test that expired sessions are dropped by lookups and new sessions
+    """
+    smap = SessionMap()
+    for subject in ['a', 'b', 'c']:
+        smap.put(Session(subject, 1))
+    time.sleep(1.1)
+    assert smap.get('a') is None
+    assert len(smap) == 2
+
+    smap.put(Session('d', 10))
+    assert len(smap) == 1
+    assert smap.get('d') is not None
+
+    smap.put(Session('e', 1))
+    time.sleep(1.1)
+    assert smap.sweep() == 1
+    assert smap.evictedCount('expired') == 4
+    assert len(smap) == 1
+
+def test_sweep_is_amortised():
+    """Test that each new session evicts a limited number of expired ones
+    """
+    smap = SessionMap()
+    for i in range(SessionMap.SWEEP_BATCH + 10):
+        smap.put(Session(str(i), 1))
+    time.sleep(1.1)
+    smap.put(Session('new', 10))
+    assert len(smap) == 11
+    smap.put(Session('new2', 10))
+    assert len(smap) == 2
+
+def test_least_recently_used_are_evicted():
+    """Test the maximum number of sessions
+    """
+    smap = SessionMap(max_count=2)
+    smap.put(Session('a'))
+    smap.put(Session('b'))
+    assert smap.get('a') is not None
+    smap.put(Session('c'))
+    assert len(smap) == 2
+    assert smap.get('b') is None
+    assert smap.get('a') is not None
+    assert smap.get('c') is not None
+    assert smap.evictedCount('overflow') == 1
+
+def test_sharded_map():
+    """Test a map split into many shards
+    """
+    smap = SessionMap(max_count=64, shards=4)
+    subjects = [str(i) for i in range(1000)]
+    for subject in subjects:
+        smap.getOrCreate(subject, Session)
+    assert 4 <= len(smap) <= 64
+    assert smap.evictedCount('overflow') == 1000 - len(smap)
+    assert smap.get(subjects[-1]) is not None
+    assert smap.sweep() == 0
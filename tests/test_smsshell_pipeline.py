@@ -0,0 +1,78 @@
+# -*- coding: utf8 -*-
+
+import threading
+
+import SMSShell
+import SMSShell.metrics.none
+import SMSShell.pipeline
+
+
+def test_stages_order():
+    """A job is run by each stage in order
+    """
+    done = []
+
+    def first(job):
+        job.append('first')
+        return True
+
+    def second(job):
+        job.append('second')
+        return True
+
+    pipeline = SMSShell.pipeline.Pipeline('test',
+                                          done_callback=done.append,
+                                          metrics=SMSShell.metrics.none.MetricsHelper())
+    pipeline.addStage('first', first, 2).addStage('second', second, 2)
+    assert pipeline.start()
+    pipeline.feed('a', [])
+    assert pipeline.stop()
+    assert done == [['first', 'second']]
+
+def test_stage_stop_the_job():
+    """A stage that returns False or raise ends the job
+    """
+    done = []
+    seen = []
+
+    def fail(job):
+        if job == 'raise':
+            raise RuntimeError('boom')
+        return False
+
+    pipeline = SMSShell.pipeline.Pipeline('test', done_callback=done.append)
+    pipeline.addStage('fail', fail).addStage('never', seen.append)
+    pipeline.start()
+    pipeline.feed('a', 'stop')
+    pipeline.feed('a', 'raise')
+    pipeline.stop()
+    assert done == ['stop', 'raise']
+    assert not seen
+
+def test_same_key_ordering():
+    """Jobs with the same key keep their order through all stages
+    """
+    done = []
+    pipeline = SMSShell.pipeline.Pipeline('test', done_callback=done.append)
+    pipeline.addStage('a', lambda job: True, 3).addStage('b', lambda job: True, 4)
+    pipeline.start()
+    for i in range(200):
+        pipeline.feed('+33000000000', i)
+    pipeline.stop()
+    assert done == list(range(200))
+
+def test_backpressure():
+    """The feeder is rejected when the first stage is full
+    """
+    release = threading.Event()
+    pipeline = SMSShell.pipeline.Pipeline('test')
+    pipeline.addStage('slow', lambda job: release.wait(5), 1, queue_size=1)
+    pipeline.start()
+    assert pipeline.feed('a', 1)
+    # wait for the first job to be picked up by the worker
+    while pipeline.qsize():
+        pass
+    assert pipeline.feed('a', 2, block=False)
+    assert not pipeline.feed('a', 3, block=False)
+    release.set()
+    pipeline.stop()
@@ -0,0 +1,134 @@
+# -*- coding: utf8 -*-
+
+import os
+import select
+import threading
+
+import SMSShell
+import SMSShell.metrics
+import SMSShell.processes
+
+
+def square(payload):
+    if payload == 'crash':
+        os._exit(3)
+    return (os.getpid(), payload * payload)
+
+def test_start_stop():
+    """Just start and stop the pool
+    """
+    pool = SMSShell.processes.ProcessPool('test', square, 2)
+    assert pool.size == 2
+    assert pool.start()
+    assert len(set(pool.pids())) == 2
+    assert pool.stop()
+
+def test_same_key_ordering():
+    """Payloads with the same key must run in submission order by one process
+    """
+    results = []
+    pool = SMSShell.processes.ProcessPool('test', square, 4,
+                                          done_callback=lambda job, result: results.append((job, result)))
+    pool.start()
+    for i in range(100):
+        pool.submit('+33000000000', i, job=i)
+    pool.stop()
+    assert [job for job, _ in results] == list(range(100))
+    assert [result[1] for _, result in results] == [i * i for i in range(100)]
+    assert len(set(result[0] for _, result in results)) == 1
+
+def test_dead_worker_is_restarted():
+    """A dead worker process lose its pending job and is restarted
+    """
+    results = dict()
+    done = threading.Event()
+    def callback(job, result):
+        results[job] = result
+        done.set()
+
+    pool = SMSShell.processes.ProcessPool('test', square, 1, done_callback=callback)
+    pool.start()
+    pid = pool.pids()[0]
+    pool.submit('key', 'crash', job='crash')
+    assert done.wait(5)
+    assert results['crash'] is None
+
+    done.clear()
+    pool.submit('key', 3, job='after')
+    assert done.wait(5)
+    assert results['after'][1] == 9
+    assert results['after'][0] != pid
+    pool.stop()
+
+class CountersHelper(SMSShell.metrics.AbstractMetricsHelper):
+    """Keep the counters values, with the same labels rules as prometheus
+    """
+
+    def init(self):
+        self.counters = dict()
+
+    def _counter(self, name, value=1, description=None, labels=None):
+        if name not in self.counters:
+            assert description and isinstance(labels, (list, dict))
+            self.counters[name] = 0
+            if isinstance(labels, list):
+                return self
+        assert isinstance(labels, dict)
+        self.counters[name] += value
+        return self
+
+    def _gauge(self, name, value=None, set=None, callback=None, description=None, labels=None):
+        return self
+
+def test_restart_counter():
+    """The restarts of dead workers are counted
+    """
+    metrics = CountersHelper()
+    done = threading.Event()
+    pool = SMSShell.processes.ProcessPool('test', square, 1, metrics=metrics,
+                                          done_callback=lambda job, result: done.set())
+    pool.start()
+    assert metrics.counters['smsshell.test.restart.total'] == 0
+    pool.submit('key', 'crash', job='crash')
+    assert done.wait(5)
+    done.clear()
+    # the restarted worker treats the next job
+    pool.submit('key', 3, job='after')
+    assert done.wait(5)
+    pool.stop()
+    assert metrics.counters['smsshell.test.restart.total'] == 1
+
+def test_reject_when_full():
+    """A non blocking submit fails when the worker queue is full
+    """
+    release = threading.Event()
+    pool = SMSShell.processes.ProcessPool('test', square, 1, queue_size=1,
+                                          done_callback=lambda job, result: release.wait(5))
+    pool.start()
+    assert pool.submit('key', 1)
+    assert not pool.submit('key', 2, block=False)
+    release.set()
+    pool.stop()
+    assert pool.qsize() == 0
+
+def test_restarted_worker_does_not_inherit_parent_fds():
+    """Workers restarted after the start do not hold the files opened since
+    """
+    done = threading.Event()
+    pool = SMSShell.processes.ProcessPool('test', square, 1,
+                                          done_callback=lambda job, result: done.set())
+    pool.start()
+    read_fd, write_fd = os.pipe()
+    pool.submit('key', 'crash')
+    assert done.wait(5)
+    done.clear()
+    pool.submit('key', 2)
+    assert done.wait(5)
+
+    # the write end is only held by this process
+    os.close(write_fd)
+    readable, _, _ = select.select([read_fd], [], [], 1)
+    assert readable
+    assert os.read(read_fd, 1) == b''
+    os.close(read_fd)
+    pool.stop()
@@ -7,6 +7,7 @@ import threading
 
 import SMSShell
 import SMSShell.receivers.fifo
+import SMSShell.utils
 
 
 def test_init():
@@ -90,3 +91,62 @@ def test_simple_read_from_fifo():
 
     assert receiver.stop()
     assert not os.path.exists(fifo)
+
+def test_stream_read_from_fifo():
+    """Messages of many writers are read from the fifo kept opened
+    """
+    fifo = './r_fifo'
+    receiver = SMSShell.receivers.fifo.Receiver(config=dict(path=fifo, framing='newline'))
+    assert receiver.start()
+
+    def writeToFifo(data):
+        with open(fifo, 'wb', buffering=0) as path:
+            path.write(data)
+
+    writers = [threading.Thread(target=writeToFifo, args=('message{}\n'.format(i).encode(), ))
+               for i in range(10)]
+    for writer in writers:
+        writer.start()
+
+    reader = receiver.read()
+    received = []
+    for _ in writers:
+        with next(reader) as client_context_data:
+            received.append(client_context_data)
+    for writer in writers:
+        writer.join()
+    assert sorted(received) == sorted('message{}'.format(i) for i in range(10))
+
+    # the fifo is still readable after all writers left
+    writeToFifo(b'a\nb\n')
+    received = []
+    for _ in range(2):
+        with next(reader) as client_context_data:
+            received.append(client_context_data)
+    assert received == ['a', 'b']
+
+    assert receiver.stop()
+    assert not os.path.exists(fifo)
+
+def test_stream_read_after_bad_frames():
+    """Too large frames and invalid messages are dropped, not the next ones
+    """
+    fifo = './r_fifo'
+    receiver = SMSShell.receivers.fifo.Receiver(config=dict(path=fifo, framing='length',
+                                                            max_frame_size='4'))
+    assert receiver.start()
+    reader = receiver.read()
+
+    def writeToFifo(data):
+        with open(fifo, 'wb', buffering=0) as path:
+            path.write(data)
+
+    frames = [SMSShell.utils.encodeFrame('length', payload)
+              for payload in [b'a', b'toolarge', b'\xff', b'b']]
+    threading.Thread(target=writeToFifo, args=(b''.join(frames), )).start()
+    received = []
+    for _ in range(2):
+        with next(reader) as client_context_data:
+            received.append(client_context_data)
+    assert received == ['a', 'b']
+    assert receiver.stop()
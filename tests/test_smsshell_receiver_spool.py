@@ -0,0 +1,182 @@
+# -*- coding: utf8 -*-
+
+import json
+import os
+import pytest
+import threading
+
+import SMSShell
+import SMSShell.receivers.spool
+import SMSShell.utils
+import SMSShell.utils.gammusmsdparser
+
+
+@pytest.fixture
+def inbox(tmp_path, monkeypatch):
+    """An inbox directory with a JSON decoder in place of the backup format one
+    """
+    def decode(path):
+        message = SMSShell.utils.GammuSMSParser.createEmptyMessage()
+        with open(path) as backup:
+            message.update(json.load(backup))
+        return message
+    monkeypatch.setattr(SMSShell.utils.GammuSMSParser, 'decodeFromBackupFilePath', decode)
+    monkeypatch.setattr(SMSShell.utils.gammusmsdparser, 'gammu', object())
+    return tmp_path
+
+def writeMessage(inbox, name, text):
+    with open(os.path.join(str(inbox), name), 'w') as backup:
+        json.dump(dict(sms_number='+33123', sms_text=text), backup)
+
+@pytest.mark.parametrize('watch', ['inotify', 'poll'])
+def test_read_existing_and_new_files(inbox, watch):
+    """Files present at start and new files are read and moved
+    """
+    writeMessage(inbox, 'IN1_00.txt', 'first')
+    receiver = SMSShell.receivers.spool.Receiver(config=dict(path=str(inbox),
+                                                             watch=watch,
+                                                             poll_interval='0.05',
+                                                             batch_delay='0'))
+    assert receiver.start()
+    reader = receiver.read()
+
+    with next(reader) as client_context_data:
+        assert json.loads(client_context_data)['sms_text'] == 'first'
+    # the message has not been parsed
+    assert os.listdir(str(inbox / 'error')) == ['IN1_00.txt']
+
+    threading.Timer(0.1, writeMessage, args=(inbox, 'IN2_00.txt', 'second')).start()
+    client_context = next(reader)
+    with client_context as client_context_data:
+        assert json.loads(client_context_data)['sms_text'] == 'second'
+        client_context.appendTreatmentChain('parsed')
+    assert os.listdir(str(inbox / 'done')) == ['IN2_00.txt']
+    assert sorted(os.listdir(str(inbox))) == ['done', 'error']
+    assert receiver.stop()
+
+def test_read_batch_in_name_order(inbox):
+    """Files that arrive together are read in the order of their names
+    """
+    receiver = SMSShell.receivers.spool.Receiver(config=dict(path=str(inbox), watch='inotify'))
+    assert receiver.start()
+    for name in ['IN3_00.txt', 'IN1_00.txt', 'other.txt', 'IN2_00.txt']:
+        writeMessage(inbox, name, name)
+
+    reader = receiver.read()
+    texts = []
+    for _ in range(3):
+        with next(reader) as client_context_data:
+            texts.append(json.loads(client_context_data)['sms_text'])
+    assert texts == ['IN1_00.txt', 'IN2_00.txt', 'IN3_00.txt']
+    assert os.path.exists(str(inbox / 'other.txt'))
+    assert receiver.stop()
+
+def test_undecodable_file_is_moved_to_error(inbox, monkeypatch):
+    """Files which cannot be decoded are not given to the daemon
+    """
+    def decode(path):
+        message = SMSShell.utils.GammuSMSParser.createEmptyMessage()
+        if 'bad' in path:
+            SMSShell.utils.GammuSMSParser.appendError(
+                message, SMSShell.utils.GammuSMSParser.ERROR_NO_CONTENT, 'no content')
+        return message
+    monkeypatch.setattr(SMSShell.utils.GammuSMSParser, 'decodeFromBackupFilePath', decode)
+    writeMessage(inbox, 'IN1_bad.txt', '')
+    writeMessage(inbox, 'IN2_good.txt', '')
+    receiver = SMSShell.receivers.spool.Receiver(config=dict(path=str(inbox), watch='poll',
+                                                             batch_delay='0'))
+    assert receiver.start()
+    client_context = next(receiver.read())
+    assert os.listdir(str(inbox / 'error')) == ['IN1_bad.txt']
+    with client_context:
+        client_context.appendTreatmentChain('parsed')
+    assert os.listdir(str(inbox / 'done')) == ['IN2_good.txt']
+    assert receiver.stop()
+
+def test_bad_start_because_inbox_not_exists(tmp_path):
+    """Ensure receiver do not start without inbox directory
+    """
+    receiver = SMSShell.receivers.spool.Receiver(config=dict(path=str(tmp_path / 'none')))
+    assert not receiver.start()
+
+@pytest.mark.parametrize('watch', ['inotify', 'poll'])
+def test_read_more_existing_files_than_batch_size(inbox, watch):
+    """All files present at start are read, whatever the batch size
+    """
+    for i in range(7):
+        writeMessage(inbox, 'IN{}_00.txt'.format(i), str(i))
+    receiver = SMSShell.receivers.spool.Receiver(config=dict(path=str(inbox),
+                                                             watch=watch,
+                                                             poll_interval='0.05',
+                                                             batch_delay='0',
+                                                             batch_size='3'))
+    assert receiver.start()
+    reader = receiver.read()
+    texts = []
+    for _ in range(7):
+        client_context = next(reader)
+        with client_context as client_context_data:
+            texts.append(json.loads(client_context_data)['sms_text'])
+            client_context.appendTreatmentChain('parsed')
+    assert texts == [str(i) for i in range(7)]
+    assert len(os.listdir(str(inbox / 'done'))) == 7
+    assert receiver.stop()
+
+def test_rejected_file_is_retried(inbox):
+    """Files of rejected messages stay in the inbox and are read again
+    """
+    writeMessage(inbox, 'IN1_00.txt', 'first')
+    receiver = SMSShell.receivers.spool.Receiver(config=dict(path=str(inbox),
+                                                             watch='inotify',
+                                                             poll_interval='0.05',
+                                                             batch_delay='0'))
+    assert receiver.start()
+    reader = receiver.read()
+    client_context = next(reader)
+    with client_context:
+        client_context.addResponseData(error='server busy, message rejected')
+        client_context.appendTreatmentChain('rejected')
+    assert os.path.exists(str(inbox / 'IN1_00.txt'))
+    assert os.listdir(str(inbox / 'error')) == []
+
+    client_context = next(reader)
+    with client_context as client_context_data:
+        assert json.loads(client_context_data)['sms_text'] == 'first'
+        client_context.appendTreatmentChain('parsed')
+    assert os.listdir(str(inbox / 'done')) == ['IN1_00.txt']
+    assert receiver.stop()
+
+def test_bad_start_without_gammu(inbox, monkeypatch):
+    """Ensure receiver do not start if backup files cannot be decoded
+    """
+    monkeypatch.setattr(SMSShell.utils.gammusmsdparser, 'gammu', None)
+    writeMessage(inbox, 'IN1_00.txt', 'first')
+    receiver = SMSShell.receivers.spool.Receiver(config=dict(path=str(inbox)))
+    assert not receiver.start()
+    assert os.path.exists(str(inbox / 'IN1_00.txt'))
+
+def test_stale_inotify_event_is_ignored(inbox):
+    """Files found by a scan and moved before their inotify event is read are skipped
+    """
+    receiver = SMSShell.receivers.spool.Receiver(config=dict(path=str(inbox),
+                                                             watch='inotify',
+                                                             poll_interval='0.05',
+                                                             batch_delay='0'))
+    assert receiver.start()
+    # written after the start of the watch, so found by the first scan
+    # while its inotify event is still queued
+    writeMessage(inbox, 'IN1_00.txt', 'first')
+    reader = receiver.read()
+    client_context = next(reader)
+    with client_context as client_context_data:
+        assert json.loads(client_context_data)['sms_text'] == 'first'
+        client_context.appendTreatmentChain('parsed')
+
+    threading.Timer(0.1, writeMessage, args=(inbox, 'IN2_00.txt', 'second')).start()
+    client_context = next(reader)
+    with client_context as client_context_data:
+        assert json.loads(client_context_data)['sms_text'] == 'second'
+        client_context.appendTreatmentChain('parsed')
+    assert sorted(os.listdir(str(inbox / 'done'))) == ['IN1_00.txt', 'IN2_00.txt']
+    assert os.listdir(str(inbox / 'error')) == []
+    assert receiver.stop()
@@ -1,5 +1,6 @@
 # -*- coding: utf8 -*-
 
+import asyncio
 import json
 import os
 import pytest
@@ -12,6 +13,8 @@ import threading
 
 import SMSShell
 import SMSShell.receivers.unix
+import SMSShell.shell
+import SMSShell.utils
 
 def test_start():
     """Just start and stop the receiver
@@ -128,3 +131,203 @@ def test_simple_read_from_socket():
 
     assert receiver.stop()
     assert not os.path.exists(m_unix)
+
+def test_read_unframed_message():
+    """By default a message is read without waiting for the end of the connection
+    """
+    m_unix = './r_unix'
+    receiver = SMSShell.receivers.unix.Receiver(config=dict(path=m_unix))
+    assert receiver.framing == 'none'
+    assert receiver.start()
+
+    received = []
+    def serve():
+        with next(receiver.read()) as client_context_data:
+            received.append(client_context_data)
+    server = threading.Thread(target=serve)
+    server.start()
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(m_unix)
+    client.settimeout(5)
+    # the client waits for the acknowledgment without closing its side
+    client.sendall(b'{"sender": "local"}')
+    ack = json.loads(client.recv(1024).decode())
+    assert ack['received_length'] == 19
+    server.join(5)
+    assert received == ['{"sender": "local"}']
+    client.close()
+    assert receiver.stop()
+
+def test_async_read_from_socket():
+    """Start the asyncio receiver and test read/write
+    """
+    m_unix = './r_unix'
+    receiver = SMSShell.receivers.unix.AsyncReceiver(config=dict(path=m_unix, framing='newline'))
+
+    async def run():
+        assert await receiver.start()
+        assert stat.S_ISSOCK(os.stat(m_unix).st_mode)
+        reader, writer = await asyncio.open_unix_connection(m_unix)
+        writer.write(b'ok\n')
+
+        client_context = await asyncio.wait_for(receiver.read(), 5)
+        with client_context as client_context_data:
+            assert client_context_data == 'ok'
+            client_context.addResponseData(output='done')
+
+        ack = json.loads((await asyncio.wait_for(reader.readline(), 5)).decode())
+        assert ack['received_length'] == 2
+        assert ack['output'] == 'done'
+        writer.close()
+        assert await receiver.stop()
+
+    SMSShell.shell.Shell.runCoroutine(run())
+    assert not os.path.exists(m_unix)
+
+def test_read_many_frames_from_one_connection():
+    """Many messages sent at once on one connection are received separately
+    """
+    m_unix = './r_unix'
+    receiver = SMSShell.receivers.unix.Receiver(config=dict(path=m_unix, framing='length'))
+    assert receiver.start()
+
+    large = 'x' * 10000
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(m_unix)
+    client.sendall(SMSShell.utils.encodeFrame('length', 'first') +
+                   SMSShell.utils.encodeFrame('length', large))
+
+    reader = receiver.read()
+    received = []
+    while len(received) < 2:
+        client_context = next(reader)
+        with client_context as client_context_data:
+            received.append(client_context_data)
+    assert received == ['first', large]
+
+    decoder = SMSShell.utils.FrameDecoder('length')
+    acks = []
+    while len(acks) < 2:
+        acks.extend(decoder.feed(client.recv(1024)))
+    assert [json.loads(ack.decode())['received_length'] for ack in acks] == [5, 10000]
+
+    client.close()
+    assert receiver.stop()
+
+def test_pipelined_requests_acknowledged_out_of_order():
+    """Acknowledgments carry the number of their message on the connection
+    """
+    m_unix = './r_unix'
+    receiver = SMSShell.receivers.unix.Receiver(config=dict(path=m_unix, framing='newline'))
+    assert receiver.start()
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(m_unix)
+    client.settimeout(5)
+    client.sendall(b'a\nbb\nccc\n')
+    client.shutdown(socket.SHUT_WR)
+
+    reader = receiver.read()
+    contexts = [next(reader) for _ in range(3)]
+    # answer in the reverse order
+    for client_context in reversed(contexts):
+        with client_context:
+            pass
+
+    decoder = SMSShell.utils.FrameDecoder('newline')
+    acks = []
+    while len(acks) < 3:
+        acks.extend(json.loads(ack.decode()) for ack in decoder.feed(client.recv(1024)))
+    assert [(ack['id'], ack['received_length']) for ack in acks] == [(3, 3), (2, 2), (1, 1)]
+
+    client.close()
+    assert receiver.stop()
+
+def test_read_too_large_frame():
+    """A too large frame is answered by an error and the connection is closed
+    """
+    m_unix = './r_unix'
+    receiver = SMSShell.receivers.unix.Receiver(config=dict(path=m_unix, framing='newline',
+                                                       max_frame_size='10'))
+    assert receiver.start()
+
+    received = []
+    def serve():
+        # stop reading after the first valid message
+        with next(receiver.read()) as client_context_data:
+            received.append(client_context_data)
+    server = threading.Thread(target=serve)
+    server.start()
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(m_unix)
+    client.settimeout(5)
+    client.sendall(b'x' * 20 + b'\n')
+    ack = json.loads(client.recv(1024).decode())
+    assert 'error' in ack
+    assert client.recv(1024) == b''
+    client.close()
+
+    other = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    other.connect(m_unix)
+    other.sendall(b'ok\n')
+    server.join(5)
+    assert received == ['ok']
+    other.close()
+    assert receiver.stop()
+
+def test_read_unterminated_last_message():
+    """The last message of a closed connection is read without its newline
+    """
+    m_unix = './r_unix'
+    receiver = SMSShell.receivers.unix.Receiver(config=dict(path=m_unix, framing='newline'))
+    assert receiver.start()
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(m_unix)
+    client.settimeout(5)
+    client.sendall(b'a\nlast')
+    client.shutdown(socket.SHUT_WR)
+
+    reader = receiver.read()
+    received = []
+    while len(received) < 2:
+        with next(reader) as client_context_data:
+            received.append(client_context_data)
+    assert received == ['a', 'last']
+
+    decoder = SMSShell.utils.FrameDecoder('newline')
+    acks = []
+    while len(acks) < 2:
+        acks.extend(json.loads(ack.decode()) for ack in decoder.feed(client.recv(1024)))
+    assert [ack['received_length'] for ack in acks] == [1, 4]
+
+    client.close()
+    assert receiver.stop()
+
+def test_read_invalid_message():
+    """A message which is not valid UTF-8 is answered by an error
+    """
+    m_unix = './r_unix'
+    receiver = SMSShell.receivers.unix.Receiver(config=dict(path=m_unix, framing='newline'))
+    assert receiver.start()
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(m_unix)
+    client.settimeout(5)
+    client.sendall(b'\xff\nok\n')
+    client.shutdown(socket.SHUT_WR)
+
+    with next(receiver.read()) as client_context_data:
+        assert client_context_data == 'ok'
+
+    decoder = SMSShell.utils.FrameDecoder('newline')
+    acks = []
+    while len(acks) < 2:
+        acks.extend(json.loads(ack.decode()) for ack in decoder.feed(client.recv(1024)))
+    assert 'error' in acks[0]
+    assert acks[1]['received_length'] == 2
+
+    client.close()
+    assert receiver.stop()
@@ -1,9 +1,14 @@
 # -*- coding: utf8 -*-
 
+import asyncio
+import os
 import pytest
+import threading
 
 import SMSShell
 import SMSShell.receivers
+import SMSShell.receivers.fifo
+import SMSShell.shell
 
 
 def test_abstract_receiver_init():
@@ -39,3 +44,83 @@ def test_abstract_context_bad_usage():
     abs = SMSShell.receivers.AbstractClientRequest('')
     with pytest.raises(RuntimeError):
         abs.getRequestData()
+
+def test_detached_context():
+    """Treatment recorded by a detached request is given back to client request
+    """
+    detached = SMSShell.receivers.DetachedClientRequest(None)
+    with detached:
+        detached.appendTreatmentChain('executed')
+        detached.addResponseData(output='ok')
+
+    abs = SMSShell.receivers.AbstractClientRequest('')
+    abs.appendTreatmentChain('parsed')
+    abs.extendTreatmentChain(detached.getTreatmentChain())
+    abs.addResponseData(**detached.popResponseData())
+    assert [name for name, _ in abs.getTreatmentChain()] == ['parsed', 'executed']
+    assert abs.popResponseData() == dict(output='ok')
+
+def test_abstract_async_receiver():
+    """Test abstract asyncio receiver methods
+    """
+    abs = SMSShell.receivers.AbstractAsyncReceiver()
+    with pytest.raises(NotImplementedError):
+        SMSShell.shell.Shell.runCoroutine(abs.start())
+
+    with pytest.raises(NotImplementedError):
+        SMSShell.shell.Shell.runCoroutine(abs.stop())
+
+    with pytest.raises(NotImplementedError):
+        SMSShell.shell.Shell.runCoroutine(abs.read())
+
+def test_async_adapter():
+    """Read from a synchronous receiver through the asyncio adapter
+    """
+    fifo = './r_fifo'
+    adapter = SMSShell.receivers.AsyncReceiverAdapter(
+        SMSShell.receivers.fifo.Receiver(config=dict(path=fifo)))
+
+    def writeToFifo():
+        with open(fifo, 'w') as path:
+            path.write('ok')
+
+    async def run():
+        assert await adapter.start()
+        threading.Thread(target=writeToFifo).start()
+        client_context = await asyncio.wait_for(adapter.read(), 5)
+        with client_context as client_context_data:
+            assert client_context_data == 'ok'
+        assert await adapter.stop()
+
+    SMSShell.shell.Shell.runCoroutine(run())
+    assert not os.path.exists(fifo)
+
+def test_async_adapter_bounded_queue():
+    """The adapter stops reading the wrapped receiver while its queue is full
+    """
+    produced = []
+
+    class ListReceiver(SMSShell.receivers.AbstractReceiver):
+        def start(self):
+            return True
+
+        def stop(self):
+            return True
+
+        def read(self):
+            for i in range(10):
+                produced.append(i)
+                yield i
+
+    adapter = SMSShell.receivers.AsyncReceiverAdapter(ListReceiver())
+    adapter.setQueueSize(2)
+
+    async def run():
+        assert await adapter.start()
+        await asyncio.sleep(0.2)
+        # two requests in the queue and one waiting for free space
+        assert len(produced) == 3
+        assert [await asyncio.wait_for(adapter.read(), 5) for _ in range(10)] == list(range(10))
+        assert await adapter.stop()
+
+    SMSShell.shell.Shell.runCoroutine(run())
@@ -0,0 +1,84 @@
+# -*- coding: utf8 -*-
+
+import os
+
+import SMSShell
+import SMSShell.sessionstores.file
+from SMSShell.models import Session, SessionStates
+
+
+def newStore(path, **config):
+    config['path'] = path
+    store = SMSShell.sessionstores.file.SessionStore(config=config)
+    assert store.start()
+    return store
+
+def test_save_and_load(tmp_path):
+    """Sessions are kept between stores instances
+    """
+    path = str(tmp_path / 'sessions.log')
+    store = newStore(path)
+    s = Session('sender', 20)
+    s.state = SessionStates.STATE_USER
+    store.save(s)
+    store.save(Session('expired', 0))
+    store.flush()
+    s.set('key', 'value')
+    store.save(s)
+    assert store.stop()
+    with open(path) as content:
+        assert len(content.readlines()) == 3
+
+    store = newStore(path)
+    r = store.load('sender')
+    assert r.state == SessionStates.STATE_USER
+    assert r.get('key') == 'value'
+    assert store.load('expired') is None
+    assert store.stop()
+    # the file has been compacted when opened
+    with open(path) as content:
+        assert len(content.readlines()) == 1
+
+def test_shared_file(tmp_path):
+    """Stores see the sessions written and compacted by the others
+    """
+    path = str(tmp_path / 'sessions.log')
+    first = newStore(path)
+    second = newStore(path, compact_interval='0')
+    first.save(Session('a'))
+    first.flush()
+    assert second.load('a') is not None
+
+    second.save(Session('b'))
+    second.flush()
+    assert first.load('b') is not None
+    first.save(Session('a', 30))
+    first.flush()
+    assert second.load('a').ttl == 30
+    assert first.stop()
+    assert second.stop()
+
+def test_incomplete_line(tmp_path):
+    """A line left incomplete by a crash is ignored
+    """
+    path = str(tmp_path / 'sessions.log')
+    store = newStore(path)
+    store.save(Session('a'))
+    store.flush()
+    with open(path, 'a') as content:
+        content.write('{"subject": "b", "st')
+    store.save(Session('c'))
+    store.flush()
+    assert store.load('a') is not None
+    assert store.load('b') is None
+    assert store.load('c') is not None
+    assert store.stop()
+
+    store = newStore(path)
+    assert store.load('c') is not None
+    assert store.stop()
+
+def test_bad_path(tmp_path):
+    path = str(tmp_path / 'nonexistent' / 'sessions.log')
+    store = SMSShell.sessionstores.file.SessionStore(config=dict(path=path))
+    assert not store.start()
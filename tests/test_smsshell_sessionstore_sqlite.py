@@ -0,0 +1,50 @@
+# -*- coding: utf8 -*-
+
+import sqlite3
+
+import SMSShell
+import SMSShell.sessionstores.sqlite
+from SMSShell.models import Session, SessionStates
+
+
+def test_save_and_load(tmp_path):
+    """Sessions are kept between stores instances
+    """
+    path = str(tmp_path / 'sessions.sqlite')
+    store = SMSShell.sessionstores.sqlite.SessionStore(config=dict(path=path))
+    assert store.start()
+    s = Session('sender', 20)
+    s.state = SessionStates.STATE_USER
+    s.set('key', 'value')
+    store.save(s)
+    store.save(Session('expired', 0))
+    assert store.stop()
+
+    store = SMSShell.sessionstores.sqlite.SessionStore(config=dict(path=path))
+    assert store.start()
+    r = store.load('sender')
+    assert r.state == SessionStates.STATE_USER
+    assert r.get('key') == 'value'
+    assert store.load('expired') is None
+    assert store.load('other') is None
+    assert store.stop()
+
+    with sqlite3.connect(path) as connection:
+        assert connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        assert connection.execute('SELECT subject FROM sessions').fetchall() == [('sender',)]
+
+def test_bad_path(tmp_path):
+    path = str(tmp_path / 'nonexistent' / 'sessions.sqlite')
+    store = SMSShell.sessionstores.sqlite.SessionStore(config=dict(path=path))
+    assert not store.start()
+
+def test_unserializable_session(tmp_path):
+    path = str(tmp_path / 'sessions.sqlite')
+    store = SMSShell.sessionstores.sqlite.SessionStore(config=dict(path=path))
+    assert store.start()
+    store.save(Session('bad').set('key', object()))
+    store.save(Session('good'))
+    assert store.flush() == 2
+    assert store.load('bad') is None
+    assert store.load('good') is not None
+    assert store.stop()
@@ -0,0 +1,153 @@
+# -*- coding: utf8 -*-
+
+import pytest
+import time
+
+import SMSShell
+import SMSShell.config
+import SMSShell.metrics.none
+import SMSShell.sessionstores
+import SMSShell.sessionstores.memory
+import SMSShell.shell
+from SMSShell.models import Session, SessionStates
+
+
+class DictSessionStore(SMSShell.sessionstores.AbstractSessionStore):
+    """A store which keeps sessions data in a dict
+    """
+
+    def init(self):
+        self.data = dict()
+        self.batches = []
+        self.fail = False
+
+    def _open(self):
+        return True
+
+    def _close(self):
+        pass
+
+    def _read(self, subject):
+        return self.data.get(subject)
+
+    def _write(self, records):
+        if self.fail:
+            return False
+        self.batches.append(len(records))
+        for data in records:
+            self.data[data['subject']] = data
+        return True
+
+
+def test_abstract_init():
+    """Test base session store class exception
+    """
+    abs = SMSShell.sessionstores.AbstractSessionStore()
+    with pytest.raises(NotImplementedError):
+        abs.start()
+    with pytest.raises(NotImplementedError):
+        abs._read('sender')
+    with pytest.raises(NotImplementedError):
+        abs._write([])
+
+def test_memory_store():
+    store = SMSShell.sessionstores.memory.SessionStore()
+    assert store.start()
+    store.save(Session('sender'))
+    assert store.flush() == 1
+    assert store.load('sender') is None
+    assert store.stop()
+
+def test_write_behind():
+    """Saved sessions are written by batches
+    """
+    store = DictSessionStore(config=dict(flush_interval='60'))
+    assert store.start()
+    for ttl in [10, 20]:
+        store.save(Session('a', ttl))
+    store.save(Session('b'))
+    assert not store.data
+    # waiting sessions are loaded without being written
+    assert store.load('a').ttl == 20
+    assert store.flush() == 2
+    assert store.batches == [2]
+    assert store.load('b') is not None
+    assert store.load('c') is None
+    assert store.stop()
+
+def test_write_failure_is_retried():
+    store = DictSessionStore()
+    store.fail = True
+    store.save(Session('a'))
+    assert store.flush() == 0
+    store.fail = False
+    assert store.flush() == 1
+    assert 'a' in store.data
+
+def test_flush_on_batch_size():
+    """The writer thread writes as soon as batch_size sessions are waiting
+    """
+    store = DictSessionStore(config=dict(flush_interval='60', batch_size='2'))
+    assert store.start()
+    store.save(Session('a'))
+    store.save(Session('b'))
+    for _ in range(100):
+        if store.data:
+            break
+        time.sleep(0.01)
+    assert len(store.data) == 2
+    store.save(Session('c'))
+    assert store.stop()
+    assert len(store.data) == 3
+
+def test_periodic_task():
+    """The writer thread runs the periodic tasks
+    """
+    store = DictSessionStore(config=dict(flush_interval='0.01'))
+    runs = []
+    store.addPeriodicTask(lambda: runs.append(True), 0.02)
+    assert store.start()
+    for _ in range(100):
+        if len(runs) >= 2:
+            break
+        time.sleep(0.01)
+    assert store.stop()
+    assert len(runs) >= 2
+
+def test_shell_sweeps_expired_sessions():
+    """The shell sweeps its expired sessions from the writer thread of its store
+    """
+    conf = SMSShell.config.MyConfigParser()
+    assert conf.load('./config.conf')[1]
+    conf.set('daemon', 'session_sweep_interval', '1')
+    store = DictSessionStore(config=dict(flush_interval='0.05'))
+
+    shell = SMSShell.shell.Shell(conf, SMSShell.metrics.none.MetricsHelper())
+    shell.setSessionStore(store)
+    sessions = shell.getSessionMap()
+    sessions.put(Session('expired', 0))
+    assert store.start()
+    for _ in range(300):
+        if not len(sessions):
+            break
+        time.sleep(0.01)
+    assert store.stop()
+    assert len(sessions) == 0
+    assert sessions.evictedCount('expired') == 1
+
+def test_shell_loads_and_saves_sessions():
+    conf = SMSShell.config.MyConfigParser()
+    assert conf.load('./config.conf')[1]
+    store = DictSessionStore()
+
+    shell = SMSShell.shell.Shell(conf, SMSShell.metrics.none.MetricsHelper())
+    shell.setSessionStore(store)
+    sess = Session('sender', 60)
+    sess.forceState(SessionStates.STATE_ADMIN)
+    store.save(sess)
+    store.flush()
+
+    assert shell.exec('sender', 'role') == 'ADMIN'
+    assert shell.exec('other', 'whoami') == 'other'
+    store.flush()
+    assert sorted(store.data) == ['other', 'sender']
@@ -1,6 +1,10 @@
 # -*- coding: utf8 -*-
 
+import os
 import pytest
+import shlex
+import sys
+import threading
 
 import SMSShell
 import SMSShell.config
@@ -126,3 +130,115 @@ def test_secure_wrapper_isolation():
 
     with pytest.raises(SMSShell.exceptions.ShellException):
         sw.exec('user1', 'help')
+    with pytest.raises(AttributeError):
+        sw.exec = None
+    assert shell.getSecureShell() is sw
+
+def test_exec_async():
+    """Run synchronous commands from the event loop
+    """
+    conf = SMSShell.config.MyConfigParser()
+    assert conf.load('./config.conf')[1]
+
+    metrics = SMSShell.metrics.none.MetricsHelper()
+
+    shell = SMSShell.shell.Shell(conf, metrics)
+
+    assert shell.runCoroutine(shell.execAsync('sender', 'whoami')) == 'sender'
+    with pytest.raises(SMSShell.commands.CommandNotFoundException):
+        shell.runCoroutine(shell.execAsync('sender', 'nonexistent'))
+
+def test_exec_concurrent_subjects():
+    """Commands of several subjects run by concurrent threads
+    """
+    conf = SMSShell.config.MyConfigParser()
+    assert conf.load('./config.conf')[1]
+
+    metrics = SMSShell.metrics.none.MetricsHelper()
+
+    shell = SMSShell.shell.Shell(conf, metrics)
+    results = dict()
+
+    def run(subject):
+        results[subject] = [shell.exec(subject, 'whoami') for _ in range(50)]
+
+    threads = [threading.Thread(target=run, args=('user{}'.format(i),)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 8
+    for subject, outputs in results.items():
+        assert outputs == [subject] * 50
+
+def test_flush_reloads_only_changed_commands():
+    """Only the commands whose source changed are reloaded by a flush
+    """
+    path = os.path.join(os.path.dirname(SMSShell.commands.__file__), 'testreload.py')
+    source = ('from . import AbstractCommand\n'
+              'class Testreload(AbstractCommand):\n'
+              '    def main(self, argv):\n'
+              '        return {!r}\n')
+    try:
+        with open(path, 'w') as command:
+            command.write(source.format('first'))
+        conf = SMSShell.config.MyConfigParser()
+        shell = SMSShell.shell.Shell(conf, SMSShell.metrics.none.MetricsHelper())
+        session = SMSShell.models.session.Session('sender')
+        assert shell.exec('sender', 'testreload') == 'first'
+        whoami = shell.getCommand(session, 'whoami')
+        assert shell.flushCommandCache() == []
+
+        # a new modification time with the same content does not reload
+        os.utime(path, ns=(1, 1))
+        assert shell.flushCommandCache() == []
+
+        with open(path, 'w') as command:
+            command.write(source.format('second'))
+        os.utime(path, ns=(2, 2))
+        assert shell.flushCommandCache() == ['testreload']
+        assert shell.exec('sender', 'testreload') == 'second'
+        assert shell.getCommand(session, 'whoami') is whoami
+
+        # a broken source keeps the previous command
+        with open(path, 'w') as command:
+            command.write('broken(')
+        os.utime(path, ns=(3, 3))
+        assert shell.flushCommandCache() == []
+        assert shell.exec('sender', 'testreload') == 'second'
+    finally:
+        os.unlink(path)
+        sys.modules.pop('SMSShell.commands.testreload', None)
+
+@pytest.mark.parametrize('cmdline', [
+    'whoami',
+    '  desc   whoami ',
+    'a\tb\r\nc',
+    'a\xa0b é',
+    'desc "who ami" \'x y\'',
+    'a\\ b',
+    '',
+])
+def test_split_arguments_like_shlex(cmdline):
+    assert SMSShell.shell.Shell.splitArguments(cmdline) == shlex.split(cmdline)
+
+def test_exec_bad_syntax():
+    shell = SMSShell.shell.Shell(SMSShell.config.MyConfigParser(), object())
+    with pytest.raises(SMSShell.exceptions.ShellException) as ex:
+        shell.exec('sender', "it's")
+    assert ex.value.args[1] == 'bad syntax: no closing quotation'
+
+def test_session_max_count():
+    conf = SMSShell.config.MyConfigParser()
+    assert conf.load('./config.conf')[1]
+    conf.set('daemon', 'session_max_count', '2')
+    conf.set('daemon', 'session_shards', '1')
+
+    shell = SMSShell.shell.Shell(conf, SMSShell.metrics.none.MetricsHelper())
+
+    for subject in ['a', 'b', 'c']:
+        shell.exec(subject, 'whoami')
+    assert shell.getSession('a') is None
+    assert shell.getSession('b') is not None
+    assert shell.getSession('c') is not None
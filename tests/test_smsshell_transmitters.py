@@ -5,6 +5,7 @@ import pytest
 import SMSShell
 import SMSShell.transmitters
 import SMSShell.models
+import SMSShell.shell
 
 
 def test_abstract_init():
@@ -24,3 +25,72 @@ def test_abstract_transmit():
     message = SMSShell.models.Message('local', '')
     with pytest.raises(NotImplementedError):
         abs.transmit(message)
+
+def test_abstract_async_transmitter():
+    """Test base asyncio transmitter class exception
+    """
+    abs = SMSShell.transmitters.AbstractAsyncTransmitter()
+    message = SMSShell.models.Message('local', '')
+    with pytest.raises(NotImplementedError):
+        SMSShell.shell.Shell.runCoroutine(abs.start())
+    with pytest.raises(NotImplementedError):
+        SMSShell.shell.Shell.runCoroutine(abs.stop())
+    with pytest.raises(NotImplementedError):
+        SMSShell.shell.Shell.runCoroutine(abs.transmit(message))
+
+def test_async_adapter(capsys):
+    """Run a synchronous transmitter through the asyncio adapter
+    """
+    import SMSShell.transmitters.stdout
+    adapter = SMSShell.transmitters.AsyncTransmitterAdapter(
+        SMSShell.transmitters.stdout.Transmitter())
+
+    async def run():
+        assert await adapter.start()
+        await adapter.transmit(SMSShell.models.Message('local', 'hello'))
+        assert await adapter.stop()
+
+    SMSShell.shell.Shell.runCoroutine(run())
+    assert 'TRANSMIT to local: hello' in capsys.readouterr().out
+
+def test_async_adapter_serializes_transmit():
+    """The adapter does not run the wrapped transmitter concurrently
+    """
+    import asyncio
+    import concurrent.futures
+    import threading
+    import time
+
+    class CountingTransmitter(SMSShell.transmitters.AbstractTransmitter):
+        def init(self):
+            self.lock = threading.Lock()
+            self.running = 0
+            self.max_running = 0
+
+        def start(self):
+            return True
+
+        def stop(self):
+            return True
+
+        def transmit(self, answer):
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            time.sleep(0.01)
+            with self.lock:
+                self.running -= 1
+
+    transmitter = CountingTransmitter()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+    adapter = SMSShell.transmitters.AsyncTransmitterAdapter(transmitter, executor)
+
+    async def run():
+        assert await adapter.start()
+        await asyncio.gather(*[adapter.transmit(SMSShell.models.Message('local', str(i)))
+                               for i in range(4)])
+        assert await adapter.stop()
+
+    SMSShell.shell.Shell.runCoroutine(run())
+    executor.shutdown()
+    assert transmitter.max_running == 1
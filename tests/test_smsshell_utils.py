@@ -21,3 +21,63 @@ def test_group_to_gid():
 
     with pytest.raises(KeyError):
         SMSShell.utils.groupToGid('roo')
+
+def test_frame_decoder_newline():
+    """"""
+    decoder = SMSShell.utils.FrameDecoder('newline')
+    assert decoder.feed(b'ab') == []
+    assert decoder.feed(b'c\nde\nf') == [b'abc', b'de']
+    assert decoder.pending() == 1
+    assert decoder.feed(SMSShell.utils.encodeFrame('newline', 'g')) == [b'fg']
+    assert decoder.pending() == 0
+
+def test_frame_decoder_length():
+    """"""
+    decoder = SMSShell.utils.FrameDecoder('length')
+    data = SMSShell.utils.encodeFrame('length', 'abc') + SMSShell.utils.encodeFrame('length', b'de')
+    assert decoder.feed(data[:2]) == []
+    assert decoder.feed(data[2:6]) == []
+    assert decoder.feed(data[6:]) == [b'abc', b'de']
+
+def test_frame_decoder_too_large():
+    """"""
+    decoder = SMSShell.utils.FrameDecoder('newline', max_frame_size=4)
+    with pytest.raises(SMSShell.utils.FrameTooLargeException):
+        decoder.feed(b'abcdef')
+    assert decoder.pending() == 0
+
+    decoder = SMSShell.utils.FrameDecoder('length', max_frame_size=4)
+    with pytest.raises(SMSShell.utils.FrameTooLargeException):
+        decoder.feed(SMSShell.utils.encodeFrame('length', 'abcdef'))
+
+def test_frame_decoder_resync_after_too_large():
+    """"""
+    encode = SMSShell.utils.encodeFrame
+    decoder = SMSShell.utils.FrameDecoder('length', max_frame_size=4)
+    data = encode('length', 'ab') + encode('length', 'abcdefgh') + encode('length', 'cd')
+    with pytest.raises(SMSShell.utils.FrameTooLargeException) as ex:
+        decoder.feed(data[:10])
+    assert ex.value.frames == [b'ab']
+    # the rest of the too large frame is dropped
+    assert decoder.feed(data[10:]) == [b'cd']
+    assert decoder.pending() == 0
+
+    decoder = SMSShell.utils.FrameDecoder('newline', max_frame_size=4)
+    with pytest.raises(SMSShell.utils.FrameTooLargeException) as ex:
+        decoder.feed(b'ab\nabcdef')
+    assert ex.value.frames == [b'ab']
+    assert decoder.feed(b'gh') == []
+    assert decoder.feed(b'ij\ncd\n') == [b'cd']
+
+def test_frame_decoder_flush():
+    """"""
+    decoder = SMSShell.utils.FrameDecoder('newline')
+    assert decoder.feed(b'ab\ncd') == [b'ab']
+    assert decoder.flush() == [b'cd']
+    assert decoder.flush() == []
+
+    decoder = SMSShell.utils.FrameDecoder('length')
+    assert decoder.feed(SMSShell.utils.encodeFrame('length', 'ab')[:-1]) == []
+    # an incomplete frame is dropped
+    assert decoder.flush() == []
+    assert decoder.pending() == 0
@@ -1,8 +1,12 @@
 # -*- coding: utf8 -*-
 
+import re
+import time
+
 import pytest
 
 import SMSShell
+import SMSShell.config
 import SMSShell.validators
 import SMSShell.models.message
 
@@ -66,3 +70,183 @@ def test_regexp_data_invalid():
     val = SMSShell.validators.Regexp('^a$')
     with pytest.raises(SMSShell.validators.ValidationException):
         val('b')
+
+def test_regexp_chain_fusion():
+    """Consecutive regexps of a field are run as one validator
+    """
+    chain = SMSShell.validators.ValidatorChain()
+    chain.addLinksFromDict({'number': [SMSShell.validators.Regexp('^\\+'),
+                                       SMSShell.validators.Regexp('^\\+(33|32)'),
+                                       SMSShell.validators.Regexp('^\\+[0-9]+$',
+                                                                  message='not digits')]})
+    assert chain.callChainOnObject(SMSShell.models.message.Message('+33612', 'b'))
+    # the error is the one of the failing regexp
+    with pytest.raises(SMSShell.validators.ValidationException) as ex:
+        chain.callChainOnObject(SMSShell.models.message.Message('+3361a', 'b'))
+    assert str(ex.value) == 'not digits'
+    with pytest.raises(SMSShell.validators.ValidationException):
+        chain.callChainOnObject(SMSShell.models.message.Message('+41612', 'b'))
+
+def test_regexp_chain_fusion_ignored():
+    """Regexps which cannot be fused keep their behaviour
+    """
+    val = SMSShell.validators.RegexpGroup
+    assert val.canFuse(SMSShell.validators.Regexp('^(a)b$'))
+    assert not val.canFuse(SMSShell.validators.Regexp('^(a)\\1$'))
+    assert not val.canFuse(SMSShell.validators.Regexp('^(?P<a>a)$'))
+    assert not val.canFuse(SMSShell.validators.Regexp('(?i)^a$'))
+
+    chain = SMSShell.validators.ValidatorChain()
+    chain.addLinksFromDict({'content': [SMSShell.validators.Regexp('^(a)\\1'),
+                                        SMSShell.validators.Regexp('(?i)^A'),
+                                        SMSShell.validators.Regexp('^A', re.IGNORECASE)]})
+    assert chain.callChainOnObject(SMSShell.models.message.Message('+33', 'aab'))
+    with pytest.raises(SMSShell.validators.ValidationException):
+        chain.callChainOnObject(SMSShell.models.message.Message('+33', 'ab'))
+
+# NumberList validator
+
+def test_numberlist_allow(tmp_path):
+    path = tmp_path / 'numbers.txt'
+    path.write_text('# comment\n+33612345678\n\n+337*\n+32*\n+3225551234\n')
+    val = SMSShell.validators.NumberList(str(path))
+    assert len(val) == 4
+    assert val('+33612345678') == '+33612345678'
+    assert val('+33700000000')
+    assert val('+32')
+    with pytest.raises(SMSShell.validators.ValidationException):
+        val('+3361234567')
+    with pytest.raises(SMSShell.validators.ValidationException):
+        val('+336123456789')
+    with pytest.raises(SMSShell.validators.ValidationException):
+        val('')
+
+def test_numberlist_deny(tmp_path):
+    path = tmp_path / 'numbers.txt'
+    path.write_text('+336*\n')
+    val = SMSShell.validators.NumberList(str(path), 'deny')
+    assert val('+33712345678')
+    with pytest.raises(SMSShell.validators.ValidationException):
+        val('+33612345678')
+
+def test_numberlist_reload(tmp_path):
+    path = tmp_path / 'numbers.txt'
+    path.write_text('+336*\n')
+    val = SMSShell.validators.NumberList(str(path), 'allow', '0.001')
+    assert val('+33612345678')
+    assert not val.reload()
+
+    path.write_text('+337*\n+338*\n')
+    time.sleep(0.01)
+    with pytest.raises(SMSShell.validators.ValidationException):
+        val('+33612345678')
+    assert val('+33712345678')
+    assert len(val) == 2
+
+    # the previous list is kept when the file disappears
+    path.unlink()
+    time.sleep(0.01)
+    assert val('+33712345678')
+
+def test_numberlist_from_config(tmp_path):
+    path = tmp_path / 'numbers.txt'
+    path.write_text('+336*\n')
+    conf = SMSShell.config.MyConfigParser()
+    conf.read_string(('[main]\nmode = DAEMON\n[daemon]\n' +
+                      'input_validators = number=numberList:{},deny,0|regexp:^\\+\n').format(path))
+    chain = SMSShell.validators.ValidatorChain()
+    chain.addLinksFromDict(conf.getValidatorsFromConfig('input_validators'))
+    assert chain.callChainOnObject(SMSShell.models.message.Message('+33712345678', 'b'))
+    with pytest.raises(SMSShell.validators.ValidationException):
+        chain.callChainOnObject(SMSShell.models.message.Message('+33612345678', 'b'))
+
+def test_numberlist_bad_init(tmp_path):
+    with pytest.raises(OSError):
+        SMSShell.validators.NumberList(str(tmp_path / 'none'))
+    with pytest.raises(ValueError):
+        SMSShell.validators.NumberList(str(tmp_path / 'none'), 'bad')
+
+# Batch validation
+
+def test_batch_validation(tmp_path):
+    path = tmp_path / 'numbers.txt'
+    path.write_text('+337*\n')
+
+    class V(SMSShell.validators.AbstractValidator):
+        def __call__(self, data):
+            if data == 'c':
+                raise SMSShell.validators.ValidationException('c')
+            return data
+
+    chain = SMSShell.validators.ValidatorChain()
+    chain.addLinksFromDict({'number': [SMSShell.validators.Regexp('^\\+'),
+                                       SMSShell.validators.Regexp('^\\+33'),
+                                       SMSShell.validators.NumberList(str(path), 'deny')],
+                            'content': [V()]})
+    messages = [SMSShell.models.message.Message('+33612', 'a'),
+                SMSShell.models.message.Message('+32612', 'b'),
+                SMSShell.models.message.Message('+33712', 'b'),
+                SMSShell.models.message.Message('+33612', 'c'),
+                SMSShell.models.message.Message('+33612', None)]
+    results = chain.callChainOnBatch(messages)
+    assert len(results) == len(messages)
+    assert results[0] is True
+    assert isinstance(results[1], SMSShell.validators.ValidationException)
+    assert isinstance(results[2], SMSShell.validators.ValidationException)
+    assert str(results[3]) == 'c'
+    assert results[4] is True
+    # same results as the objects one by one
+    for message, result in zip(messages, results):
+        if result is True:
+            assert chain.callChainOnObject(message)
+        else:
+            with pytest.raises(SMSShell.validators.ValidationException):
+                chain.callChainOnObject(message)
+    assert chain.callChainOnBatch([]) == []
+
+# Validators cache
+
+def test_validators_cache(tmp_path):
+    path = tmp_path / 'numbers.txt'
+    path.write_text('+337*\n')
+    calls = []
+
+    class V(SMSShell.validators.AbstractValidator):
+        PURE = True
+
+        def __call__(self, data):
+            calls.append(data)
+            if data == '+33612':
+                raise SMSShell.validators.ValidationException('bad ' + data)
+            return data
+
+    chain = SMSShell.validators.ValidatorChain(cache_size=2)
+    chain.addLinksFromDict({'number': [SMSShell.validators.Regexp('^\\+'),
+                                       V(),
+                                       SMSShell.validators.NumberList(str(path), 'deny')]})
+    ok = SMSShell.models.message.Message('+32612', 'b')
+    bad = SMSShell.models.message.Message('+33612', 'b')
+    for _ in range(3):
+        assert chain.callChainOnObject(ok)
+        with pytest.raises(SMSShell.validators.ValidationException) as ex:
+            chain.callChainOnObject(bad)
+        assert str(ex.value) == 'bad +33612'
+    assert calls == ['+32612', '+33612']
+    assert chain.cacheCount('hit') == 4
+    assert chain.cacheCount('miss') == 2
+    # the validator which is not pure is not cached
+    with pytest.raises(SMSShell.validators.ValidationException):
+        chain.callChainOnObject(SMSShell.models.message.Message('+33712', 'b'))
+    assert chain.callChainOnBatch([ok, bad])[0] is True
+
+    # least recently used values are dropped
+    chain.callChainOnObject(SMSShell.models.message.Message('+32000', 'b'))
+    chain.callChainOnObject(ok)
+    assert calls[-1] == '+32612'
+
+def test_validators_cache_disabled():
+    chain = SMSShell.validators.ValidatorChain()
+    chain.addLinksFromDict({'number': [SMSShell.validators.Regexp('^\\+')]})
+    assert chain.callChainOnObject(SMSShell.models.message.Message('+32612', 'b'))
+    assert chain.cacheCount('hit') == 0
+    assert chain.cacheCount('miss') == 0
@@ -0,0 +1,70 @@
+# -*- coding: utf8 -*-
+
+import threading
+import time
+
+import SMSShell
+import SMSShell.workers
+
+
+def test_start_stop():
+    """Just start and stop the pool
+    """
+    pool = SMSShell.workers.WorkerPool('test', 2)
+    assert pool.size == 2
+    assert pool.start()
+    assert pool.stop()
+
+def test_same_key_ordering():
+    """Jobs with the same key must run in submission order
+    """
+    results = []
+    pool = SMSShell.workers.WorkerPool('test', 4)
+    pool.start()
+    for i in range(100):
+        pool.submit('+33000000000', results.append, i)
+    pool.stop()
+    assert results == list(range(100))
+
+def test_different_keys_in_parallel():
+    """A slow job must not block jobs of others keys
+    """
+    pool = SMSShell.workers.WorkerPool('test', 2)
+    pool.start()
+    slow_key = 'a'
+    fast_key = next(k for k in 'bcdefgh' if pool.laneForKey(k) != pool.laneForKey(slow_key))
+
+    release = threading.Event()
+    done = threading.Event()
+    pool.submit(slow_key, release.wait, 5)
+    pool.submit(fast_key, done.set)
+    assert done.wait(2)
+    assert pool.qsize() == 0
+    release.set()
+    pool.stop()
+
+def test_job_exception_does_not_kill_worker():
+    """An exception in a job is logged and the worker continues
+    """
+    results = []
+
+    def fail():
+        raise RuntimeError('boom')
+
+    pool = SMSShell.workers.WorkerPool('test', 1)
+    pool.start()
+    pool.submit('a', fail)
+    pool.submit('a', results.append, 1)
+    pool.stop()
+    assert results == [1]
+
+def test_try_submit_on_full_lane():
+    """A full lane refuses new jobs without blocking
+    """
+    release = threading.Event()
+    pool = SMSShell.workers.WorkerPool('test', 1, queue_size=1)
+    assert pool.trySubmit('a', release.wait, 5)
+    assert not pool.trySubmit('a', release.wait, 5)
+    pool.start()
+    release.set()
+    pool.stop()